@@ -1,4 +1,5 @@
 import os  # Used to access OS functionality, specifically to read environment variables (like DB credentials).
+import sys  # Used to make the shared modules in Student-GUI-v2 importable.
 from dotenv import load_dotenv  # Loads environment variables from a .env file into os.environ for secure configuration.
 import tkinter as tk  # The standard Python interface to the Tcl/Tk GUI toolkit, used to build the main application window and widgets.
 from tkinter import messagebox  # A submodule of tkinter used specifically to display pop-up dialogs (e.g., error messages, warnings, info alerts).
@@ -6,6 +7,13 @@ import pymysql  # A pure-Python MySQL client library used to connect to and comm
 import uuid  # Used to generate Universally Unique Identifiers (UUIDs), often used for creating unique primary keys for database records.
 from input_validator import validate_student_data, sanitize_string  # Input validation to prevent SQL injection
 
+# The save queue, the transient-error check and the totals SQL are shared with v2 rather than copied.
+# Appended, so v1's own input_validator still wins; a PyInstaller build needs --paths ../Student-GUI-v2.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Student-GUI-v2'))
+from write_queue import WriteBehindQueue  # Durable local queue so saving never waits on the database
+from resilience import is_transient  # MySQL error codes worth retrying; anything else fails the save
+from student_totals import TOTALS_UPSERT  # Recomputes the Total/Average that v2 sorts by
+
 load_dotenv() # 1. Load the secrets from the .env file
 
 # 2. Get the values safely
@@ -18,6 +26,59 @@ DB_CONFIG = {
     'database': os.getenv('DB_NAME'),
     'cursorclass': pymysql.cursors.DictCursor
 }
+
+# Map names to IDs
+SUB_IDS = {"Science": 101, "Social": 102, "Maths": 103, "English": 104, "Hindi": 105, "Kannada": 106}
+
+
+def write_students(entries):
+    """Write a batch of queued saves in one transaction (called by the write-behind queue)."""
+    conn = pymysql.connect(**DB_CONFIG)
+    try:
+        cursor = conn.cursor()
+
+        # Marks belong to the active term; without one the batch fails instead of saving nothing
+        cursor.execute("SELECT TERM_ID, ACADEMIC_YEAR FROM TERMS WHERE IS_ACTIVE = 1 ORDER BY ACADEMIC_YEAR DESC, TERM_ID DESC LIMIT 1")
+        term = cursor.fetchone()
+        if term is None:
+            raise RuntimeError("No active term: set one in TERMS before saving marks")
+
+        for entry in entries:
+            roll_no, name = entry['roll_no'], entry['name']
+
+            # 1. Insert Student (an existing student keeps their name, as before)
+            cursor.execute("INSERT INTO STUDENTS (ROLL_NO, NAME) VALUES (%s, %s) ON DUPLICATE KEY UPDATE ROLL_NO = ROLL_NO", (roll_no, name))
+
+            # 2. Insert Marks
+            for sub_name, marks_value in entry['marks'].items():
+                sub_id = SUB_IDS[sub_name]
+                unique_id = str(uuid.uuid4())
+
+                # Re-saving a subject updates it in place
+                cursor.execute("""
+                    INSERT INTO MARKS (ID, ROLL_NO, SUBJ_ID, MARKS, TERM_ID, ACADEMIC_YEAR)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE MARKS = VALUES(MARKS), VERSION = VERSION + 1
+                """, (unique_id, roll_no, sub_id, marks_value, term['TERM_ID'], term['ACADEMIC_YEAR']))
+
+            # 3. Keep the Total/Average that v2 sorts by in step with the marks
+            cursor.execute(TOTALS_UPSERT.format(roll_nos='%s'), (term['ACADEMIC_YEAR'], term['TERM_ID'], roll_no))
+
+            # Bump the student's version so anyone editing them concurrently sees a conflict
+            cursor.execute("UPDATE STUDENTS SET VERSION = VERSION + 1 WHERE ROLL_NO = %s", (roll_no,))
+
+            # Record the change so v2 instances following MARKS_CHANGES pick it up
+            cursor.execute("INSERT INTO MARKS_CHANGES (ROLL_NO, OP) VALUES (%s, 'UPSERT')", (roll_no,))
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+
 class StudentApp:
     def __init__(self, root):
         self.root = root
@@ -61,11 +122,23 @@ class StudentApp:
                                bg="green", fg="white", font=("Arial", 12))
         submit_btn.pack(pady=20)
 
+        # Enabled while the database has rejected queued saves
+        self.failed_btn = tk.Button(root, text="↻ Retry / Discard Failed Saves", command=self.review_failed_saves,
+                                    bg="red", fg="white", state=tk.DISABLED)
+        self.failed_btn.pack()
+
         # Status Bar
         self.status_var = tk.StringVar()
         self.status_var.set("Ready to connect...")
         tk.Label(root, textvariable=self.status_var, bd=1, relief=tk.SUNKEN, anchor=tk.W).pack(side=tk.BOTTOM, fill=tk.X)
 
+        # Saves are queued in a local file and written to the database in the background
+        self.save_queue = WriteBehindQueue(os.getenv('SAVE_QUEUE_PATH') or "pending_saves.db",
+                                           write_students, is_transient=is_transient)
+        self.save_queue.start()
+        self.root.after(1000, self.show_queue_status)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
     def save_data(self):
         name = self.name_entry.get()
         roll_txt = self.roll_entry.get()
@@ -87,51 +160,49 @@ class StudentApp:
         roll_no = validated_data['roll_no']
         marks = validated_data['marks']
 
-        # Connect to Database
-        conn = None
-        try:
-            self.status_var.set("Connecting to server...")
-            self.root.update_idletasks() # Force UI update
-            
-            conn = pymysql.connect(**DB_CONFIG)
-            cursor = conn.cursor()
-
-            # 1. Insert Student
-            try:
-                cursor.execute("INSERT INTO STUDENTS (ROLL_NO, NAME) VALUES (%s, %s)", (roll_no, name))
-            except pymysql.err.IntegrityError as e:
-                # If error is 1062 (Duplicate), we just ignore it and move to marks
-                if e.args[0] != 1062:
-                    raise e
-
-            # 2. Insert Marks
-            # Map names to IDs
-            sub_ids = {"Science": 101, "Social": 102, "Maths": 103, "English": 104, "Hindi": 105, "Kannada": 106}
-
-            for sub_name, marks_value in marks.items():
-                sub_id = sub_ids[sub_name]
-                unique_id = str(uuid.uuid4())
-
-                cursor.execute("""
-                    INSERT INTO MARKS (ID, ROLL_NO, SUBJ_ID, MARKS) 
-                    VALUES (%s, %s, %s, %s)
-                """, (unique_id, roll_no, sub_id, marks_value))
-
-            conn.commit()
-            messagebox.showinfo("Success", f"Data saved for {name}!")
-            self.status_var.set("Data Saved Successfully.")
-            
-            # Clear form
-            self.name_entry.delete(0, tk.END)
-            self.roll_entry.delete(0, tk.END)
-            for e in self.entries.values():
-                e.delete(0, tk.END)
-
-        except Exception as e:
-            messagebox.showerror("Database Error", str(e))
-            self.status_var.set("Error occurred.")
-        finally:
-            if conn: conn.close()
+        # Queue the save; it returns immediately and is written in the background
+        self.save_queue.enqueue(name, roll_no, marks)
+        self.status_var.set(f"Roll No {roll_no} ({name}) queued for saving.")
+
+        # Clear form
+        self.name_entry.delete(0, tk.END)
+        self.roll_entry.delete(0, tk.END)
+        for e in self.entries.values():
+            e.delete(0, tk.END)
+        self.name_entry.focus_set()
+
+    def show_queue_status(self):
+        # Refresh the pending/failed counts in the status bar once a second
+        pending, failed = self.save_queue.counts()
+        self.failed_btn.config(state=tk.NORMAL if failed else tk.DISABLED)
+        if failed:
+            rejected = "; ".join(f"Roll {roll_no}: {error}" for roll_no, _, error in self.save_queue.failed_entries()[:3])
+            self.status_var.set(f"Pending saves: {pending}  Failed: {failed} ({rejected})")
+        elif pending:
+            waiting = "  (database unreachable, retrying)" if self.save_queue.last_error else ""
+            self.status_var.set(f"Pending saves: {pending}{waiting}")
+        elif self.status_var.get().startswith("Pending saves"):
+            self.status_var.set("All saves written.")
+        self.root.after(1000, self.show_queue_status)
+
+    def review_failed_saves(self):
+        failed = self.save_queue.failed_entries()
+        if not failed:
+            return
+        details = "\n".join(f"Roll {roll_no} ({name}): {error}" for roll_no, name, error in failed[:10])
+        if len(failed) > 10:
+            details += f"\n... and {len(failed) - 10} more"
+        if messagebox.askyesno("Failed Saves", f"{details}\n\nYes: retry these saves\nNo: discard them"):
+            self.save_queue.retry_failed()
+            self.status_var.set(f"Retrying {len(failed)} failed saves.")
+        elif messagebox.askyesno("Confirm", f"Discard {len(failed)} unsaved records?"):
+            self.save_queue.discard_failed()
+            self.status_var.set(f"Discarded {len(failed)} failed saves.")
+
+    def on_close(self):
+        # One last flush attempt; unsaved entries stay queued for the next start
+        self.save_queue.stop(timeout=5)
+        self.root.destroy()
 
 if __name__ == "__main__":
     root = tk.Tk()
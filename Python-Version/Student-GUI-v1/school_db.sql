@@ -1,7 +1,14 @@
 -- 1. Create STUDENTS Table
+-- CLASS_NAME (e.g. '10 A') groups students for per-class reports, NULL when unassigned.
+-- VERSION goes up on every write to the student or any of their marks. Editors
+-- update with WHERE VERSION = <version they loaded> to detect concurrent edits.
 CREATE TABLE IF NOT EXISTS STUDENTS (
     ROLL_NO INT PRIMARY KEY,
-    NAME VARCHAR(50)
+    NAME VARCHAR(50),
+    CLASS_NAME VARCHAR(20) NULL,
+    VERSION INT NOT NULL DEFAULT 0,
+    KEY IX_STUDENTS_CLASS (CLASS_NAME, ROLL_NO),
+    KEY IX_STUDENTS_NAME (NAME, ROLL_NO)
 );
 
 -- 2. Create SUBJECTS Table
@@ -10,18 +17,45 @@ CREATE TABLE IF NOT EXISTS SUBJECTS (
     SUBJ_NAME VARCHAR(50)
 );
 
--- 3. Create MARKS Table
+-- 3. Create TERMS Table
+-- One row per exam sitting (academic year + term + exam). IS_ACTIVE marks the term
+-- that reads and saves use by default.
+CREATE TABLE IF NOT EXISTS TERMS (
+    TERM_ID INT PRIMARY KEY,
+    ACADEMIC_YEAR SMALLINT NOT NULL,
+    TERM_NAME VARCHAR(50) NOT NULL,
+    EXAM VARCHAR(50) NOT NULL,
+    IS_ACTIVE TINYINT NOT NULL DEFAULT 0
+);
+
+-- 4. Create MARKS Table
 -- We use CHAR(36) to store the UUID string
+-- Partitioned by ACADEMIC_YEAR so queries for the active term only touch one partition.
+-- MySQL requires the partitioning column in every unique key and does not allow
+-- foreign keys on partitioned tables, so DatabaseHelper keeps MARKS consistent with
+-- STUDENTS/SUBJECTS instead. Every write names its term, so there are no defaults.
+-- VERSION counts updates of each mark row.
+-- IX_MARKS_TERM also serves the records view sorted by a subject, keyset-paged on (MARKS, ROLL_NO).
 CREATE TABLE IF NOT EXISTS MARKS (
-    ID CHAR(36) PRIMARY KEY, 
-    ROLL_NO INT,
-    SUBJ_ID INT,
+    ID CHAR(36) NOT NULL,
+    ROLL_NO INT NOT NULL,
+    SUBJ_ID INT NOT NULL,
     MARKS INT,
-    FOREIGN KEY (ROLL_NO) REFERENCES STUDENTS(ROLL_NO),
-    FOREIGN KEY (SUBJ_ID) REFERENCES SUBJECTS(SUBJ_ID)
+    TERM_ID INT NOT NULL,
+    ACADEMIC_YEAR SMALLINT NOT NULL,
+    VERSION INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (ID, ACADEMIC_YEAR),
+    UNIQUE KEY UQ_MARKS_STUDENT_TERM (ROLL_NO, SUBJ_ID, TERM_ID, ACADEMIC_YEAR),
+    KEY IX_MARKS_TERM (ACADEMIC_YEAR, TERM_ID, SUBJ_ID, MARKS, ROLL_NO)
+)
+PARTITION BY RANGE (ACADEMIC_YEAR) (
+    PARTITION p2024 VALUES LESS THAN (2025),
+    PARTITION p2025 VALUES LESS THAN (2026),
+    PARTITION p2026 VALUES LESS THAN (2027),
+    PARTITION pmax VALUES LESS THAN MAXVALUE
 );
 
--- 4. Pre-load the subjects from your whiteboard
+-- 5. Pre-load the subjects from your whiteboard
 INSERT IGNORE INTO SUBJECTS (SUBJ_ID, SUBJ_NAME) VALUES 
 (101, 'Science'),
 (102, 'Social'),
@@ -29,3 +63,62 @@ INSERT IGNORE INTO SUBJECTS (SUBJ_ID, SUBJ_NAME) VALUES
 (104, 'English'),
 (105, 'Hindi'),
 (106, 'Kannada');
+
+-- 6. Seed the first term so a fresh install has an active term
+-- Existing installs get theirs from db_migrate.py instead, which also moves old marks into it
+INSERT IGNORE INTO TERMS (TERM_ID, ACADEMIC_YEAR, TERM_NAME, EXAM, IS_ACTIVE) VALUES
+(1, 2026, 'Term 1', 'Annual', 1);
+
+-- 7. Change log polled by open GUIs (WHERE SEQ > last_seen) to refresh only what changed
+-- OP is 'UPSERT' or 'DELETE', no foreign key so deletes stay visible after the student is gone
+CREATE TABLE IF NOT EXISTS MARKS_CHANGES (
+    SEQ BIGINT AUTO_INCREMENT PRIMARY KEY,
+    ROLL_NO INT NOT NULL,
+    OP VARCHAR(6) NOT NULL,
+    CHANGED_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 8. Tenant routing, used only in the directory database of a multi-school deployment
+-- Maps each school to the shard database holding its data. Single-school installs leave it empty.
+CREATE TABLE IF NOT EXISTS TENANT_SHARDS (
+    TENANT_ID VARCHAR(50) PRIMARY KEY,
+    SHARD_HOST VARCHAR(255) NOT NULL,
+    SHARD_PORT INT NOT NULL DEFAULT 3306,
+    DB_NAME VARCHAR(64) NOT NULL,
+    -- Optional read replicas of the shard as host[:port] separated by commas
+    REPLICA_HOSTS VARCHAR(1024) NULL
+);
+
+-- 9. Precomputed Performance dashboard, one row per term
+-- DATA_VERSION is the MARKS_CHANGES sequence the row was built from, so readers can tell when it is stale.
+CREATE TABLE IF NOT EXISTS DASHBOARD_SNAPSHOT (
+    TERM_ID INT NOT NULL,
+    ACADEMIC_YEAR SMALLINT NOT NULL,
+    DATA_VERSION BIGINT NOT NULL,
+    BUILT_AT TIMESTAMP NOT NULL,
+    TOTAL_STUDENTS INT NOT NULL,
+    CLASS_AVG DECIMAL(5,2),
+    TOPPER_NAME VARCHAR(255),
+    SUBJECT_AVGS JSON,
+    GRADE_COUNTS JSON,
+    PRIMARY KEY (ACADEMIC_YEAR, TERM_ID)
+);
+
+-- 10. Each student's total and average per term, so the records view can be sorted by them
+-- DatabaseHelper updates the rows in the same transaction as the marks. Students without marks have none.
+CREATE TABLE IF NOT EXISTS STUDENT_TOTALS (
+    ROLL_NO INT NOT NULL,
+    TERM_ID INT NOT NULL,
+    ACADEMIC_YEAR SMALLINT NOT NULL,
+    TOTAL INT NOT NULL,
+    AVERAGE DECIMAL(5,2) NOT NULL,
+    PRIMARY KEY (ROLL_NO, ACADEMIC_YEAR, TERM_ID),
+    KEY IX_TOTALS_TOTAL (ACADEMIC_YEAR, TERM_ID, TOTAL, ROLL_NO),
+    KEY IX_TOTALS_AVERAGE (ACADEMIC_YEAR, TERM_ID, AVERAGE, ROLL_NO)
+);
+
+-- Fill it from marks saved before the table existed
+INSERT IGNORE INTO STUDENT_TOTALS (ROLL_NO, TERM_ID, ACADEMIC_YEAR, TOTAL, AVERAGE)
+SELECT ROLL_NO, TERM_ID, ACADEMIC_YEAR, SUM(MARKS), ROUND(AVG(MARKS), 2) FROM MARKS
+WHERE MARKS IS NOT NULL
+GROUP BY ROLL_NO, TERM_ID, ACADEMIC_YEAR;
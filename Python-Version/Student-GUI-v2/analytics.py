@@ -0,0 +1,231 @@
+"""
+Rank, percentile and grade-distribution engine for cohort reports.
+
+All heavy lifting runs in MySQL with window functions (RANK() OVER,
+PERCENT_RANK() OVER), so only the results cross the wire. Results are cached
+per data version (the latest MARKS_CHANGES sequence): reopening the Performance
+screen costs one MAX(SEQ) lookup until somebody saves or deletes a student.
+Every query is restricted to one term (the active term unless given), so MySQL
+only scans that academic year's MARKS partition. get_analytics() hands out one
+shared instance per shard and term, so the cache outlives any single caller.
+"""
+
+import threading
+from database_helper import SUBJ_MAP, REVERSE_SUBJ_MAP
+
+# Lower bound of each grade band, highest first. 35 is the pass mark.
+GRADE_BANDS = [
+    (90, "A+"),
+    (80, "A"),
+    (70, "B+"),
+    (60, "B"),
+    (50, "C"),
+    (35, "D"),
+    (0, "F"),
+]
+
+GRADE_CASE = "CASE " + " ".join(f"WHEN {{col}} >= {low} THEN '{grade}'" for low, grade in GRADE_BANDS[:-1]) \
+    + f" ELSE '{GRADE_BANDS[-1][1]}' END"
+
+
+def grade_for(marks):
+    """Grade band for a single mark or average (None stays None)."""
+    if marks is None:
+        return None
+    for low, grade in GRADE_BANDS:
+        if marks >= low:
+            return grade
+    return GRADE_BANDS[-1][1]
+
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_analytics(db, term=None):
+    """Shared PerformanceAnalytics for the shard db points at and a term (default: the active term)."""
+    config = db.config()
+    term_key = db.term_key(term)
+    key = (config.get('host'), config.get('port'), config.get('database'), term_key)
+    with _instances_lock:
+        if key not in _instances:
+            _instances[key] = PerformanceAnalytics(db, term_key)
+        return _instances[key]
+
+
+class PerformanceAnalytics:
+    def __init__(self, db, term=None):
+        """
+        Args:
+            db: DatabaseHelper (anything with connect(read_only=...), get_data_version() and term_key())
+            term: TERMS row or (term_id, academic_year); defaults to the active term
+        """
+        self.db = db
+        self.term = term
+        self._version = None
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, key, compute):
+        """Return compute(term_id, academic_year), reusing the result until the data version changes."""
+        version = self.db.get_data_version()
+        term_key = self.db.term_key(self.term)
+        key = (key, term_key)
+        with self._lock:
+            if version != self._version:
+                self._cache = {}
+                self._version = version
+            if key in self._cache:
+                return self._cache[key]
+        result = compute(*term_key)
+        with self._lock:
+            if self._version == version:
+                self._cache[key] = result
+        return result
+
+    def _query(self, sql, params=()):
+        conn = self.db.connect(read_only=True)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(sql, params)
+                return cursor.fetchall()
+        finally:
+            conn.close()
+
+    def student_ranks(self):
+        """
+        Every student with marks, ordered by class rank.
+
+        Returns:
+            List of dicts: ROLL_NO, NAME, TOTAL, AVERAGE, CLASS_RANK (1 = best, ties share a
+            rank), PERCENTILE (0-100, share of the cohort with a lower average) and GRADE
+        """
+        def compute(term_id, academic_year):
+            rows = self._query("""
+                SELECT ROLL_NO, NAME, TOTAL, AVERAGE,
+                    RANK() OVER (ORDER BY AVERAGE DESC) AS CLASS_RANK,
+                    ROUND(100 * PERCENT_RANK() OVER (ORDER BY AVERAGE), 2) AS PERCENTILE
+                FROM (
+                    SELECT s.ROLL_NO, s.NAME, SUM(m.MARKS) AS TOTAL, ROUND(AVG(m.MARKS), 2) AS AVERAGE
+                    FROM STUDENTS s
+                    JOIN MARKS m ON s.ROLL_NO = m.ROLL_NO AND m.ACADEMIC_YEAR = %s AND m.TERM_ID = %s
+                    GROUP BY s.ROLL_NO, s.NAME
+                ) totals
+                ORDER BY CLASS_RANK, ROLL_NO
+            """, (academic_year, term_id))
+            for row in rows:
+                row['AVERAGE'] = float(row['AVERAGE'])
+                row['TOTAL'] = int(row['TOTAL'])
+                row['GRADE'] = grade_for(row['AVERAGE'])
+            return rows
+        return self._cached('student_ranks', compute)
+
+    def rank_of(self, roll_no):
+        """Rank row for one student, or None if they have no marks."""
+        index = self._cached('rank_index', lambda *term_key: {row['ROLL_NO']: row for row in self.student_ranks()})
+        return index.get(roll_no)
+
+    def toppers(self, limit=None):
+        """
+        Students sharing rank 1, by roll number (at most limit of them).
+
+        Reads only the top of STUDENT_TOTALS' average index instead of ranking the term.
+
+        Returns:
+            List of dicts: ROLL_NO, NAME, TOTAL, AVERAGE, CLASS_RANK (always 1) and GRADE
+        """
+        def compute(term_id, academic_year):
+            rows = self._query(f"""
+                SELECT t.ROLL_NO, s.NAME, t.TOTAL, t.AVERAGE, 1 AS CLASS_RANK
+                FROM STUDENT_TOTALS t
+                JOIN STUDENTS s ON s.ROLL_NO = t.ROLL_NO
+                WHERE t.ACADEMIC_YEAR = %s AND t.TERM_ID = %s AND t.AVERAGE = (
+                    SELECT MAX(AVERAGE) FROM STUDENT_TOTALS WHERE ACADEMIC_YEAR = %s AND TERM_ID = %s
+                )
+                ORDER BY t.ROLL_NO
+                {'LIMIT %s' if limit is not None else ''}
+            """, (academic_year, term_id, academic_year, term_id) + ((limit,) if limit is not None else ()))
+            for row in rows:
+                row['AVERAGE'] = float(row['AVERAGE'])
+                row['TOTAL'] = int(row['TOTAL'])
+                row['GRADE'] = grade_for(row['AVERAGE'])
+            return rows
+        return self._cached(('toppers', limit), compute)
+
+    def subject_percentiles(self):
+        """
+        Per-subject rank and percentile of every mark.
+
+        Returns:
+            Dict of subject name -> list of dicts: ROLL_NO, MARKS, SUBJECT_RANK, PERCENTILE, GRADE
+        """
+        def compute(term_id, academic_year):
+            rows = self._query("""
+                SELECT SUBJ_ID, ROLL_NO, MARKS,
+                    RANK() OVER (PARTITION BY SUBJ_ID ORDER BY MARKS DESC) AS SUBJECT_RANK,
+                    ROUND(100 * PERCENT_RANK() OVER (PARTITION BY SUBJ_ID ORDER BY MARKS), 2) AS PERCENTILE
+                FROM MARKS
+                WHERE ACADEMIC_YEAR = %s AND TERM_ID = %s
+                ORDER BY SUBJ_ID, SUBJECT_RANK, ROLL_NO
+            """, (academic_year, term_id))
+            result = {sub_name: [] for sub_name in SUBJ_MAP}
+            for row in rows:
+                sub_name = REVERSE_SUBJ_MAP.get(row.pop('SUBJ_ID'))
+                if sub_name:
+                    row['GRADE'] = grade_for(row['MARKS'])
+                    result[sub_name].append(row)
+            return result
+        return self._cached('subject_percentiles', compute)
+
+    def grade_distribution(self):
+        """
+        Count of marks in each grade band per subject, plus 'Overall' by student average.
+
+        Returns:
+            Dict of subject name (or 'Overall') -> {grade: count} with every band present
+        """
+        def compute(term_id, academic_year):
+            result = {sub_name: {grade: 0 for _, grade in GRADE_BANDS} for sub_name in list(SUBJ_MAP) + ['Overall']}
+            for row in self._query(f"""
+                SELECT SUBJ_ID, {GRADE_CASE.format(col='MARKS')} AS GRADE, COUNT(*) AS N
+                FROM MARKS
+                WHERE ACADEMIC_YEAR = %s AND TERM_ID = %s
+                GROUP BY SUBJ_ID, GRADE
+            """, (academic_year, term_id)):
+                sub_name = REVERSE_SUBJ_MAP.get(row['SUBJ_ID'])
+                if sub_name:
+                    result[sub_name][row['GRADE']] = row['N']
+            # Overall from the per-student averages in STUDENT_TOTALS, without ranking the term
+            for row in self._query(f"""
+                SELECT {GRADE_CASE.format(col='t.AVERAGE')} AS GRADE, COUNT(*) AS N
+                FROM STUDENT_TOTALS t
+                JOIN STUDENTS s ON s.ROLL_NO = t.ROLL_NO
+                WHERE t.ACADEMIC_YEAR = %s AND t.TERM_ID = %s
+                GROUP BY GRADE
+            """, (academic_year, term_id)):
+                result['Overall'][row['GRADE']] = row['N']
+            return result
+        return self._cached('grade_distribution', compute)
+
+    def histogram(self, bin_width=10):
+        """
+        Mark histogram per subject.
+
+        Returns:
+            Dict of subject name -> list of counts, one per bin [0, w), [w, 2w), ... with 100
+            folded into the last bin
+        """
+        def compute(term_id, academic_year):
+            bins = -(-100 // bin_width)
+            result = {sub_name: [0] * bins for sub_name in SUBJ_MAP}
+            for row in self._query("""
+                SELECT SUBJ_ID, LEAST(FLOOR(MARKS / %s), %s) AS BIN, COUNT(*) AS N
+                FROM MARKS
+                WHERE ACADEMIC_YEAR = %s AND TERM_ID = %s AND MARKS IS NOT NULL
+                GROUP BY SUBJ_ID, BIN
+            """, (bin_width, bins - 1, academic_year, term_id)):
+                sub_name = REVERSE_SUBJ_MAP.get(row['SUBJ_ID'])
+                if sub_name:
+                    result[sub_name][int(row['BIN'])] = row['N']
+            return result
+        return self._cached(('histogram', bin_width), compute)
@@ -0,0 +1,95 @@
+"""
+Search-time benchmark for NameIndex.
+
+Indexes a synthetic roster of Indian names (some with a middle or second surname,
+a share of them misspelt the way data entry misspells names) and times each
+query twice: cold, with nothing cached from earlier searches, and as the last
+keystroke when the query is typed a letter at a time, which is how the GUI
+searches. No database is needed.
+
+Usage:
+    python bench_name_index.py [num_students] [misspelt_share]
+"""
+
+import sys
+import time
+import random
+from name_index import NameIndex
+
+FIRST_NAMES = """Aarav Abhishek Aditi Aditya Akash Amit Ananya Anil Anjali Ankit Arjun Arun Asha Bhavana
+    Chetan Deepak Devika Dinesh Divya Gaurav Geeta Harish Isha Ishaan Jayesh Karthik Kavya Kiran Krishna
+    Lakshmi Madhav Mahesh Manoj Meena Meera Mohan Nandini Naveen Neha Nikhil Nisha Pallavi Pooja Prakash
+    Pranav Priya Rahul Rajesh Ramesh Ravi Rekha Rohan Sachin Sandeep Sanjay Santosh Sarita Shalini Shreya
+    Shrinivas Shweta Sneha Srinivas Suresh Swati Tanvi Uday Usha Varun Vijay Vikram Vinod Yash""".split()
+SURNAMES = """Acharya Agarwal Banerjee Bhat Chatterjee Chauhan Desai Deshpande Dubey Gowda Gupta Hegde
+    Iyengar Iyer Jain Joshi Kamath Kapoor Khan Kulkarni Kumar Malhotra Menon Mishra Mukherjee Naidu Nair
+    Pandey Patel Patil Pillai Prabhu Rao Reddy Saxena Sharma Shenoy Shetty Singh Sinha Srivastava
+    Subramanian Tiwari Trivedi Varma Verma Yadav""".split()
+QUERIES = ["sharma", "shrama", "Sharmaa", "Kulk", "Kulkarni", "Chaterji", "Srinivsa", "Priya Sharmaa",
+           "lakshmi iyer", "Meera Nair Vikram", "Venkatesh", "s"]
+LIMIT = 50  # NAME_MATCHES in the GUI
+REPEATS = 20
+
+
+def misspell(word, rng):
+    i = rng.randrange(len(word))
+    letter = rng.choice("aeiouhnrst")
+    return rng.choice([word[:i] + word[i + 1:], word[:i] + letter + word[i:], word[:i] + letter + word[i + 1:]])
+
+
+def make_names(count, misspelt_share):
+    rng = random.Random(42)
+    names = []
+    for _ in range(count):
+        words = [rng.choice(FIRST_NAMES), rng.choice(SURNAMES)]
+        if rng.random() < 0.3:
+            words.insert(1, rng.choice(FIRST_NAMES + SURNAMES))
+        if rng.random() < misspelt_share:
+            i = rng.randrange(len(words))
+            words[i] = misspell(words[i], rng)
+        names.append(" ".join(words))
+    return names
+
+
+def best_time(search):
+    best = float('inf')
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        search()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 120_000
+    misspelt_share = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    index = NameIndex()
+    started = time.perf_counter()
+    for roll_no, name in enumerate(make_names(count, misspelt_share), 1):
+        index.add(roll_no, name)
+    print(f"Indexed {len(index):,} names ({misspelt_share:.0%} misspelt) in {time.perf_counter() - started:.2f}s\n")
+
+    print(f"{'query':<20}{'cold':>10}{'typing':>10}  best match (limit {LIMIT})")
+    for query in QUERIES:
+        def cold():
+            index._matches.clear()
+            index.search(query, limit=LIMIT)
+
+        def typing():
+            # Search each keystroke so far, then time the last one
+            index._matches.clear()
+            for end in range(1, len(query)):
+                index.search(query[:end], limit=LIMIT)
+            started = time.perf_counter()
+            index.search(query, limit=LIMIT)
+            return time.perf_counter() - started
+
+        cold_ms = best_time(cold)
+        typing_ms = min(typing() for _ in range(REPEATS)) * 1000
+        matches = index.search(query, limit=LIMIT)
+        best = f"{matches[0][1]} ({matches[0][2]:.2f})" if matches else "-"
+        print(f"{query!r:<20}{cold_ms:>8.3f}ms{typing_ms:>8.3f}ms  {best}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Memory benchmark for pivoted student rows.
+
+Compares the per-row footprint of DictCursor dicts, plain tuples, StudentRecord
+and (if NumPy is installed) a NumPy structured array for a synthetic roster.
+No database is needed: the rows are generated in the shape the tuple cursor returns.
+
+Usage:
+    python bench_records.py [num_students]
+"""
+
+import sys
+import random
+import tracemalloc
+from database_helper import RECORD_FIELDS, SUBJ_MAP, StudentRecord
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def make_rows(count):
+    rng = random.Random(42)
+    rows = []
+    for roll_no in range(1, count + 1):
+        marks = [rng.randint(0, 100) if rng.random() > 0.05 else None for _ in SUBJ_MAP]
+        rows.append((roll_no, f"Student {roll_no}", *marks))
+    return rows
+
+
+def measure(label, build, rows):
+    tracemalloc.start()
+    result = build(rows)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28}{current / len(rows):>10.1f} bytes/row{current / 2**20:>12.1f} MiB total")
+    return result
+
+
+def build_numpy(rows):
+    dtype = [('ROLL_NO', 'i4'), ('NAME', 'U50')] + [(sub, 'i1') for sub in SUBJ_MAP]
+    # -1 marks a missing subject; int8 cannot hold NULL
+    return np.array([row[:2] + tuple(-1 if m is None else m for m in row[2:]) for row in rows], dtype=dtype)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"Building {count:,} pivoted rows ({len(RECORD_FIELDS)} columns)...")
+    rows = make_rows(count)
+    print("Container overhead only; names and ints are shared by every representation.\n")
+
+    measure("DictCursor dicts", lambda rs: [dict(zip(RECORD_FIELDS, r)) for r in rs], rows)
+    measure("tuple cursor rows", lambda rs: [(*r,) for r in rs], rows)
+    measure("StudentRecord (__slots__)", lambda rs: [StudentRecord(*r) for r in rs], rows)
+    if np is not None:
+        # Structured arrays copy the names into fixed-width fields, so this is the full footprint
+        measure("NumPy structured array", build_numpy, rows)
+    else:
+        print("NumPy structured array      skipped (numpy not installed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Rendered-chart cache for the Performance view.
+
+Building and drawing the matplotlib bar chart is the slowest part of showing the
+Performance screen on weak machines, yet the chart only changes when the subject
+averages do. ChartCache keeps the rendered PNG keyed by a hash of the plotted
+data (plus CHART_STYLE_VERSION), first in a small in-memory LRU and then on disk,
+so revisits and restarts show an image without touching matplotlib at all. The
+disk cache is an LRU too: reading an image refreshes its modification time, and
+every write removes the least recently used files beyond max_disk_entries.
+
+Bump CHART_STYLE_VERSION whenever subject_average_figure() changes appearance,
+so images rendered by older code are not reused.
+"""
+
+import io
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+CHART_STYLE_VERSION = 1
+CHART_BACKGROUND = '#2b2b2b'
+CHART_COLOR = '#1f538d'
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "student-gui", "charts")
+
+
+def subject_average_figure(subject_avgs):
+    """
+    Bar chart of per-subject averages. Subjects without marks (None) are left out.
+
+    Returns a matplotlib Figure that is not registered with pyplot, so it needs no
+    plt.close() and is freed with its last reference.
+    """
+    subject_avgs = {sub: val for sub, val in subject_avgs.items() if val is not None}
+    fig = Figure(figsize=(8, 4), dpi=100)
+    fig.patch.set_facecolor(CHART_BACKGROUND)
+    ax = fig.add_subplot()
+    ax.set_facecolor(CHART_BACKGROUND)
+
+    bars = ax.bar(list(subject_avgs), list(subject_avgs.values()), color=CHART_COLOR, width=0.6)
+
+    ax.set_title("Average Score per Subject", color='white', fontsize=14, pad=20)
+    ax.tick_params(axis='x', colors='white')
+    ax.tick_params(axis='y', colors='white')
+    ax.set_ylim(0, 100)
+
+    # Add labels on top of bars
+    for bar in bars:
+        yval = round(bar.get_height(), 1)
+        ax.text(bar.get_x() + bar.get_width()/2, yval + 2, yval, ha='center', va='bottom', color='white', fontsize=10)
+
+    # Remove spines
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+
+    fig.tight_layout()
+    return fig
+
+
+def render_png(fig):
+    buffer = io.BytesIO()
+    FigureCanvasAgg(fig).print_png(buffer)
+    return buffer.getvalue()
+
+
+class ChartCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_entries=16, max_disk_entries=64):
+        """
+        Args:
+            cache_dir: Directory for cached PNGs; None keeps the cache in memory only
+            max_entries: Images held in memory (least recently used are dropped)
+            max_disk_entries: Images kept in cache_dir (least recently used are deleted)
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = 0
+
+    @staticmethod
+    def key_for(kind, data):
+        """Stable hash of the chart kind, its data and the chart style version."""
+        payload = json.dumps([CHART_STYLE_VERSION, kind, data], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get_png(self, kind, data, render):
+        """
+        PNG bytes for a chart, rendering only on a cache miss.
+
+        Args:
+            kind: Chart name, part of the key (e.g. 'subject_averages')
+            data: JSON-serializable data the chart is drawn from
+            render: Called with data on a miss; returns a matplotlib Figure
+        """
+        key = self.key_for(kind, data)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+        png = self._read_disk(key)
+        if png is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            png = render_png(render(data))
+            self._write_disk(key, png)
+
+        with self._lock:
+            self._memory[key] = png
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+        return png
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.png")
+
+    def _read_disk(self, key):
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self._path(key), 'rb') as f:
+                png = f.read()
+        except OSError:
+            return None
+        try:
+            # The modification time doubles as the last use, for eviction
+            os.utime(self._path(key))
+        except OSError:
+            pass
+        return png
+
+    def _write_disk(self, key, png):
+        if self.cache_dir is None:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write then rename, so a crash or a second app instance never sees half a file
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, 'wb') as f:
+                f.write(png)
+            os.replace(tmp_path, self._path(key))
+            self._evict_disk()
+        except OSError as e:
+            print(f"Chart cache write failed: {e}")
+
+    def _evict_disk(self):
+        """Delete the least recently used images beyond max_disk_entries."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".png"):
+                try:
+                    entries.append((os.path.getmtime(os.path.join(self.cache_dir, name)), name))
+                except OSError:
+                    pass  # removed by another app instance
+        entries.sort()
+        for _, name in entries[:max(len(entries) - self.max_disk_entries, 0)]:
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+
+    def clear(self):
+        """Drop every cached image, in memory and on disk."""
+        with self._lock:
+            self._memory.clear()
+        if self.cache_dir is None or not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".png"):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
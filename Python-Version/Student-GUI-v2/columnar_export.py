@@ -0,0 +1,193 @@
+"""
+Columnar export: Parquet files and memory-mappable Arrow snapshots.
+
+Rows are streamed from DatabaseHelper.iter_records straight into Arrow record
+batches, so the full roster never sits in Python memory as records or a
+DataFrame. Analysts load the result with pandas.read_parquet / pyarrow instead
+of re-parsing the xlsx export.
+
+Layouts:
+    partition_by=None       one Parquet file, one row per student and term (wide)
+    partition_by='term'     ACADEMIC_YEAR=<y>/TERM_ID=<t>/part-0.parquet (wide)
+    partition_by='subject'  SUBJECT=<name>/part-0.parquet, one row per mark (long)
+
+Partitioned directories use hive-style names, so pyarrow.dataset and
+pandas.read_parquet(directory) recover the partition columns; the files
+themselves leave those columns out, as readers require. Pass
+partitioning=TERM_PARTITIONING to keep the term columns int16 on the way back.
+
+write_arrow_snapshot() writes an uncompressed Arrow IPC file that
+open_snapshot() memory-maps: columns are used in place without being copied
+or decoded.
+
+Usage:
+    python columnar_export.py out.parquet [--partition-by term|subject] [--all-terms]
+    python columnar_export.py roster.arrow --snapshot
+"""
+
+import os
+import argparse
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.dataset
+import pyarrow.parquet as pq
+from database_helper import DatabaseHelper, SUBJ_MAP
+
+# Marks are 0-100, so int8 holds them, and Arrow keeps NULL for a missing subject
+WIDE_SCHEMA = pa.schema(
+    [('ROLL_NO', pa.int32()), ('NAME', pa.string())]
+    + [(sub_name, pa.int8()) for sub_name in SUBJ_MAP]
+    + [('TERM_ID', pa.int16()), ('ACADEMIC_YEAR', pa.int16())]
+)
+LONG_SCHEMA = pa.schema([
+    ('ROLL_NO', pa.int32()), ('NAME', pa.string()), ('MARKS', pa.int8()),
+    ('TERM_ID', pa.int16()), ('ACADEMIC_YEAR', pa.int16()),
+])
+# Columns of a term-partitioned file: the term is in the directory names
+TERM_FILE_SCHEMA = pa.schema([field for field in WIDE_SCHEMA if field.name not in ('TERM_ID', 'ACADEMIC_YEAR')])
+TERM_PARTITIONING = pa.dataset.partitioning(
+    pa.schema([('ACADEMIC_YEAR', pa.int16()), ('TERM_ID', pa.int16())]), flavor='hive')
+PARTITION_MODES = (None, 'term', 'subject')
+
+
+def record_batches(db, term=None, batch_size=10000):
+    """
+    Stream one term's pivoted rows as Arrow record batches of WIDE_SCHEMA.
+
+    Args:
+        db: DatabaseHelper
+        term: TERMS row or (term_id, academic_year); defaults to the active term
+        batch_size: Students per batch (also the iter_records page size)
+    """
+    term_id, academic_year = db.term_key(term)
+    columns = [[] for _ in range(2 + len(SUBJ_MAP))]
+    for record in db.iter_records(page_size=batch_size, term=(term_id, academic_year)):
+        for column, value in zip(columns, record):
+            column.append(value)
+        if len(columns[0]) >= batch_size:
+            yield _wide_batch(columns, term_id, academic_year)
+            columns = [[] for _ in columns]
+    if columns[0]:
+        yield _wide_batch(columns, term_id, academic_year)
+
+
+def _wide_batch(columns, term_id, academic_year):
+    count = len(columns[0])
+    arrays = [pa.array(values, type=field.type) for values, field in zip(columns, WIDE_SCHEMA)]
+    arrays.append(pa.array([term_id] * count, type=pa.int16()))
+    arrays.append(pa.array([academic_year] * count, type=pa.int16()))
+    return pa.RecordBatch.from_arrays(arrays, schema=WIDE_SCHEMA)
+
+
+def _subject_batch(batch, sub_name):
+    """Long-format rows for one subject of a wide batch, skipping students without that mark."""
+    marks = batch.column(sub_name)
+    keep = marks.is_valid()
+    return pa.RecordBatch.from_arrays(
+        [batch.column('ROLL_NO').filter(keep), batch.column('NAME').filter(keep), marks.filter(keep),
+         batch.column('TERM_ID').filter(keep), batch.column('ACADEMIC_YEAR').filter(keep)],
+        schema=LONG_SCHEMA)
+
+
+def export_parquet(db, path, partition_by=None, terms=None, batch_size=10000, compression='zstd'):
+    """
+    Write student marks to Parquet without materializing the roster.
+
+    Args:
+        db: DatabaseHelper
+        path: Output file (partition_by=None) or directory (partitioned)
+        partition_by: None, 'term' or 'subject' (see module docstring)
+        terms: Iterable of TERMS rows or (term_id, academic_year) pairs; None for the active term
+        batch_size: Students per record batch / Parquet row group
+        compression: Parquet codec
+
+    Returns:
+        (rows_written, list of files written)
+    """
+    if partition_by not in PARTITION_MODES:
+        raise ValueError(f"partition_by must be one of {PARTITION_MODES}")
+    terms = [db.term_key(term) for term in (terms if terms is not None else [None])]
+    writers = {}
+    rows = 0
+
+    def writer_for(key, file_path, schema):
+        if key not in writers:
+            os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+            writers[key] = pq.ParquetWriter(file_path, schema, compression=compression)
+        return writers[key]
+
+    try:
+        for term_id, academic_year in terms:
+            for batch in record_batches(db, (term_id, academic_year), batch_size):
+                if partition_by is None:
+                    writer_for(path, path, WIDE_SCHEMA).write_batch(batch)
+                    rows += batch.num_rows
+                elif partition_by == 'term':
+                    file_path = os.path.join(path, f"ACADEMIC_YEAR={academic_year}", f"TERM_ID={term_id}", "part-0.parquet")
+                    term_batch = pa.RecordBatch.from_arrays(
+                        [batch.column(field.name) for field in TERM_FILE_SCHEMA], schema=TERM_FILE_SCHEMA)
+                    writer_for(file_path, file_path, TERM_FILE_SCHEMA).write_batch(term_batch)
+                    rows += batch.num_rows
+                else:
+                    for sub_name in SUBJ_MAP:
+                        long_batch = _subject_batch(batch, sub_name)
+                        file_path = os.path.join(path, f"SUBJECT={sub_name}", "part-0.parquet")
+                        writer_for(file_path, file_path, LONG_SCHEMA).write_batch(long_batch)
+                        rows += long_batch.num_rows
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return rows, list(writers)
+
+
+def write_arrow_snapshot(db, path, term=None, batch_size=10000):
+    """
+    Write one term as an uncompressed Arrow IPC file for open_snapshot().
+
+    Returns:
+        Number of rows written
+    """
+    rows = 0
+    with pa.OSFile(path, 'wb') as sink, ipc.new_file(sink, WIDE_SCHEMA) as writer:
+        for batch in record_batches(db, term, batch_size):
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    return rows
+
+
+def open_snapshot(path):
+    """
+    Memory-map an Arrow snapshot written by write_arrow_snapshot().
+
+    The returned pyarrow.Table reads its buffers straight from the page cache, so
+    opening it costs no parsing or copying. Keep the table alive while columns
+    derived from it are in use.
+    """
+    return ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export student marks to Parquet or an Arrow snapshot")
+    parser.add_argument('path', help="output file, or directory when partitioned")
+    parser.add_argument('--partition-by', choices=['term', 'subject'], help="write a partitioned dataset")
+    parser.add_argument('--all-terms', action='store_true', help="export every term instead of the active one")
+    parser.add_argument('--snapshot', action='store_true', help="write a memory-mappable Arrow IPC file instead")
+    parser.add_argument('--tenant', default=os.getenv('TENANT_ID') or None, help="school to export (multi-school deployments)")
+    args = parser.parse_args()
+
+    db = DatabaseHelper(tenant=args.tenant)
+    if args.snapshot:
+        rows = write_arrow_snapshot(db, args.path)
+        print(f"Wrote {rows} rows to {args.path}")
+        return
+    terms = None
+    if args.all_terms:
+        terms = db.list_terms()
+        if terms is None:
+            raise RuntimeError("Could not read the term list from TERMS; nothing exported")
+    rows, files = export_parquet(db, args.path, partition_by=args.partition_by, terms=terms)
+    print(f"Wrote {rows} rows to {len(files)} file(s) under {args.path}")
+
+
+if __name__ == "__main__":
+    main()
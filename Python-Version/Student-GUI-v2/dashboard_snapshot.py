@@ -0,0 +1,138 @@
+"""
+Precomputed Performance dashboard.
+
+build_snapshot() runs the heavy Performance-screen queries once (student count,
+class average, toppers, per-subject averages, grade distribution) and stores the
+result in DASHBOARD_SNAPSHOT together with the data version (MARKS_CHANGES
+sequence) it was built from. The GUI shows the stored snapshot instantly and only
+rebuilds it in the background when the data version has moved on.
+
+Run on demand or on a schedule:
+    python dashboard_snapshot.py              # build once for the active term
+    python dashboard_snapshot.py --every 300  # rebuild every 5 minutes when data changed
+"""
+
+import os
+import json
+import time
+import argparse
+from database_helper import DatabaseHelper, SUBJ_MAP, REVERSE_SUBJ_MAP
+from analytics import get_analytics
+
+
+def compute_dashboard(db, term=None):
+    """Aggregate the Performance-screen metrics in SQL for one term (default: active)."""
+    term_id, academic_year = db.term_key(term)
+    conn = db.connect(read_only=True)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) AS N FROM STUDENTS")
+            total_students = cursor.fetchone()['N']
+            # Mean of per-student averages, like the old pandas df['Avg'].mean()
+            cursor.execute("""
+                SELECT ROUND(AVG(STUDENT_AVG), 2) AS CLASS_AVG FROM (
+                    SELECT AVG(MARKS) AS STUDENT_AVG FROM MARKS
+                    WHERE ACADEMIC_YEAR = %s AND TERM_ID = %s
+                    GROUP BY ROLL_NO
+                ) t
+            """, (academic_year, term_id))
+            class_avg = cursor.fetchone()['CLASS_AVG']
+            cursor.execute("""
+                SELECT SUBJ_ID, ROUND(AVG(MARKS), 2) AS AVG_MARKS FROM MARKS
+                WHERE ACADEMIC_YEAR = %s AND TERM_ID = %s
+                GROUP BY SUBJ_ID
+            """, (academic_year, term_id))
+            subject_avgs = {sub_name: None for sub_name in SUBJ_MAP}
+            for row in cursor.fetchall():
+                if row['SUBJ_ID'] in REVERSE_SUBJ_MAP:
+                    subject_avgs[REVERSE_SUBJ_MAP[row['SUBJ_ID']]] = float(row['AVG_MARKS'])
+    finally:
+        conn.close()
+
+    analytics = get_analytics(db, (term_id, academic_year))
+    toppers = analytics.toppers(limit=3)
+    return {
+        'TERM_ID': term_id,
+        'ACADEMIC_YEAR': academic_year,
+        'TOTAL_STUDENTS': total_students,
+        'CLASS_AVG': float(class_avg) if class_avg is not None else None,
+        'TOPPER_NAME': ", ".join(row['NAME'] for row in toppers) if toppers else None,
+        'SUBJECT_AVGS': subject_avgs,
+        'GRADE_COUNTS': analytics.grade_distribution()['Overall'],
+    }
+
+
+def build_snapshot(db, term=None):
+    """Recompute the dashboard and store it. Returns the stored snapshot dict."""
+    # Read the version first: a save racing with the build leaves the snapshot marked stale
+    version = db.get_data_version()
+    snapshot = compute_dashboard(db, term)
+    conn = db.connect()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                REPLACE INTO DASHBOARD_SNAPSHOT
+                    (TERM_ID, ACADEMIC_YEAR, DATA_VERSION, BUILT_AT, TOTAL_STUDENTS,
+                     CLASS_AVG, TOPPER_NAME, SUBJECT_AVGS, GRADE_COUNTS)
+                VALUES (%s, %s, %s, NOW(), %s, %s, %s, %s, %s)
+            """, (snapshot['TERM_ID'], snapshot['ACADEMIC_YEAR'], version, snapshot['TOTAL_STUDENTS'],
+                  snapshot['CLASS_AVG'], snapshot['TOPPER_NAME'],
+                  json.dumps(snapshot['SUBJECT_AVGS']), json.dumps(snapshot['GRADE_COUNTS'])))
+        conn.commit()
+    finally:
+        conn.close()
+    # Read back from the primary: a replica may not have the new row yet
+    return load_snapshot(db, term, read_only=False)
+
+
+def load_snapshot(db, term=None, read_only=True):
+    """Stored snapshot for a term (default: active), or None if it was never built."""
+    term_id, academic_year = db.term_key(term)
+    conn = db.connect(read_only=read_only)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT TERM_ID, ACADEMIC_YEAR, DATA_VERSION, BUILT_AT, TOTAL_STUDENTS,
+                    CLASS_AVG, TOPPER_NAME, SUBJECT_AVGS, GRADE_COUNTS
+                FROM DASHBOARD_SNAPSHOT
+                WHERE ACADEMIC_YEAR = %s AND TERM_ID = %s
+            """, (academic_year, term_id))
+            row = cursor.fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    row['CLASS_AVG'] = float(row['CLASS_AVG']) if row['CLASS_AVG'] is not None else None
+    row['SUBJECT_AVGS'] = json.loads(row['SUBJECT_AVGS'])
+    row['GRADE_COUNTS'] = json.loads(row['GRADE_COUNTS'])
+    return row
+
+
+def is_stale(db, snapshot):
+    return snapshot is None or snapshot['DATA_VERSION'] < db.get_data_version()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the Performance dashboard snapshot")
+    parser.add_argument('--every', type=int, metavar='SECONDS', help="keep running and rebuild when data changed")
+    parser.add_argument('--tenant', default=os.getenv('TENANT_ID') or None, help="school to build for (multi-school deployments)")
+    args = parser.parse_args()
+
+    db = DatabaseHelper(tenant=args.tenant)
+    while True:
+        try:
+            snapshot = load_snapshot(db)
+            if is_stale(db, snapshot):
+                snapshot = build_snapshot(db)
+                print(f"Snapshot built at {snapshot['BUILT_AT']} (data version {snapshot['DATA_VERSION']})")
+            else:
+                print(f"Snapshot up to date (data version {snapshot['DATA_VERSION']})")
+        except Exception as e:
+            print(f"Error building snapshot: {e}")
+        if not args.every:
+            break
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,18 @@
 import pymysql
+from pymysql.constants import SERVER_STATUS
 import os
+import time
+import zlib
+import hashlib
+import itertools
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import uuid_utils as uuid  # uuid_utils is a Rust-backed drop-in; uuid7() gives time-ordered IDs
 from dotenv import load_dotenv
+from input_validator import validate_student_data, validate_class_name
+from resilience import RetryPolicy, CircuitBreaker, call_with_retry, is_transient
+from student_totals import TOTALS_UPSERT
 
 load_dotenv()
 
@@ -12,6 +23,8 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASS'),
     'database': os.getenv('DB_NAME'),
     'cursorclass': pymysql.cursors.DictCursor,
+    # Fail a dead host quickly; transient failures are retried (see RETRY_POLICY)
+    'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 5)),
     'ssl': {}
 }
 
@@ -26,19 +39,602 @@ SUBJ_MAP = {
 
 REVERSE_SUBJ_MAP = {v: k for k, v in SUBJ_MAP.items()}
 
+# Seconds the active term is cached before TERMS is read again
+TERM_CACHE_SECONDS = 60
+
+# Column order of every pivoted student row returned by the read APIs
+RECORD_FIELDS = ('ROLL_NO', 'NAME') + tuple(SUBJ_MAP)
+# Orders iter_records can stream in: any record field, or a student's total / average for the term
+SORT_FIELDS = RECORD_FIELDS + ('TOTAL', 'AVERAGE')
+
+
+class NoActiveTermError(LookupError):
+    """TERMS has no active row and the call did not name a term."""
+
+
+class StudentRecord:
+    """
+    Compact pivoted student row built from a tuple cursor.
+
+    One slot per column instead of a per-row dict with ten string keys. Supports
+    record['NAME'] / record.get('Maths') like the old DictCursor rows, iterates in
+    RECORD_FIELDS order and can be turned into a DataFrame with records_to_tuples.
+    """
+    __slots__ = RECORD_FIELDS
+
+    def __init__(self, *values):
+        for field, value in zip(RECORD_FIELDS, values):
+            setattr(self, field, value)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def keys(self):
+        return RECORD_FIELDS
+
+    def __iter__(self):
+        return (getattr(self, field) for field in RECORD_FIELDS)
+
+    def __len__(self):
+        return len(RECORD_FIELDS)
+
+    def __eq__(self, other):
+        if not isinstance(other, StudentRecord):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def __repr__(self):
+        return f"StudentRecord({', '.join(f'{f}={getattr(self, f)!r}' for f in RECORD_FIELDS)})"
+
+    def as_dict(self):
+        return dict(zip(RECORD_FIELDS, self))
+
+    @classmethod
+    def from_fields(cls, fields, values):
+        """Record with only fields (in that order) taken from values; the other fields are None."""
+        record = cls(*(None for _ in RECORD_FIELDS))
+        for field, value in zip(fields, values):
+            setattr(record, field, value)
+        return record
+
+
+def records_to_tuples(records):
+    """Flatten StudentRecords for pd.DataFrame.from_records(..., columns=RECORD_FIELDS)."""
+    return [tuple(record) for record in records]
+
+
+def pivot_columns(subjects=tuple(SUBJ_MAP)):
+    """One MAX(CASE ...) column per subject to pivot MARKS rows into a single student row."""
+    return ",\n".join(f"MAX(CASE WHEN m.SUBJ_ID = {SUBJ_MAP[sub]} THEN m.MARKS END) AS {sub}" for sub in subjects)
+
+
+PIVOT_COLUMNS = pivot_columns()
+
+# Roll numbers per IN (...) list in batched reads and deletes
+ROLL_BATCH_SIZE = 1000
+
+# Characters LOAD DATA would read as field or line separators (or escapes), written escaped
+TSV_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+# Server error codes raised when LOAD DATA LOCAL INFILE is disabled (local_infile=OFF)
+LOCAL_INFILE_DISABLED_ERRORS = (1148, 2068, 3948)
+
+# Idle connections kept per shard, and how long one may sit idle before it is pinged on checkout
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+POOL_PING_AFTER_SECONDS = 30
+
+# Seconds the tenant routing table is cached before TENANT_SHARDS is read again
+ROUTING_CACHE_SECONDS = 300
+
+# Read replicas of DB_CONFIG's database as "host[:port],..."; they share its credentials and TLS settings.
+# Tenant shards list theirs in TENANT_SHARDS.REPLICA_HOSTS.
+DB_READ_REPLICAS = os.getenv('DB_READ_REPLICAS', '')
+# Replicas missing a change older than this many seconds serve no reads
+REPLICA_MAX_LAG_SECONDS = int(os.getenv('DB_REPLICA_MAX_LAG', 5))
+# How often each replica's replication position is checked
+REPLICA_CHECK_SECONDS = 5
+
+# WAN transfer mode for a database across a slow, high-latency link: iter_records fetches
+# WAN_CHUNK_SIZE students per round trip, packed server-side into one COMPRESS()ed value
+WAN_MODE = os.getenv('DB_WAN_MODE', '0') == '1'
+WAN_CHUNK_SIZE = int(os.getenv('DB_WAN_CHUNK_SIZE', 2000))
+
+# Tries per call for transient errors, and consecutive failures that open a shard's circuit
+RETRY_POLICY = RetryPolicy(attempts=int(os.getenv('DB_RETRY_ATTEMPTS', 3)))
+# A failing replica is not retried: the read goes to the primary instead
+REPLICA_RETRY_POLICY = RetryPolicy(attempts=1)
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_SECONDS = 30
+
+# MARKS_CHANGES sequences below a fresh feed's start that are checked for holes still to commit
+FEED_LOOKBACK = 200
+
+
+class ConnectionPool:
+    """
+    Small pool of open connections to one shard (host, port, database).
+
+    connect() hands out a PooledConnection; its close() rolls back anything
+    uncommitted and returns the connection to the pool instead of closing it.
+    """
+
+    def __init__(self, config, size=POOL_SIZE):
+        self.config = config
+        self.size = size
+        self._idle = []  # (connection, returned_at)
+        self._lock = threading.Lock()
+        # One breaker per shard: every helper and thread talking to it shares the outage state
+        self.breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS)
+
+    def connect(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn, returned_at = self._idle.pop()
+            try:
+                # Only pay a round trip for connections that may have been dropped while idle
+                if time.monotonic() - returned_at > POOL_PING_AFTER_SECONDS:
+                    conn.ping(reconnect=False)
+                return PooledConnection(self, conn)
+            except Exception:
+                self._discard(conn)
+        return PooledConnection(self, pymysql.connect(**self.config))
+
+    def release(self, conn):
+        try:
+            # Undo anything the borrower left uncommitted; skipped (no round trip) when idle
+            if conn.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+                conn.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((conn, time.monotonic()))
+                return
+        self._discard(conn)
+
+    def clear(self):
+        """Close every idle connection, e.g. after a failure suggests they are all dead."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+class PooledConnection:
+    """Connection handed out by a ConnectionPool; close() returns it to the pool."""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+    def discard(self):
+        """Close the connection instead of returning it to the pool."""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool._discard(conn)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(config):
+    """Shared pool for the shard a connection config points at."""
+    key = (config.get('host'), config.get('port'), config.get('database'))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(config)
+        return _pools[key]
+
+
+class ReplicaSet:
+    """
+    Read replicas of one primary and how far each has caught up with it.
+
+    A background thread checks every REPLICA_CHECK_SECONDS which MARKS_CHANGES
+    sequence each replica has applied and, on the primary, how long ago the oldest
+    change the replica is still missing was made (its lag). choose() only hands out
+    replicas that are within REPLICA_MAX_LAG_SECONDS and have applied the sequence
+    the caller needs; otherwise the caller reads from the primary.
+    """
+
+    def __init__(self, primary_config, replica_configs):
+        self.primary_config = primary_config
+        self.replicas = [{'config': config, 'seq': None, 'lag': None} for config in replica_configs]
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._monitor, name="replica-monitor", daemon=True)
+        self._thread.start()
+
+    def choose(self, min_seq=0):
+        """Config of a replica that is current enough, round robin, or None to use the primary."""
+        with self._lock:
+            usable = [replica['config'] for replica in self.replicas
+                      if replica['seq'] is not None and replica['seq'] >= min_seq
+                      and replica['lag'] <= REPLICA_MAX_LAG_SECONDS]
+        return usable[next(self._turn) % len(usable)] if usable else None
+
+    def mark_down(self, config):
+        """Stop using a replica that failed until the next check finds it working."""
+        with self._lock:
+            for replica in self.replicas:
+                if replica['config'] is config:
+                    replica['seq'] = None
+
+    def status(self):
+        """List of (host, port, applied MARKS_CHANGES sequence, lag in seconds); None while unreachable."""
+        with self._lock:
+            return [(r['config']['host'], r['config']['port'], r['seq'], r['lag']) for r in self.replicas]
+
+    def _monitor(self):
+        while True:
+            for replica in self.replicas:
+                try:
+                    seq = self._query(replica['config'], "SELECT COALESCE(MAX(SEQ), 0) AS SEQ FROM MARKS_CHANGES")['SEQ']
+                    oldest_missing = self._query(self.primary_config, """
+                        SELECT TIMESTAMPDIFF(SECOND, CHANGED_AT, NOW()) AS AGE FROM MARKS_CHANGES
+                        WHERE SEQ > %s ORDER BY SEQ LIMIT 1
+                    """, (seq,))
+                    lag = oldest_missing['AGE'] if oldest_missing else 0
+                except Exception as e:
+                    if replica['lag'] is not None:  # report the outage once, not every check
+                        print(f"Replica {replica['config']['host']} unavailable: {e}")
+                    seq, lag = None, None
+                with self._lock:
+                    replica['seq'], replica['lag'] = seq, lag
+            time.sleep(REPLICA_CHECK_SECONDS)
+
+    @staticmethod
+    def _query(config, sql, params=()):
+        conn = get_pool(config).connect()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(sql, params)
+                return cursor.fetchone()
+        finally:
+            conn.close()
+
+
+def parse_replica_hosts(hosts, primary_config):
+    """Connection configs for a "host[:port],..." replica list, sharing primary_config's other settings."""
+    configs = []
+    for entry in (hosts or "").split(","):
+        host, _, port = entry.strip().partition(":")
+        if host:
+            configs.append({**primary_config, 'host': host, 'port': int(port) if port else primary_config['port']})
+    return configs
+
+
+_replica_sets = {}
+
+
+def get_replica_set(config, hosts):
+    """Shared ReplicaSet for a primary and its replica list."""
+    key = (config.get('host'), config.get('port'), config.get('database'), hosts)
+    with _pools_lock:
+        if key not in _replica_sets:
+            _replica_sets[key] = ReplicaSet(config, parse_replica_hosts(hosts, config))
+        return _replica_sets[key]
+
+
+class ShardRouter:
+    """
+    Maps tenants (schools) to shard databases using the TENANT_SHARDS routing table
+    in the directory database that DB_CONFIG points at. Shards share the DB_USER
+    credentials and TLS settings of DB_CONFIG.
+    """
+
+    def __init__(self, directory_config=DB_CONFIG):
+        self.directory_config = directory_config
+        self._routes = None
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+
+    def routes(self):
+        with self._lock:
+            if self._routes is None or time.monotonic() - self._loaded_at > ROUTING_CACHE_SECONDS:
+                conn = get_pool(self.directory_config).connect()
+                try:
+                    with conn.cursor() as cursor:
+                        cursor.execute("SELECT TENANT_ID, SHARD_HOST, SHARD_PORT, DB_NAME, REPLICA_HOSTS FROM TENANT_SHARDS")
+                        self._routes = {row['TENANT_ID']: row for row in cursor.fetchall()}
+                        self._loaded_at = time.monotonic()
+                finally:
+                    conn.close()
+            return self._routes
+
+    def config_for(self, tenant):
+        route = self.routes().get(tenant)
+        if route is None:
+            raise ValueError(f"Unknown tenant: {tenant}")
+        return {**self.directory_config, 'host': route['SHARD_HOST'], 'port': route['SHARD_PORT'], 'database': route['DB_NAME']}
+
+    def replica_hosts_for(self, tenant):
+        return self.routes()[tenant]['REPLICA_HOSTS']
+
+    def tenants(self):
+        return sorted(self.routes())
+
+
+ROUTER = ShardRouter()
+
+
 class DatabaseHelper:
-    def __init__(self):
+    def __init__(self, tenant=None, wan_mode=None):
+        """
+        Args:
+            tenant: TENANT_SHARDS.TENANT_ID to route to; None uses DB_CONFIG directly
+                    (single-school deployments)
+            wan_mode: Fetch records in large compressed chunks (see iter_records);
+                      defaults to DB_WAN_MODE
+        """
         self.conn = None
+        self.tenant = tenant
+        self.wan_mode = WAN_MODE if wan_mode is None else wan_mode
+        self._active_term = None
+        self._active_term_at = 0
+        # Highest MARKS_CHANGES sequence this helper has written or read. Replicas serve its
+        # reads only once they have applied it: reads see our own saves and never go back in time.
+        self._min_seq = 0
+        self._seq_lock = threading.Lock()
+        self._primary_until = 0  # monotonic time until which reads stay on the primary
 
-    def connect(self):
-        return pymysql.connect(**DB_CONFIG)
+    def config(self):
+        """Connection settings for this helper's tenant (its primary)."""
+        return DB_CONFIG if self.tenant is None else ROUTER.config_for(self.tenant)
+
+    def replica_set(self):
+        """ReplicaSet of this tenant's shard, or None when it has no read replicas."""
+        hosts = DB_READ_REPLICAS if self.tenant is None else ROUTER.replica_hosts_for(self.tenant)
+        return get_replica_set(self.config(), hosts) if hosts else None
+
+    def connect(self, read_only=False, **overrides):
+        """
+        Connection to this tenant's shard; transient connect failures are retried, and fail fast while the circuit is open.
+
+        Args:
+            read_only: The connection is only used for reads, so it may go to a replica
+                       that is current enough (see _read_target)
+            overrides: Per-call connection settings (e.g. local_infile), always on the primary
+        """
+        if read_only and not overrides:
+            replicas, config = self._read_target()
+            if replicas is not None:
+                pool = get_pool(config)
+                try:
+                    return call_with_retry(pool.connect, REPLICA_RETRY_POLICY, pool.breaker, on_transient=lambda e: pool.clear())
+                except Exception as e:
+                    if not is_transient(e):
+                        raise
+                    print(f"Replica {config['host']} failed, reading from the primary: {e}")
+                    replicas.mark_down(config)
+        pool = get_pool(self.config())
+        # Per-call settings (e.g. local_infile) get a dedicated connection outside the pool
+        if overrides:
+            return call_with_retry(lambda: pymysql.connect(**{**self.config(), **overrides}), RETRY_POLICY, pool.breaker)
+        return call_with_retry(pool.connect, RETRY_POLICY, pool.breaker, on_transient=lambda e: pool.clear())
+
+    def _run(self, operation, idempotent=True, read_only=False):
+        """
+        Run operation(conn) with retries and circuit breaking.
+
+        Every attempt gets its own pooled connection, so operation must do all of its
+        work, commit included. Connections that failed transiently are thrown away.
+
+        Args:
+            operation: Callable taking a connection; its return value is passed through
+            idempotent: Whether repeating operation after an unknown outcome (connection
+                        lost mid-statement) is harmless
+            read_only: operation only reads, so it may run on a replica; a replica that
+                       fails is not retried, the read moves to the primary instead
+
+        Anything else is taken to be a write, after which reads wait for a replica that
+        has caught up with it. Reads that must see the primary use _read_primary().
+        """
+        if read_only:
+            replicas, config = self._read_target()
+            if replicas is not None:
+                try:
+                    return self._run_on(get_pool(config), operation, idempotent, REPLICA_RETRY_POLICY)
+                except Exception as e:
+                    if not is_transient(e):
+                        raise
+                    print(f"Replica {config['host']} failed, reading from the primary: {e}")
+                    replicas.mark_down(config)
+            return self._run_on(get_pool(self.config()), operation, idempotent, RETRY_POLICY)
+        return self._run_on(get_pool(self.config()), operation, idempotent, RETRY_POLICY, after=self._raise_min_seq)
+
+    def _read_primary(self, operation):
+        """Run a read on the primary (e.g. a row version to save against), with retries."""
+        return self._run_on(get_pool(self.config()), operation, True, RETRY_POLICY)
+
+    @staticmethod
+    def _run_on(pool, operation, idempotent, policy, after=None):
+        def attempt():
+            conn = pool.connect()
+            try:
+                result = operation(conn)
+            except Exception as e:
+                if is_transient(e):
+                    conn.discard()
+                raise
+            else:
+                if after is not None:
+                    after(conn)
+                return result
+            finally:
+                conn.close()
+
+        return call_with_retry(attempt, policy, pool.breaker, idempotent, on_transient=lambda e: pool.clear())
+
+    def _read_target(self):
+        """(ReplicaSet, replica config) to read from, or (None, primary config)."""
+        replicas = self.replica_set()
+        config = None
+        if replicas is not None and time.monotonic() >= self._primary_until:
+            config = replicas.choose(self._min_seq)
+        if config is None:
+            return None, self.config()
+        return replicas, config
+
+    def _saw_seq(self, seq):
+        with self._seq_lock:
+            self._min_seq = max(self._min_seq, seq)
+
+    def _raise_min_seq(self, conn):
+        """After work on the primary: hold reads there until a replica has caught up with it."""
+        if self.replica_set() is None:
+            return
+        try:
+            with conn.cursor(pymysql.cursors.Cursor) as cursor:
+                cursor.execute("SELECT COALESCE(MAX(SEQ), 0) FROM MARKS_CHANGES")
+                self._saw_seq(cursor.fetchone()[0])
+        except Exception as e:
+            # The work itself is done; without its position, read from the primary until any replica could have it
+            print(f"Could not read the change sequence after a write: {e}")
+            self._primary_until = time.monotonic() + REPLICA_MAX_LAG_SECONDS + REPLICA_CHECK_SECONDS
+
+    def replica_status(self):
+        """ReplicaSet.status() for this tenant's shard; empty without read replicas."""
+        replicas = self.replica_set()
+        return replicas.status() if replicas is not None else []
+
+    def resilience_metrics(self):
+        """Retry and circuit-breaker counters for this tenant's shard, plus the circuit state."""
+        breaker = get_pool(self.config()).breaker
+        return {**breaker.metrics.snapshot(), 'circuit': breaker.state}
+
+    # --- Terms ---
+    def get_active_term(self):
+        """
+        TERMS row (TERM_ID, ACADEMIC_YEAR, TERM_NAME, EXAM) used when a call does not name a term.
+
+        Raises NoActiveTermError when no term is active, so saves fail instead of
+        landing in a made-up term.
+        """
+        if self._active_term is None or time.monotonic() - self._active_term_at > TERM_CACHE_SECONDS:
+            def read(conn):
+                with conn.cursor() as cursor:
+                    cursor.execute("""
+                        SELECT TERM_ID, ACADEMIC_YEAR, TERM_NAME, EXAM FROM TERMS
+                        WHERE IS_ACTIVE = 1
+                        ORDER BY ACADEMIC_YEAR DESC, TERM_ID DESC
+                        LIMIT 1
+                    """)
+                    return cursor.fetchone()
+            term = self._read_primary(read)
+            if term is None:
+                raise NoActiveTermError("No active term: set one in TERMS (set_active_term) before reading or saving marks")
+            self._active_term = term
+            self._active_term_at = time.monotonic()
+        return self._active_term
 
-    def save_student_marks(self, name, roll_no, marks_dict):
+    def list_terms(self):
+        def read(conn):
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT TERM_ID, ACADEMIC_YEAR, TERM_NAME, EXAM, IS_ACTIVE FROM TERMS ORDER BY ACADEMIC_YEAR, TERM_ID")
+                return cursor.fetchall()
+        try:
+            return self._read_primary(read)
+        except Exception as e:
+            print(f"Error fetching terms: {e}")
+            return None
+
+    def set_active_term(self, term_id):
         conn = self.connect()
         try:
+            with conn.cursor() as cursor:
+                if not cursor.execute("SELECT 1 FROM TERMS WHERE TERM_ID=%s", (term_id,)):
+                    return False, f"Unknown term {term_id}"
+                cursor.execute("UPDATE TERMS SET IS_ACTIVE = (TERM_ID = %s)", (term_id,))
+            conn.commit()
+            self._active_term = None
+            return True, "Active term updated"
+        except Exception as e:
+            return False, str(e)
+        finally:
+            conn.close()
+
+    def create_term(self, term_id, academic_year, term_name, exam, activate=False):
+        """Add a TERMS row, creating the MARKS partition for its academic year if needed."""
+        conn = self.connect()
+        try:
+            with conn.cursor() as cursor:
+                # Partition DDL commits implicitly, so it runs before the TERMS insert
+                self._ensure_year_partition(cursor, academic_year)
+                cursor.execute("""
+                    INSERT INTO TERMS (TERM_ID, ACADEMIC_YEAR, TERM_NAME, EXAM)
+                    VALUES (%s, %s, %s, %s)
+                """, (term_id, academic_year, term_name, exam))
+            conn.commit()
+        except Exception as e:
+            return False, str(e)
+        finally:
+            conn.close()
+        if activate:
+            return self.set_active_term(term_id)
+        return True, "Term created"
+
+    @staticmethod
+    def _ensure_year_partition(cursor, academic_year):
+        cursor.execute("""
+            SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'MARKS' AND PARTITION_NAME IS NOT NULL
+        """)
+        bounds = [int(row['PARTITION_DESCRIPTION']) for row in cursor.fetchall()
+                  if row['PARTITION_DESCRIPTION'] != 'MAXVALUE']
+        if not bounds:
+            return  # MARKS is not partitioned (older install)
+        # Years below the highest bound already have a partition; split pmax for the rest
+        for year in range(max(bounds), academic_year + 1):
+            cursor.execute(f"""
+                ALTER TABLE MARKS REORGANIZE PARTITION pmax INTO (
+                    PARTITION p{year} VALUES LESS THAN ({year + 1}),
+                    PARTITION pmax VALUES LESS THAN MAXVALUE
+                )
+            """)
+
+    def term_key(self, term=None):
+        """(TERM_ID, ACADEMIC_YEAR) for a TERMS row dict, a (term_id, academic_year) pair, or the active term."""
+        if term is None:
+            term = self.get_active_term()
+        if isinstance(term, dict):
+            return term['TERM_ID'], term['ACADEMIC_YEAR']
+        term_id, academic_year = term
+        return term_id, academic_year
+
+    # --- Students and marks ---
+    def save_student_marks(self, name, roll_no, marks_dict, term=None):
+        # Blind last-writer-wins save for new entries; edits of loaded records use update_student_marks.
+        # Absolute upserts, so repeating the whole transaction after a lost connection is harmless
+        def write(conn):
             with conn.cursor() as cursor:
                 # Insert or Update Student
-                cursor.execute("INSERT INTO STUDENTS (ROLL_NO, NAME) VALUES (%s, %s) ON DUPLICATE KEY UPDATE NAME=%s", (roll_no, name, name))
+                cursor.execute("INSERT INTO STUDENTS (ROLL_NO, NAME) VALUES (%s, %s) ON DUPLICATE KEY UPDATE NAME=%s, VERSION=VERSION+1", (roll_no, name, name))
                 
                 # Insert Marks
                 for sub_name, marks in marks_dict.items():
@@ -46,60 +642,936 @@ class DatabaseHelper:
                     sub_id = SUBJ_MAP.get(sub_name)
                     if sub_id:
                         unique_id = str(uuid.uuid7())  # UUID v7: time-ordered, sequential, globally unique
-                        # Check if marks already exist for this roll_no and subj_id, if so update, else insert
-                        # Note: The original code didn't have a unique constraint on (ROLL_NO, SUBJ_ID) besides the UUID ID.
-                        # I'll stick to the original logic of adding new entries or I can improve it.
-                        # Improvement: Delete old marks for this student/subject before inserting new ones to avoid duplicates.
-                        cursor.execute("DELETE FROM MARKS WHERE ROLL_NO=%s AND SUBJ_ID=%s", (roll_no, sub_id))
+                        # One row per student/subject/term: re-saving updates this term only, earlier terms are kept
                         cursor.execute("""
-                            INSERT INTO MARKS (ID, ROLL_NO, SUBJ_ID, MARKS) 
-                            VALUES (%s, %s, %s, %s)
-                        """, (unique_id, roll_no, sub_id, int(marks)))
+                            INSERT INTO MARKS (ID, ROLL_NO, SUBJ_ID, MARKS, TERM_ID, ACADEMIC_YEAR)
+                            VALUES (%s, %s, %s, %s, %s, %s)
+                            ON DUPLICATE KEY UPDATE MARKS = VALUES(MARKS), VERSION = VERSION + 1
+                        """, (unique_id, roll_no, sub_id, int(marks), term_id, academic_year))
+                self._refresh_totals(cursor, [roll_no], term_id, academic_year)
+                cursor.execute("INSERT INTO MARKS_CHANGES (ROLL_NO, OP) VALUES (%s, 'UPSERT')", (roll_no,))
             conn.commit()
+
+        try:
+            term_id, academic_year = self.term_key(term)
+            self._run(write)
             return True, "Data Saved Successfully"
         except Exception as e:
             print(f"Database Connection Error: {e}")
             return False, f"Connection Failed: {str(e)}"
-        finally:
-            if 'conn' in locals() and conn:
-                conn.close()
 
-    def get_all_records(self):
-        conn = None
-        try:
-            conn = self.connect()
+    def save_students_batch(self, entries, term=None):
+        """
+        Save several students in one transaction (the write-behind queue's flush).
+
+        Args:
+            entries: Iterable of dicts with 'roll_no', 'name' and 'marks' ({subject: marks,
+                     "" to leave a subject unchanged}), already validated
+            term: TERMS row or (term_id, academic_year); defaults to the active term
+
+        Raises on any error, in which case nothing was written.
+        """
+        entries = list(entries)
+        term_id, academic_year = self.term_key(term)
+        students = [(entry['roll_no'], entry['name']) for entry in entries]
+        marks = [
+            (str(uuid.uuid7()), entry['roll_no'], SUBJ_MAP[sub_name], int(value), term_id, academic_year)
+            for entry in entries for sub_name, value in entry['marks'].items()
+            if value != "" and sub_name in SUBJ_MAP
+        ]
+
+        def write(conn):
             with conn.cursor() as cursor:
+                cursor.executemany("""
+                    INSERT INTO STUDENTS (ROLL_NO, NAME) VALUES (%s, %s)
+                    ON DUPLICATE KEY UPDATE NAME = VALUES(NAME), VERSION = VERSION + 1
+                """, students)
+                if marks:
+                    cursor.executemany("""
+                        INSERT INTO MARKS (ID, ROLL_NO, SUBJ_ID, MARKS, TERM_ID, ACADEMIC_YEAR)
+                        VALUES (%s, %s, %s, %s, %s, %s)
+                        ON DUPLICATE KEY UPDATE MARKS = VALUES(MARKS), VERSION = VERSION + 1
+                    """, marks)
+                self._refresh_totals(cursor, [roll_no for roll_no, _ in students], term_id, academic_year)
+                cursor.executemany("INSERT INTO MARKS_CHANGES (ROLL_NO, OP) VALUES (%s, 'UPSERT')",
+                                   [(roll_no,) for roll_no, _ in students])
+            conn.commit()
+
+        self._run(write)
+
+    @staticmethod
+    def _refresh_totals(cursor, roll_nos, term_id, academic_year):
+        """Bring the STUDENT_TOTALS rows of roll_nos up to date, in the caller's transaction."""
+        roll_nos = list(roll_nos)
+        for start in range(0, len(roll_nos), ROLL_BATCH_SIZE):
+            batch = roll_nos[start:start + ROLL_BATCH_SIZE]
+            cursor.execute(TOTALS_UPSERT.format(roll_nos=', '.join(['%s'] * len(batch))), [academic_year, term_id] + batch)
+
+    def get_student(self, roll_no, term=None):
+        """
+        Load one student for editing.
+
+        Returns:
+            (StudentRecord, version) or None if the roll number does not exist. Pass
+            the version to update_student_marks to save the edit.
+        """
+        def read(conn):
+            with conn.cursor(pymysql.cursors.Cursor) as cursor:
+                cursor.execute(f"""
+                    SELECT s.ROLL_NO, s.NAME,
+                        {PIVOT_COLUMNS},
+                        s.VERSION
+                    FROM STUDENTS s
+                    LEFT JOIN MARKS m ON s.ROLL_NO = m.ROLL_NO AND m.ACADEMIC_YEAR = %s AND m.TERM_ID = %s
+                    WHERE s.ROLL_NO = %s
+                    GROUP BY s.ROLL_NO, s.NAME, s.VERSION
+                """, (academic_year, term_id, roll_no))
+                return cursor.fetchone()
+
+        term_id, academic_year = self.term_key(term)
+        row = self._read_primary(read)
+        return (StudentRecord(*row[:-1]), row[-1]) if row else None
+
+    def update_student_marks(self, name, roll_no, marks_dict, expected_version, term=None):
+        """
+        Save an edit only if nobody else wrote the student since it was loaded.
+
+        Compare-and-swap on STUDENTS.VERSION: the UPDATE matches only while the row still
+        holds expected_version, and it locks just that student's row, so edits of
+        different students never wait on each other.
+
+        Args:
+            expected_version: Version returned by get_student when the edit started
+
+        Returns:
+            (success, msg, version): the new version on success. On a conflict success is
+            False and version is the current one (None if the student was deleted).
+            Raises on connection errors.
+        """
+        def write(conn):
+            with conn.cursor() as cursor:
+                cursor.execute("UPDATE STUDENTS SET NAME=%s, VERSION=VERSION+1 WHERE ROLL_NO=%s AND VERSION=%s",
+                               (name, roll_no, expected_version))
+                if cursor.rowcount == 0:
+                    conn.rollback()
+                    cursor.execute("SELECT VERSION FROM STUDENTS WHERE ROLL_NO=%s", (roll_no,))
+                    row = cursor.fetchone()
+                    return False, row['VERSION'] if row else None
+                for sub_name, marks in marks_dict.items():
+                    if marks == "": continue
+                    sub_id = SUBJ_MAP.get(sub_name)
+                    if sub_id:
+                        cursor.execute("""
+                            INSERT INTO MARKS (ID, ROLL_NO, SUBJ_ID, MARKS, TERM_ID, ACADEMIC_YEAR)
+                            VALUES (%s, %s, %s, %s, %s, %s)
+                            ON DUPLICATE KEY UPDATE MARKS = VALUES(MARKS), VERSION = VERSION + 1
+                        """, (str(uuid.uuid7()), roll_no, sub_id, int(marks), term_id, academic_year))
+                self._refresh_totals(cursor, [roll_no], term_id, academic_year)
+                cursor.execute("INSERT INTO MARKS_CHANGES (ROLL_NO, OP) VALUES (%s, 'UPSERT')", (roll_no,))
+            conn.commit()
+            return True, expected_version + 1
+
+        term_id, academic_year = self.term_key(term)
+        # Not idempotent: after a lost commit acknowledgement a retry would report a false conflict
+        saved, version = self._run(write, idempotent=False)
+        if not saved:
+            if version is None:
+                return False, f"Roll No {roll_no} was deleted by another user", None
+            return False, f"Roll No {roll_no} was changed by another user since you opened it", version
+        return True, "Data Saved Successfully", version
+
+    def get_all_records(self, term=None):
+        def read(conn):
+            with conn.cursor(pymysql.cursors.Cursor) as cursor:
                 # Pivot marks for easier display
-                query = """
+                query = f"""
                 SELECT s.ROLL_NO, s.NAME,
-                    MAX(CASE WHEN m.SUBJ_ID = 101 THEN m.MARKS END) AS Science,
-                    MAX(CASE WHEN m.SUBJ_ID = 102 THEN m.MARKS END) AS Social,
-                    MAX(CASE WHEN m.SUBJ_ID = 103 THEN m.MARKS END) AS Maths,
-                    MAX(CASE WHEN m.SUBJ_ID = 104 THEN m.MARKS END) AS English,
-                    MAX(CASE WHEN m.SUBJ_ID = 105 THEN m.MARKS END) AS Hindi,
-                    MAX(CASE WHEN m.SUBJ_ID = 106 THEN m.MARKS END) AS Kannada
+                    {PIVOT_COLUMNS}
                 FROM STUDENTS s
-                LEFT JOIN MARKS m ON s.ROLL_NO = m.ROLL_NO
+                LEFT JOIN MARKS m ON s.ROLL_NO = m.ROLL_NO AND m.ACADEMIC_YEAR = %s AND m.TERM_ID = %s
                 GROUP BY s.ROLL_NO, s.NAME
                 """
-                cursor.execute(query)
-                return cursor.fetchall()
+                cursor.execute(query, (academic_year, term_id))
+                return [StudentRecord(*row) for row in cursor.fetchall()]
+
+        try:
+            if self.wan_mode:
+                return list(self.iter_records(page_size=WAN_CHUNK_SIZE, term=term))
+            term_id, academic_year = self.term_key(term)
+            return self._run(read, read_only=True)
         except Exception as e:
             print(f"Error fetching records: {e}")
             return None # Return None to indicate error
+
+    def iter_records(self, page_size=500, after_roll=None, filters=None, term=None, fields=None,
+                     order_by=None, descending=False):
+        """
+        Stream pivoted student rows in ROLL_NO order, one page per query.
+
+        Uses keyset pagination (ROLL_NO > last seen) so every page is an index range
+        scan on the STUDENTS primary key, however deep into the roster it is.
+
+        In WAN mode pages are at least WAN_CHUNK_SIZE students, and each page comes back
+        as a single value: its rows joined as tab-separated text and zlib-compressed by
+        the server (COMPRESS). PyMySQL cannot compress the MySQL protocol itself, and
+        over TLS nothing on the way can compress either, so this is where the bytes are
+        saved. It costs the server a little CPU per page.
+
+        Args:
+            page_size: Number of students fetched per round trip
+            after_roll: Resume after this roll number (exclusive)
+            filters: Optional dict; 'search' matches a substring of the roll number
+                     or name, 'roll_nos' restricts to an iterable of roll numbers,
+                     'class_name' to one class (None for students without a class)
+            term: TERMS row or (term_id, academic_year); defaults to the active term
+            fields: RECORD_FIELDS the caller needs (ROLL_NO is always included); the
+                    others are not fetched and are None in the records. Default: all
+            order_by: A SORT_FIELDS column to stream in instead of ROLL_NO order (see
+                      _iter_sorted); after_roll does not apply then
+            descending: Reverse the order
+
+        Yields:
+            One StudentRecord per student, like the rows of get_all_records
+        """
+        filters = filters or {}
+        conditions, filter_params = [], []
+        if filters.get('search'):
+            pattern = "%" + filters['search'].replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            conditions.append("(CAST(s.ROLL_NO AS CHAR) LIKE %s OR s.NAME LIKE %s)")
+            filter_params += [pattern, pattern]
+        if filters.get('roll_nos') is not None:
+            roll_nos = list(filters['roll_nos'])
+            if not roll_nos:
+                return
+            conditions.append(f"s.ROLL_NO IN ({', '.join(['%s'] * len(roll_nos))})")
+            filter_params += roll_nos
+        if 'class_name' in filters:
+            if filters['class_name'] is None:
+                conditions.append("s.CLASS_NAME IS NULL")
+            else:
+                conditions.append("s.CLASS_NAME = %s")
+                filter_params.append(filters['class_name'])
+
+        wanted = RECORD_FIELDS if fields is None else set(fields)
+        unknown = set(wanted) - set(RECORD_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        columns = [field for field in RECORD_FIELDS if field == 'ROLL_NO' or field in wanted]
+        subjects = [field for field in columns if field in SUBJ_MAP]
+        select_sql = ", ".join(["s.ROLL_NO"] + (["s.NAME"] if 'NAME' in columns else [])
+                               + ([pivot_columns(subjects)] if subjects else []))
+        join_sql = "LEFT JOIN MARKS m ON s.ROLL_NO = m.ROLL_NO AND m.ACADEMIC_YEAR = %s AND m.TERM_ID = %s" if subjects else ""
+        term_id, academic_year = self.term_key(term)
+        join_params = [academic_year, term_id] if subjects else []
+        if self.wan_mode:
+            page_size = max(page_size, WAN_CHUNK_SIZE)
+        if order_by not in (None, 'ROLL_NO') or descending:
+            if after_roll is not None:
+                raise ValueError("after_roll only applies in ROLL_NO order")
+            yield from self._iter_sorted(conditions, filter_params, order_by or 'ROLL_NO', descending, page_size, term, fields)
+            return
+
+        conn = self.connect(read_only=True)
+        try:
+            with conn.cursor(pymysql.cursors.Cursor) as cursor:
+                if self.wan_mode:
+                    # Room for a whole page in one GROUP_CONCAT value (the default is 1 KB)
+                    cursor.execute("SET SESSION group_concat_max_len = 67108864")
+                while True:
+                    where = list(conditions)
+                    params = list(filter_params)
+                    if after_roll is not None:
+                        where.append("s.ROLL_NO > %s")
+                        params.append(after_roll)
+                    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+                    # Page over STUDENTS first so the pivot only touches this page's marks
+                    page_sql = f"""
+                        SELECT {select_sql}
+                        FROM (
+                            SELECT ROLL_NO, NAME FROM STUDENTS s
+                            {where_sql}
+                            ORDER BY ROLL_NO
+                            LIMIT %s
+                        ) s
+                        {join_sql}
+                        GROUP BY s.ROLL_NO, s.NAME
+                        ORDER BY s.ROLL_NO
+                    """
+                    if self.wan_mode:
+                        page = self._fetch_packed_page(cursor, page_sql, params + [page_size] + join_params, columns)
+                    else:
+                        cursor.execute(page_sql, params + [page_size] + join_params)
+                        page = cursor.fetchall()
+                    if fields is None:
+                        yield from (StudentRecord(*row) for row in page)
+                    else:
+                        yield from (StudentRecord.from_fields(columns, row) for row in page)
+                    if len(page) < page_size:
+                        return
+                    after_roll = page[-1][0]
         finally:
-            if conn:
-                conn.close()
+            conn.close()
 
-    def delete_student(self, roll_no):
-        conn = self.connect()
+    def _iter_sorted(self, conditions, filter_params, order_by, descending, page_size, term, fields):
+        """
+        iter_records in order_by order, one keyset page at a time.
+
+        Each page's roll numbers come from an index-ordered scan, with (key, ROLL_NO) of
+        the last row as the position to continue from. NAME and ROLL_NO are read from
+        STUDENTS, a subject from the MARKS term index, and TOTAL/AVERAGE from
+        STUDENT_TOTALS. So the first page costs the same for any roster size. The
+        records of those roll numbers are then fetched like a roll_nos filter.
+        Students without the key (no mark in the subject, or no marks at all) come last,
+        by ROLL_NO in the same direction.
+        """
+        if order_by not in SORT_FIELDS:
+            raise ValueError(f"Unknown sort field: {order_by}")
+        term_id, academic_year = self.term_key(term)
+        direction, beyond = ("DESC", "<") if descending else ("ASC", ">")
+        if order_by in ('ROLL_NO', 'NAME'):
+            source, key, roll = "STUDENTS s", f"s.{order_by}", "s.ROLL_NO"
+            key_conditions, key_params, missing = [], [], None
+        else:
+            if order_by in SUBJ_MAP:
+                table, column = "MARKS", "MARKS"
+                match = f"k.ACADEMIC_YEAR = %s AND k.TERM_ID = %s AND k.SUBJ_ID = {SUBJ_MAP[order_by]} AND k.MARKS IS NOT NULL"
+            else:
+                table, column = "STUDENT_TOTALS", order_by
+                match = "k.ACADEMIC_YEAR = %s AND k.TERM_ID = %s"
+            # The filters are on STUDENTS; without any, the sort index alone is read
+            source = f"{table} k JOIN STUDENTS s ON s.ROLL_NO = k.ROLL_NO" if conditions else f"{table} k"
+            key, roll = f"k.{column}", "k.ROLL_NO"
+            key_conditions, key_params = [match], [academic_year, term_id]
+            missing = f"NOT EXISTS (SELECT 1 FROM {table} k WHERE k.ROLL_NO = s.ROLL_NO AND {match})"
+
+        conn = self.connect(read_only=True)
         try:
+            with conn.cursor(pymysql.cursors.Cursor) as cursor:
+                last = None
+                while True:
+                    where, params = key_conditions + conditions, key_params + filter_params
+                    if last is not None and key == roll:
+                        where.append(f"{roll} {beyond} %s")
+                        params.append(last[1])
+                    elif last is not None:
+                        where.append(f"({key} {beyond} %s OR ({key} = %s AND {roll} {beyond} %s))")
+                        params += [last[0], last[0], last[1]]
+                    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+                    cursor.execute(f"""
+                        SELECT {key}, {roll} FROM {source}
+                        {where_sql}
+                        ORDER BY {key} {direction}, {roll} {direction}
+                        LIMIT %s
+                    """, params + [page_size])
+                    keys = cursor.fetchall()
+                    yield from self._records_in_order([roll_no for _, roll_no in keys], term, fields)
+                    if len(keys) < page_size:
+                        break
+                    last = keys[-1]
+
+                after_roll = None
+                while missing is not None:
+                    where, params = [missing] + conditions, key_params + filter_params
+                    if after_roll is not None:
+                        where.append(f"s.ROLL_NO {beyond} %s")
+                        params.append(after_roll)
+                    cursor.execute(f"""
+                        SELECT s.ROLL_NO FROM STUDENTS s
+                        WHERE {' AND '.join(where)}
+                        ORDER BY s.ROLL_NO {direction}
+                        LIMIT %s
+                    """, params + [page_size])
+                    roll_nos = [row[0] for row in cursor.fetchall()]
+                    yield from self._records_in_order(roll_nos, term, fields)
+                    if len(roll_nos) < page_size:
+                        break
+                    after_roll = roll_nos[-1]
+        finally:
+            conn.close()
+
+    def _records_in_order(self, roll_nos, term, fields):
+        """Records of roll_nos in that order; students deleted meanwhile are left out."""
+        if not roll_nos:
+            return
+        records = self.iter_records(page_size=len(roll_nos), filters={'roll_nos': roll_nos}, term=term, fields=fields)
+        by_roll = {record['ROLL_NO']: record for record in records}
+        yield from (by_roll[roll_no] for roll_no in roll_nos if roll_no in by_roll)
+
+    @staticmethod
+    def _fetch_packed_page(cursor, page_sql, params, columns):
+        """Run a page query with its rows packed into one COMPRESS()ed tab-separated value; returns row tuples."""
+        # Names are HEX()ed since validate_name lets tabs and newlines through; the other columns are numbers.
+        # HEX('') is '' too, so a NULL name is sent as '-', which no HEX() output contains.
+        packed_fields = ", ".join("COALESCE(HEX(NAME), '-')" if column == 'NAME' else f"COALESCE({column}, '')" for column in columns)
+        cursor.execute(f"""
+            SELECT COMPRESS(GROUP_CONCAT(CONCAT_WS('\\t', {packed_fields}) ORDER BY ROLL_NO SEPARATOR '\\n'))
+            FROM ({page_sql}) page
+        """, params)
+        packed = cursor.fetchone()[0]
+        if not packed:
+            return []
+        # COMPRESS() output: uncompressed length (4 bytes, little-endian), then a zlib stream
+        text = zlib.decompress(packed[4:]).decode('utf-8')
+        rows = []
+        for line in text.split("\n"):
+            values = line.split("\t")
+            row = [int(values[0])]
+            for column, value in zip(columns[1:], values[1:]):
+                if column == 'NAME':
+                    row.append(None if value == "-" else bytes.fromhex(value).decode('utf-8'))
+                else:
+                    row.append(int(value) if value != "" else None)
+            rows.append(tuple(row))
+        return rows
+
+    def list_classes(self):
+        """Distinct STUDENTS.CLASS_NAME values in order; None stands for students without a class."""
+        def read(conn):
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT DISTINCT CLASS_NAME FROM STUDENTS ORDER BY CLASS_NAME")
+                return [row['CLASS_NAME'] for row in cursor.fetchall()]
+        return self._run(read, read_only=True)
+
+    def get_student_names(self, roll_nos=None):
+        """
+        (ROLL_NO, NAME) of every student, or only of roll_nos. Raises on connection errors.
+
+        Reads STUDENTS alone, without the marks pivot, for building name indexes.
+        """
+        def read(conn):
+            with conn.cursor(pymysql.cursors.Cursor) as cursor:
+                if roll_nos is None:
+                    cursor.execute("SELECT ROLL_NO, NAME FROM STUDENTS")
+                else:
+                    cursor.execute(f"SELECT ROLL_NO, NAME FROM STUDENTS WHERE ROLL_NO IN ({', '.join(['%s'] * len(roll_nos))})",
+                                   list(roll_nos))
+                return cursor.fetchall()
+        if roll_nos is not None and not roll_nos:
+            return []
+        return self._run(read, read_only=True)
+
+    def get_data_version(self):
+        """Latest MARKS_CHANGES sequence; changes whenever any student is written. Raises on connection errors."""
+        def read(conn):
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT COALESCE(MAX(SEQ), 0) AS VERSION FROM MARKS_CHANGES")
+                return cursor.fetchone()['VERSION']
+        version = self._run(read, read_only=True)
+        self._saw_seq(version)
+        return version
+
+    def get_changes(self, since_seq, limit=1000):
+        """MARKS_CHANGES rows with SEQ > since_seq in sequence order. Raises on connection errors."""
+        def read(conn):
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT SEQ, ROLL_NO, OP FROM MARKS_CHANGES WHERE SEQ > %s ORDER BY SEQ LIMIT %s",
+                    (since_seq, limit)
+                )
+                return cursor.fetchall()
+        rows = self._run(read, read_only=True)
+        if rows:
+            self._saw_seq(rows[-1]['SEQ'])
+        return rows
+
+    def delete_student(self, roll_no):
+        def write(conn):
             with conn.cursor() as cursor:
                 cursor.execute("DELETE FROM MARKS WHERE ROLL_NO=%s", (roll_no,))
+                cursor.execute("DELETE FROM STUDENT_TOTALS WHERE ROLL_NO=%s", (roll_no,))
                 cursor.execute("DELETE FROM STUDENTS WHERE ROLL_NO=%s", (roll_no,))
+                cursor.execute("INSERT INTO MARKS_CHANGES (ROLL_NO, OP) VALUES (%s, 'DELETE')", (roll_no,))
             conn.commit()
+
+        try:
+            self._run(write)
             return True, "Record deleted successfully"
         except Exception as e:
             return False, str(e)
+
+    def delete_students(self, roll_nos):
+        """Delete several students and all their marks in one transaction."""
+        roll_nos = list(roll_nos)
+
+        def write(conn):
+            with conn.cursor() as cursor:
+                for start in range(0, len(roll_nos), ROLL_BATCH_SIZE):
+                    batch = roll_nos[start:start + ROLL_BATCH_SIZE]
+                    placeholders = ', '.join(['%s'] * len(batch))
+                    cursor.execute(f"DELETE FROM MARKS WHERE ROLL_NO IN ({placeholders})", batch)
+                    cursor.execute(f"DELETE FROM STUDENT_TOTALS WHERE ROLL_NO IN ({placeholders})", batch)
+                    cursor.execute(f"DELETE FROM STUDENTS WHERE ROLL_NO IN ({placeholders})", batch)
+                cursor.executemany("INSERT INTO MARKS_CHANGES (ROLL_NO, OP) VALUES (%s, 'DELETE')", [(roll_no,) for roll_no in roll_nos])
+            conn.commit()
+
+        try:
+            self._run(write)
+            return True, f"{len(roll_nos)} records deleted"
+        except Exception as e:
+            return False, str(e)
+
+    def apply_changes(self, changes, term=None):
+        """
+        Apply a batch of queued offline writes in one transaction.
+
+        Each change is a dict with 'op' ('STUDENT', 'MARK' or 'DELETE'), 'roll_no' and,
+        depending on op, 'name' or 'subj_id'/'marks'/'base_marks'. A MARK change is
+        only applied if the row still holds the value the offline edit was based on
+        (or already holds the new value); otherwise it is returned as a conflict and
+        the server value is kept. Marks are written to the given (default: active) term.
+        Connection errors propagate so the caller can retry.
+
+        Returns:
+            List of conflicting changes, each with the server's 'remote_marks' added
+        """
+        conflicts = []
+        changed = {}
+        term_id, academic_year = self.term_key(term)
+        conn = self.connect()
+        try:
+            with conn.cursor() as cursor:
+                for change in changes:
+                    roll_no = change['roll_no']
+                    changed[roll_no] = 'DELETE' if change['op'] == 'DELETE' else 'UPSERT'
+                    if change['op'] == 'STUDENT':
+                        cursor.execute("INSERT INTO STUDENTS (ROLL_NO, NAME) VALUES (%s, %s) ON DUPLICATE KEY UPDATE NAME=%s",
+                                       (roll_no, change['name'], change['name']))
+                    elif change['op'] == 'MARK':
+                        cursor.execute("""
+                            SELECT MARKS FROM MARKS
+                            WHERE ROLL_NO=%s AND SUBJ_ID=%s AND TERM_ID=%s AND ACADEMIC_YEAR=%s
+                            FOR UPDATE
+                        """, (roll_no, change['subj_id'], term_id, academic_year))
+                        row = cursor.fetchone()
+                        remote_marks = row['MARKS'] if row else None
+                        if remote_marks not in (change['base_marks'], change['marks']):
+                            conflicts.append({**change, 'remote_marks': remote_marks})
+                            continue
+                        cursor.execute("""
+                            INSERT INTO MARKS (ID, ROLL_NO, SUBJ_ID, MARKS, TERM_ID, ACADEMIC_YEAR)
+                            VALUES (%s, %s, %s, %s, %s, %s)
+                            ON DUPLICATE KEY UPDATE MARKS = VALUES(MARKS), VERSION = VERSION + 1
+                        """, (str(uuid.uuid7()), roll_no, change['subj_id'], change['marks'], term_id, academic_year))
+                    elif change['op'] == 'DELETE':
+                        cursor.execute("DELETE FROM MARKS WHERE ROLL_NO=%s", (roll_no,))
+                        cursor.execute("DELETE FROM STUDENT_TOTALS WHERE ROLL_NO=%s", (roll_no,))
+                        cursor.execute("DELETE FROM STUDENTS WHERE ROLL_NO=%s", (roll_no,))
+                if changed:
+                    self._refresh_totals(cursor, [roll_no for roll_no, op in changed.items() if op == 'UPSERT'],
+                                         term_id, academic_year)
+                    cursor.executemany("INSERT INTO MARKS_CHANGES (ROLL_NO, OP) VALUES (%s, %s)", list(changed.items()))
+                    # Offline edits are writes like any other: make open editors of these students see a conflict
+                    cursor.executemany("UPDATE STUDENTS SET VERSION = VERSION + 1 WHERE ROLL_NO = %s",
+                                       [(roll_no,) for roll_no, op in changed.items() if op == 'UPSERT'])
+            conn.commit()
+            self._raise_min_seq(conn)
+            return conflicts
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def shard_summary(self):
+        """
+        Partial aggregates for this tenant's active term, mergeable across shards.
+
+        Returns:
+            Dict with 'students' and per-subject 'subjects': {SUBJ_ID: {N, TOTAL, TOTAL_SQ, MIN, MAX}}
+        """
+        term_id, academic_year = self.term_key()
+        conn = self.connect(read_only=True)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT COUNT(*) AS N FROM STUDENTS")
+                students = cursor.fetchone()['N']
+                cursor.execute("""
+                    SELECT SUBJ_ID, COUNT(MARKS) AS N, SUM(MARKS) AS TOTAL,
+                        SUM(MARKS * MARKS) AS TOTAL_SQ, MIN(MARKS) AS MIN, MAX(MARKS) AS MAX
+                    FROM MARKS
+                    WHERE ACADEMIC_YEAR = %s AND TERM_ID = %s
+                    GROUP BY SUBJ_ID
+                """, (academic_year, term_id))
+                return {'students': students, 'subjects': {row.pop('SUBJ_ID'): row for row in cursor.fetchall()}}
         finally:
             conn.close()
+
+    def bulk_load(self, rows, term=None):
+        """
+        Bulk-load students and marks for term-start imports.
+
+        Rows are dicts of the form {'name': ..., 'roll_no': ..., 'marks': {subject: marks}}
+        with an optional 'class_name' (students without one keep their current class).
+        Valid rows are written to temporary TSV files and loaded into staging tables with
+        LOAD DATA LOCAL INFILE, then merged into STUDENTS/MARKS with set-based upserts.
+        Marks go to the given term (default: the active term).
+        If the server has local_infile disabled, the staging tables are filled with
+        batched INSERTs instead.
+
+        Returns:
+            Tuple of (success, message, rejected) where rejected is a list of
+            (row_number, error_message) for rows that failed validation.
+        """
+        students, marks, rejected = self._validate_import(rows)
+        if not students:
+            return False, "No valid rows to load", rejected
+
+        student_rows = [(roll_no, name, class_name) for roll_no, (name, class_name) in students.items()]
+        mark_rows = [(str(uuid.uuid7()), roll_no, sub_id, value) for (roll_no, sub_id), value in marks.items()]
+
+        conn = None
+        tsv_paths = []
+        try:
+            term_id, academic_year = self.term_key(term)
+            conn = self.connect(local_infile=True)
+            with conn.cursor() as cursor:
+                cursor.execute("CREATE TEMPORARY TABLE STG_STUDENTS (ROLL_NO INT PRIMARY KEY, NAME VARCHAR(50), CLASS_NAME VARCHAR(20))")
+                cursor.execute("""
+                    CREATE TEMPORARY TABLE STG_MARKS (
+                        ID CHAR(36), ROLL_NO INT, SUBJ_ID INT, MARKS INT,
+                        PRIMARY KEY (ROLL_NO, SUBJ_ID)
+                    )
+                """)
+                try:
+                    for table, columns, data_rows in (("STG_STUDENTS", "(ROLL_NO, NAME, CLASS_NAME)", student_rows),
+                                                      ("STG_MARKS", "(ID, ROLL_NO, SUBJ_ID, MARKS)", mark_rows)):
+                        if not data_rows:
+                            continue
+                        path = self._write_tsv(data_rows)
+                        tsv_paths.append(path)
+                        cursor.execute(
+                            f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} "
+                            f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' {columns}",
+                            (path,)
+                        )
+                except (pymysql.err.OperationalError, pymysql.err.InternalError) as e:
+                    if e.args[0] not in LOCAL_INFILE_DISABLED_ERRORS:
+                        raise
+                    # local_infile is off on this server: fall back to batched INSERTs
+                    cursor.execute("DELETE FROM STG_STUDENTS")
+                    cursor.execute("DELETE FROM STG_MARKS")
+                    cursor.executemany("INSERT INTO STG_STUDENTS (ROLL_NO, NAME, CLASS_NAME) VALUES (%s, %s, %s)", student_rows)
+                    if mark_rows:
+                        cursor.executemany("INSERT INTO STG_MARKS (ID, ROLL_NO, SUBJ_ID, MARKS) VALUES (%s, %s, %s, %s)", mark_rows)
+
+                # Parents first so every MARKS row has its student
+                cursor.execute("""
+                    INSERT INTO STUDENTS (ROLL_NO, NAME, CLASS_NAME)
+                    SELECT ROLL_NO, NAME, CLASS_NAME FROM STG_STUDENTS
+                    ON DUPLICATE KEY UPDATE NAME = VALUES(NAME), CLASS_NAME = COALESCE(VALUES(CLASS_NAME), CLASS_NAME),
+                        VERSION = VERSION + 1
+                """)
+                # Same upsert as save_student_marks, one statement for the whole batch
+                cursor.execute("""
+                    INSERT INTO MARKS (ID, ROLL_NO, SUBJ_ID, MARKS, TERM_ID, ACADEMIC_YEAR)
+                    SELECT ID, ROLL_NO, SUBJ_ID, MARKS, %s, %s FROM STG_MARKS
+                    ON DUPLICATE KEY UPDATE MARKS = VALUES(MARKS), VERSION = VERSION + 1
+                """, (term_id, academic_year))
+                cursor.execute(TOTALS_UPSERT.format(roll_nos="SELECT ROLL_NO FROM STG_STUDENTS"), (academic_year, term_id))
+                cursor.execute("INSERT INTO MARKS_CHANGES (ROLL_NO, OP) SELECT ROLL_NO, 'UPSERT' FROM STG_STUDENTS")
+                cursor.execute("DROP TEMPORARY TABLE STG_STUDENTS, STG_MARKS")
+            conn.commit()
+            self._raise_min_seq(conn)
+            return True, f"Loaded {len(student_rows)} students and {len(mark_rows)} marks ({len(rejected)} rows rejected)", rejected
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            print(f"Bulk load error: {e}")
+            return False, f"Bulk load failed: {str(e)}", rejected
+        finally:
+            if conn:
+                conn.close()
+            for path in tsv_paths:
+                os.remove(path)
+
+    @staticmethod
+    def _validate_import(rows):
+        """
+        Validate bulk_load rows.
+
+        Returns:
+            Tuple of (students, marks, rejected): {roll_no: (name, class_name)},
+            {(roll_no, subj_id): marks} and a list of (row_number, error_message)
+        """
+        students, marks, rejected = {}, {}, []
+        for row_number, row in enumerate(rows, 1):
+            raw_marks = row.get('marks') or {}
+            unknown = [sub for sub in raw_marks if sub not in SUBJ_MAP]
+            if unknown:
+                rejected.append((row_number, f"Unknown subject: {unknown[0]}"))
+                continue
+            is_valid, error_msg, data = validate_student_data(
+                str(row.get('name') or ''),
+                str(row.get('roll_no') or ''),
+                {sub: '' if value is None else str(value) for sub, value in raw_marks.items()}
+            )
+            if not is_valid:
+                rejected.append((row_number, error_msg))
+                continue
+            is_valid, error_msg, class_name = validate_class_name(str(row.get('class_name') or ''))
+            if not is_valid:
+                rejected.append((row_number, error_msg))
+                continue
+            # Later rows for the same roll number win, like repeated saves would
+            roll_no = data['roll_no']
+            students[roll_no] = (data['name'], class_name)
+            for sub_name, value in data['marks'].items():
+                marks[(roll_no, SUBJ_MAP[sub_name])] = value
+        return students, marks, rejected
+
+    @staticmethod
+    def import_digest(name, marks):
+        """
+        Digest of a student's name and marks, as record_digests() computes it in SQL.
+
+        Args:
+            marks: {subj_id: marks} for the subjects to compare
+        """
+        text = "\t".join([name] + [str(marks[sub_id]) for sub_id in sorted(marks)])
+        return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+    def record_digests(self, roll_nos, subj_ids, term=None):
+        """
+        Digest of each existing student's name and marks in subj_ids, comparable with
+        import_digest(), so imports can tell unchanged rows without fetching the records.
+        Read from the primary: a lagging replica could hide a change the import must overwrite.
+
+        Returns:
+            Dict of roll_no -> (class_name, digest); roll numbers not in the database are absent.
+            Raises on connection errors.
+        """
+        roll_nos, subj_ids = list(roll_nos), sorted(subj_ids)
+        term_id, academic_year = self.term_key(term)
+        # A missing mark digests as '' and never matches an incoming one. A NULL name is read as ''
+        # (CONCAT_WS would drop it), and the text is hashed as UTF-8 whatever the column charset,
+        # so the digest is byte for byte import_digest's.
+        columns = "".join(f", COALESCE(MAX(CASE WHEN m.SUBJ_ID = {sub_id} THEN m.MARKS END), '')" for sub_id in subj_ids)
+        join, join_params = "", ()
+        if subj_ids:
+            join = f"""LEFT JOIN MARKS m ON s.ROLL_NO = m.ROLL_NO AND m.ACADEMIC_YEAR = %s AND m.TERM_ID = %s
+                    AND m.SUBJ_ID IN ({', '.join(map(str, subj_ids))})"""
+            join_params = (academic_year, term_id)
+
+        def read(conn):
+            digests = {}
+            with conn.cursor(pymysql.cursors.Cursor) as cursor:
+                for start in range(0, len(roll_nos), ROLL_BATCH_SIZE):
+                    batch = roll_nos[start:start + ROLL_BATCH_SIZE]
+                    cursor.execute(f"""
+                        SELECT s.ROLL_NO, s.CLASS_NAME, MD5(CONVERT(CONCAT_WS('\\t', COALESCE(s.NAME, ''){columns}) USING utf8mb4))
+                        FROM STUDENTS s
+                        {join}
+                        WHERE s.ROLL_NO IN ({', '.join(['%s'] * len(batch))})
+                        GROUP BY s.ROLL_NO, s.NAME, s.CLASS_NAME
+                    """, join_params + tuple(batch))
+                    digests.update({roll_no: (class_name, digest) for roll_no, class_name, digest in cursor.fetchall()})
+            return digests
+
+        return self._read_primary(read)
+
+    def sync_import(self, rows, term=None, delete_missing=False):
+        """
+        Import a mark sheet, writing only the students it changes.
+
+        Every valid row is digested (import_digest) and compared with the database's
+        digest of the same student's name and the subjects the row fills in
+        (record_digests). Rows that match, with the same class if the row gives one,
+        are skipped. The rest are written by bulk_load in one batch. Blank subjects are
+        not compared and keep their marks, as in bulk_load.
+
+        Args:
+            rows: Rows as for bulk_load
+            term: TERMS row or (term_id, academic_year); defaults to the active term
+            delete_missing: The sheet is the whole roster: delete students not on it. Not done
+                            when any row was rejected, so a mistyped row never deletes its student
+
+        Returns:
+            Tuple of (success, message, summary) where summary has the counts 'inserted',
+            'updated', 'deleted' and 'skipped', and 'rejected' as in bulk_load
+        """
+        students, marks, rejected = self._validate_import(rows)
+        summary = {'inserted': 0, 'updated': 0, 'deleted': 0, 'skipped': 0, 'rejected': rejected}
+        student_marks = {roll_no: {} for roll_no in students}
+        for (roll_no, sub_id), value in marks.items():
+            student_marks[roll_no][sub_id] = value
+        # Rows are compared on the subjects they fill in, usually the same for the whole sheet
+        by_subjects = {}
+        for roll_no, sub_marks in student_marks.items():
+            by_subjects.setdefault(frozenset(sub_marks), []).append(roll_no)
+
+        try:
+            existing = {}
+            for subj_ids, roll_nos in by_subjects.items():
+                existing.update(self.record_digests(roll_nos, subj_ids, term))
+            missing = []
+            if delete_missing and not rejected:
+                missing = sorted({roll_no for roll_no, _ in self.get_student_names()} - set(students))
+        except Exception as e:
+            print(f"Import error: {e}")
+            return False, f"Import failed: {str(e)}", summary
+
+        changed = []
+        for roll_no, (name, class_name) in students.items():
+            current = existing.get(roll_no)
+            if current is not None and current[1] == self.import_digest(name, student_marks[roll_no]) \
+                    and class_name in (None, current[0]):
+                summary['skipped'] += 1
+                continue
+            summary['updated' if current is not None else 'inserted'] += 1
+            changed.append({'roll_no': roll_no, 'name': name, 'class_name': class_name,
+                            'marks': {REVERSE_SUBJ_MAP[sub_id]: value for sub_id, value in student_marks[roll_no].items()}})
+
+        if changed:
+            success, message, _ = self.bulk_load(changed, term)
+            if not success:
+                summary['inserted'] = summary['updated'] = 0
+                return False, message, summary
+        if missing:
+            success, message = self.delete_students(missing)
+            if not success:
+                return False, f"Import written, but deleting students not on the sheet failed: {message}", summary
+            summary['deleted'] = len(missing)
+
+        message = (f"Inserted {summary['inserted']}, updated {summary['updated']}, deleted {summary['deleted']}, "
+                   f"skipped {summary['skipped']} unchanged ({len(rejected)} rows rejected)")
+        if delete_missing and rejected:
+            message += "; nothing deleted because rows were rejected"
+        return True, message, summary
+
+    @staticmethod
+    def _write_tsv(rows):
+        # validate_name allows any whitespace, so backslashes, tabs and newlines are escaped
+        # the way LOAD DATA's default ESCAPED BY '\\' reads them back; None becomes \N (NULL)
+        # delete=False so the file can be reopened by the driver on Windows
+        with tempfile.NamedTemporaryFile('w', suffix='.tsv', newline='', encoding='utf-8', delete=False) as f:
+            for row in rows:
+                f.write("\t".join(r"\N" if value is None else str(value).translate(TSV_ESCAPES) for value in row) + "\n")
+            return f.name
+
+
+class ChangeFeed:
+    """
+    Consumer-side cursor over MARKS_CHANGES (or any helper exposing get_changes).
+
+    AUTO_INCREMENT sequences can commit out of order, so a plain "SEQ > last_seen"
+    could skip a change that commits after a higher one was already read. The feed
+    only advances last_seq over a contiguous run of sequences and waits at a hole
+    for up to gap_timeout seconds (holes left by rolled-back inserts never fill).
+    Rows past a hole are returned once and remembered so they are not re-applied.
+    """
+
+    def __init__(self, db, last_seq=0, gap_timeout=30, batch_size=1000):
+        self.db = db
+        self.last_seq = last_seq
+        self.gap_timeout = gap_timeout
+        self.batch_size = batch_size
+        self._seen = set()
+        self._gap_since = None
+
+    @classmethod
+    def from_version(cls, db, version, lookback=FEED_LOOKBACK, **kwargs):
+        """
+        Feed for data loaded after reading get_data_version() == version.
+
+        A sequence below version may belong to a transaction that had not committed
+        yet, so its change is not in the loaded data. The feed starts at the lowest
+        such hole among the last lookback sequences and counts the rows present
+        up to version as already applied.
+        """
+        feed = cls(db, max(version - lookback, 0), **kwargs)
+        feed._seen = {row['SEQ'] for row in db.get_changes(feed.last_seq, lookback) if row['SEQ'] <= version}
+        feed._advance()
+        return feed
+
+    def poll(self):
+        """
+        Fetch new changes.
+
+        Returns:
+            Dict of roll_no -> last operation ('UPSERT', 'DELETE', ...) since the previous poll
+        """
+        changes = {}
+        since = self.last_seq
+        while True:
+            rows = self.db.get_changes(since, self.batch_size)
+            for row in rows:
+                if row['SEQ'] in self._seen:
+                    continue
+                self._seen.add(row['SEQ'])
+                changes[row['ROLL_NO']] = row['OP']
+            # Behind a hole the first page may be rows already returned; read on past them
+            if len(rows) < self.batch_size:
+                break
+            since = rows[-1]['SEQ']
+        self._advance()
+        return changes
+
+    def _advance(self):
+        """Move last_seq over seen sequences, up to a hole that has not timed out."""
+        while self._seen:
+            if self.last_seq + 1 in self._seen:
+                self.last_seq += 1
+                self._seen.discard(self.last_seq)
+                self._gap_since = None
+                continue
+            if self._gap_since is None:
+                self._gap_since = time.monotonic()
+            if time.monotonic() - self._gap_since < self.gap_timeout:
+                break
+            # The hole never filled: skip to the next sequence we have seen
+            self.last_seq = min(self._seen) - 1
+
+
+def district_stats(tenants=None, max_workers=8):
+    """
+    District-wide statistics across every school's shard.
+
+    Each tenant's partial aggregates (counts, sums, sums of squares, min/max over its
+    active term) are fetched in parallel and merged here, so no raw marks leave the
+    shards.
+
+    Args:
+        tenants: Tenant IDs to include; defaults to every tenant in TENANT_SHARDS
+        max_workers: Shards queried at once
+
+    Returns:
+        Dict with 'schools', 'students', 'failed' (tenants that could not be reached)
+        and 'subjects': {subject: {count, mean, std, min, max}}
+    """
+    tenants = ROUTER.tenants() if tenants is None else list(tenants)
+    totals = {sub_id: {'N': 0, 'TOTAL': 0, 'TOTAL_SQ': 0, 'MIN': None, 'MAX': None} for sub_id in REVERSE_SUBJ_MAP}
+    result = {'schools': 0, 'students': 0, 'failed': [], 'subjects': {}}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {tenant: pool.submit(DatabaseHelper(tenant).shard_summary) for tenant in tenants}
+        for tenant, future in futures.items():
+            try:
+                partial = future.result()
+            except Exception as e:
+                print(f"Shard for tenant {tenant} failed: {e}")
+                result['failed'].append(tenant)
+                continue
+            result['schools'] += 1
+            result['students'] += partial['students']
+            for sub_id, row in partial['subjects'].items():
+                merged = totals.get(sub_id)
+                if merged is None or not row['N']:
+                    continue
+                merged['N'] += row['N']
+                merged['TOTAL'] += int(row['TOTAL'])
+                merged['TOTAL_SQ'] += int(row['TOTAL_SQ'])
+                merged['MIN'] = row['MIN'] if merged['MIN'] is None else min(merged['MIN'], row['MIN'])
+                merged['MAX'] = row['MAX'] if merged['MAX'] is None else max(merged['MAX'], row['MAX'])
+
+    for sub_id, merged in totals.items():
+        n = merged['N']
+        mean = merged['TOTAL'] / n if n else None
+        variance = max(merged['TOTAL_SQ'] / n - mean * mean, 0) if n else None
+        result['subjects'][REVERSE_SUBJ_MAP[sub_id]] = {
+            'count': n,
+            'mean': round(mean, 2) if n else None,
+            'std': round(variance ** 0.5, 2) if n else None,
+            'min': merged['MIN'],
+            'max': merged['MAX'],
+        }
+    return result
@@ -0,0 +1,211 @@
+"""
+Upgrade an existing school database to the current schema in school_db.sql.
+
+Safe to run any number of times: every step checks information_schema first and
+only does what is still missing.
+
+    1. Creates the tables an older install lacks (TERMS, MARKS_CHANGES,
+       DASHBOARD_SNAPSHOT, STUDENT_TOTALS, ...) from school_db.sql itself
+    2. Adds STUDENTS.CLASS_NAME / VERSION and the STUDENTS indexes
+    3. Seeds an active term when TERMS is empty
+    4. Rebuilds a pre-terms MARKS table (no TERM_ID) as the partitioned MARKS of
+       school_db.sql, moving every mark into the active term. The old table is kept
+       as MARKS_BEFORE_TERMS, without its foreign keys. Older saves could leave
+       several rows for one student and subject; the one with the highest ID (the
+       latest, for UUID v7 IDs) is kept
+    5. Drops the old TERM_ID/ACADEMIC_YEAR column defaults and updates IX_MARKS_TERM
+    6. Recomputes STUDENT_TOTALS and writes a RELOAD to MARKS_CHANGES so open GUIs
+       re-read everything
+
+Usage:
+    python db_migrate.py [--academic-year 2026] [--term-name "Term 1"] [--exam Annual]
+"""
+
+import os
+import argparse
+from datetime import date
+import pymysql
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST'),
+    'port': int(os.getenv('DB_PORT', 11624)),
+    'user': os.getenv('DB_USER'),
+    'password': os.getenv('DB_PASS'),
+    'database': os.getenv('DB_NAME'),
+    'ssl': {},
+    'connect_timeout': 10
+}
+
+sql_file_path = os.path.join(os.path.dirname(__file__), '..', 'Student-GUI-v1', 'school_db.sql')
+
+STUDENT_COLUMNS = {
+    'CLASS_NAME': "ADD COLUMN CLASS_NAME VARCHAR(20) NULL",
+    'VERSION': "ADD COLUMN VERSION INT NOT NULL DEFAULT 0",
+}
+# Index name -> columns, as declared in school_db.sql
+STUDENT_INDEXES = {
+    'IX_STUDENTS_CLASS': ('CLASS_NAME', 'ROLL_NO'),
+    'IX_STUDENTS_NAME': ('NAME', 'ROLL_NO'),
+}
+MARKS_TERM_INDEX = ('ACADEMIC_YEAR', 'TERM_ID', 'SUBJ_ID', 'MARKS', 'ROLL_NO')
+
+
+def schema_statements():
+    """The statements of school_db.sql, comments removed."""
+    with open(sql_file_path, 'r') as f:
+        text = f.read()
+    statements = []
+    for command in text.split(';'):
+        command = "\n".join(line for line in command.splitlines() if not line.strip().startswith('--')).strip()
+        if command:
+            statements.append(command)
+    return statements
+
+
+def column_names(cursor, table):
+    cursor.execute("""
+        SELECT COLUMN_NAME FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (table,))
+    return {row[0] for row in cursor.fetchall()}
+
+
+def index_columns(cursor, table, index):
+    """Columns of an index in order, or None if the table has no such index."""
+    cursor.execute("""
+        SELECT COLUMN_NAME FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        ORDER BY SEQ_IN_INDEX
+    """, (table, index))
+    return tuple(row[0] for row in cursor.fetchall()) or None
+
+
+def create_missing_tables(cursor, statements):
+    for command in statements:
+        if command.startswith("CREATE TABLE IF NOT EXISTS") or command.startswith("INSERT IGNORE INTO SUBJECTS"):
+            cursor.execute(command)
+
+
+def upgrade_students(cursor):
+    existing = column_names(cursor, 'STUDENTS')
+    for column, clause in STUDENT_COLUMNS.items():
+        if column not in existing:
+            print(f"Adding STUDENTS.{column}")
+            cursor.execute(f"ALTER TABLE STUDENTS {clause}")
+    for index, columns in STUDENT_INDEXES.items():
+        if index_columns(cursor, 'STUDENTS', index) is None:
+            print(f"Adding index {index}")
+            cursor.execute(f"ALTER TABLE STUDENTS ADD KEY {index} ({', '.join(columns)})")
+
+
+def ensure_active_term(cursor, academic_year, term_name, exam):
+    """(TERM_ID, ACADEMIC_YEAR) of the active term, seeding one into an empty TERMS."""
+    cursor.execute("SELECT TERM_ID, ACADEMIC_YEAR FROM TERMS WHERE IS_ACTIVE = 1 ORDER BY ACADEMIC_YEAR DESC, TERM_ID DESC LIMIT 1")
+    row = cursor.fetchone()
+    if row is not None:
+        return row
+    cursor.execute("SELECT COUNT(*) FROM TERMS")
+    if cursor.fetchone()[0]:
+        raise RuntimeError("TERMS has terms but none is active: set IS_ACTIVE = 1 on one and run again")
+    print(f"Seeding active term {term_name} ({exam}) {academic_year}")
+    cursor.execute("INSERT INTO TERMS (TERM_ID, ACADEMIC_YEAR, TERM_NAME, EXAM, IS_ACTIVE) VALUES (1, %s, %s, %s, 1)",
+                   (academic_year, term_name, exam))
+    return 1, academic_year
+
+
+def rebuild_marks(cursor, statements, term_id, academic_year):
+    """Copy a pre-terms MARKS into the partitioned layout, in the given term."""
+    create_marks = next(command for command in statements if command.startswith("CREATE TABLE IF NOT EXISTS MARKS ("))
+    print(f"Rebuilding MARKS with terms; existing marks go to term {term_id} of {academic_year}")
+    cursor.execute("DROP TABLE IF EXISTS MARKS_MIGRATED")
+    cursor.execute(create_marks.replace("MARKS (", "MARKS_MIGRATED (", 1))
+    # INSERT IGNORE keeps the first row per student and subject, so feed the highest IDs first
+    cursor.execute("""
+        INSERT IGNORE INTO MARKS_MIGRATED (ID, ROLL_NO, SUBJ_ID, MARKS, TERM_ID, ACADEMIC_YEAR)
+        SELECT ID, ROLL_NO, SUBJ_ID, MARKS, %s, %s FROM MARKS
+        WHERE ROLL_NO IS NOT NULL AND SUBJ_ID IS NOT NULL
+        ORDER BY ID DESC
+    """, (term_id, academic_year))
+    print(f"Copied {cursor.rowcount} marks")
+    cursor.execute("RENAME TABLE MARKS TO MARKS_BEFORE_TERMS, MARKS_MIGRATED TO MARKS")
+    # The old foreign keys would now block deleting students
+    cursor.execute("""
+        SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+        WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'MARKS_BEFORE_TERMS'
+    """)
+    for (constraint,) in cursor.fetchall():
+        cursor.execute(f"ALTER TABLE MARKS_BEFORE_TERMS DROP FOREIGN KEY {constraint}")
+    print("Old table kept as MARKS_BEFORE_TERMS; drop it once the upgrade is checked")
+
+
+def upgrade_marks(cursor, statements, term_id, academic_year):
+    columns = column_names(cursor, 'MARKS')
+    if 'TERM_ID' not in columns:
+        rebuild_marks(cursor, statements, term_id, academic_year)
+        return
+    if 'VERSION' not in columns:
+        print("Adding MARKS.VERSION")
+        cursor.execute("ALTER TABLE MARKS ADD COLUMN VERSION INT NOT NULL DEFAULT 0")
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'MARKS'
+            AND COLUMN_NAME IN ('TERM_ID', 'ACADEMIC_YEAR') AND COLUMN_DEFAULT IS NOT NULL
+    """)
+    if cursor.fetchone()[0]:
+        print("Dropping the MARKS term column defaults")
+        cursor.execute("ALTER TABLE MARKS ALTER COLUMN TERM_ID DROP DEFAULT, ALTER COLUMN ACADEMIC_YEAR DROP DEFAULT")
+    current = index_columns(cursor, 'MARKS', 'IX_MARKS_TERM')
+    if current != MARKS_TERM_INDEX:
+        print("Updating index IX_MARKS_TERM")
+        drop = "DROP INDEX IX_MARKS_TERM, " if current is not None else ""
+        cursor.execute(f"ALTER TABLE MARKS {drop}ADD KEY IX_MARKS_TERM ({', '.join(MARKS_TERM_INDEX)})")
+
+
+def refresh_totals(cursor):
+    cursor.execute("""
+        INSERT INTO STUDENT_TOTALS (ROLL_NO, TERM_ID, ACADEMIC_YEAR, TOTAL, AVERAGE)
+        SELECT ROLL_NO, TERM_ID, ACADEMIC_YEAR, SUM(MARKS), ROUND(AVG(MARKS), 2) FROM MARKS
+        WHERE MARKS IS NOT NULL
+        GROUP BY ROLL_NO, TERM_ID, ACADEMIC_YEAR
+        ON DUPLICATE KEY UPDATE TOTAL = VALUES(TOTAL), AVERAGE = VALUES(AVERAGE)
+    """)
+    # One RELOAD entry tells feed consumers to re-read everything
+    cursor.execute("INSERT INTO MARKS_CHANGES (ROLL_NO, OP) VALUES (0, 'RELOAD')")
+
+
+def migrate(academic_year, term_name, exam):
+    statements = schema_statements()
+    connection = pymysql.connect(**DB_CONFIG)
+    try:
+        with connection.cursor() as cursor:
+            create_missing_tables(cursor, statements)
+            upgrade_students(cursor)
+            term_id, academic_year = ensure_active_term(cursor, academic_year, term_name, exam)
+            connection.commit()
+            upgrade_marks(cursor, statements, term_id, academic_year)
+            refresh_totals(cursor)
+        connection.commit()
+        print("✅ Database is up to date.")
+    except Exception as e:
+        connection.rollback()
+        print(f"❌ Migration stopped: {e}")
+        raise
+    finally:
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upgrade an existing school database to the current schema")
+    parser.add_argument('--academic-year', type=int, default=date.today().year,
+                        help="year of the term seeded when TERMS is empty (default: this year)")
+    parser.add_argument('--term-name', default="Term 1", help="name of the seeded term")
+    parser.add_argument('--exam', default="Annual", help="exam of the seeded term")
+    args = parser.parse_args()
+    migrate(args.academic_year, args.term_name, args.exam)
+
+
+if __name__ == "__main__":
+    main()
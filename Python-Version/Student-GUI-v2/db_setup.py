@@ -14,7 +14,7 @@ DB_CONFIG = {
     'connect_timeout': 10
 }
 
-sql_file_path = os.path.join(os.path.dirname(__file__), '..', 'Student-GUI-version1', 'school_db.sql')
+sql_file_path = os.path.join(os.path.dirname(__file__), '..', 'Student-GUI-v1', 'school_db.sql')
 
 def setup_database():
     try:
@@ -1,22 +1,83 @@
+import os
+import base64
+import threading
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import customtkinter as ctk
-from database_helper import DatabaseHelper
+from database_helper import DatabaseHelper, ChangeFeed, RECORD_FIELDS, SUBJ_MAP, records_to_tuples
+from local_replica import ReplicatedDatabaseHelper
+from write_queue import WriteBehindQueue
+from resilience import is_transient
+from analytics import GRADE_BANDS
+from dashboard_snapshot import load_snapshot, build_snapshot, is_stale
 from input_validator import validate_student_data, validate_search_term, sanitize_string
 import pandas as pd
 from datetime import datetime
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from itertools import islice
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+from chart_cache import ChartCache, DEFAULT_CACHE_DIR, subject_average_figure
+from name_index import NameIndex
+from live_stats import LiveStats
+
+try:
+    from columnar_export import export_parquet
+except ImportError:  # pyarrow not installed: no Parquet export button
+    export_parquet = None
 
 # Configure Appearance
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
 
+# Rows fetched and inserted into the Treeview per step while streaming records
+PAGE_SIZE = 200
+# Best fuzzy name matches listed per search
+NAME_MATCHES = 50
+# Treeview column -> iter_records order_by; the database sorts, Tk only appends pages
+SORT_COLUMNS = {"Roll No": 'ROLL_NO', "Name": 'NAME', "Science": 'Science', "Social": 'Social', "Maths": 'Maths',
+                "English": 'English', "Hindi": 'Hindi', "Kannada": 'Kannada', "Total": 'TOTAL', "Average": 'AVERAGE'}
+# How often open record views poll the change feed for other users' edits
+CHANGE_POLL_MS = 5000
+# How often the queued-saves (or offline replica sync) counter under the entry form is refreshed
+SAVE_QUEUE_POLL_MS = 1000
+
 class StudentAppPro(ctk.CTk):
     def __init__(self):
         super().__init__()
 
-        self.db = DatabaseHelper()
+        # TENANT_ID routes a multi-school deployment to this school's shard
+        self.db = DatabaseHelper(tenant=os.getenv('TENANT_ID') or None)
+        # Optional offline-first mode: serve from a local SQLite replica and sync in the background
+        replica_path = os.getenv('OFFLINE_REPLICA_PATH')
+        if replica_path:
+            self.db = ReplicatedDatabaseHelper(replica_path, self.db)
+            self.db.start_sync()
+        # Dashboard snapshots always live in MySQL, even in offline-first mode
+        self.stats_db = getattr(self.db, 'remote', self.db)
+        # New entries are queued locally and written in the background; the offline replica already works that way
+        self.save_queue = None
+        if not replica_path:
+            self.save_queue = WriteBehindQueue(os.getenv('SAVE_QUEUE_PATH') or "pending_saves.db",
+                                               self.db.save_students_batch, is_transient=is_transient)
+            self.save_queue.start()
+        self._snapshot_job = None
+        self._snapshot_result = None
+        self._record_stream = None
+        self._filters = None
+        self._ranking = None  # roll numbers in display order for fuzzy name searches
+        self._sort = None  # (Treeview column, descending) chosen by clicking a heading
+        self.change_feed = None
+        self.records = {}  # roll_no -> record currently shown in the Treeview
+        self.editing = None  # (roll_no, version) while the form holds a record loaded for editing
+        # Rendered Performance charts, keyed by the averages they show (CHART_CACHE_DIR= disables the disk cache)
+        self.chart_cache = ChartCache(os.getenv('CHART_CACHE_DIR', DEFAULT_CACHE_DIR) or None)
+        self._chart_data = None
+        self._chart_image = None
+        # Fuzzy name search; typed names use SQL LIKE until the index has been built
+        self.name_index = None
+        threading.Thread(target=self.build_name_index, name="name-index", daemon=True).start()
+        # Performance figures kept current per save; the stored dashboard snapshot is used until seeded
+        self.live_stats = None
+        threading.Thread(target=self.build_live_stats, name="live-stats", daemon=True).start()
         self.title("🎓 Pro Student Management System")
         self.geometry("1100x750")
 
@@ -41,6 +102,10 @@ class StudentAppPro(ctk.CTk):
         self.stats_btn = ctk.CTkButton(self.sidebar_frame, text="📊 Performance", command=self.show_stats_frame, fg_color="transparent", text_color=("gray10", "gray90"), hover_color=("gray70", "gray30"), anchor="w")
         self.stats_btn.grid(row=3, column=0, padx=20, pady=10, sticky="ew")
 
+        # Reads and saves go to the active term unless told otherwise
+        self.term_label = ctk.CTkLabel(self.sidebar_frame, text=self.active_term_text(), anchor="w", justify="left")
+        self.term_label.grid(row=4, column=0, padx=20, pady=10, sticky="nw")
+
         self.appearance_mode_label = ctk.CTkLabel(self.sidebar_frame, text="Appearance Mode:", anchor="w")
         self.appearance_mode_label.grid(row=5, column=0, padx=20, pady=(10, 0))
         self.appearance_mode_optionemenu = ctk.CTkOptionMenu(self.sidebar_frame, values=["Light", "Dark", "System"], command=self.change_appearance_mode_event)
@@ -60,6 +125,45 @@ class StudentAppPro(ctk.CTk):
 
         # Show initial frame
         self.show_add_frame()
+        self.after(CHANGE_POLL_MS, self.poll_changes)
+        if self.save_queue is not None:
+            self.after(SAVE_QUEUE_POLL_MS, self.poll_save_queue)
+        else:
+            self.after(SAVE_QUEUE_POLL_MS, self.poll_replica)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def on_close(self):
+        if self.save_queue is not None:
+            # Last flush attempt; anything left stays queued for the next start
+            self.save_queue.stop(timeout=5)
+        self.destroy()
+
+    def build_name_index(self):
+        try:
+            self.name_index = NameIndex.build(self.db)
+        except Exception as e:
+            print(f"Name index unavailable, searching with SQL: {e}")
+
+    def build_live_stats(self):
+        try:
+            self.live_stats = LiveStats.build(self.db)
+        except Exception as e:
+            print(f"Live statistics unavailable, using dashboard snapshots: {e}")
+
+    def track_save(self, validated_data):
+        """Update the in-memory name index and statistics for a saved or queued student."""
+        if self.name_index is not None:
+            self.name_index.add(validated_data['roll_no'], validated_data['name'])
+        if self.live_stats is not None:
+            self.live_stats.apply_save(validated_data['roll_no'], validated_data['name'], validated_data['marks'])
+
+    def active_term_text(self):
+        try:
+            term = getattr(self.db, 'remote', self.db).get_active_term()
+            return f"Term: {term['TERM_NAME']} ({term['EXAM']})\nYear: {term['ACADEMIC_YEAR']}"
+        except Exception as e:
+            print(f"Could not read active term: {e}")
+            return "Term: -"
 
     def change_appearance_mode_event(self, new_appearance_mode: str):
         ctk.set_appearance_mode(new_appearance_mode)
@@ -93,8 +197,8 @@ class StudentAppPro(ctk.CTk):
     def create_add_frame(self):
         frame = ctk.CTkFrame(self.main_frame, fg_color="transparent")
         
-        title = ctk.CTkLabel(frame, text="Add Student Marks", font=ctk.CTkFont(size=24, weight="bold"))
-        title.pack(pady=(0, 20), anchor="w")
+        self.form_title = ctk.CTkLabel(frame, text="Add Student Marks", font=ctk.CTkFont(size=24, weight="bold"))
+        self.form_title.pack(pady=(0, 20), anchor="w")
 
         form = ctk.CTkFrame(frame)
         form.pack(fill="both", expand=True, padx=10, pady=10)
@@ -129,6 +233,16 @@ class StudentAppPro(ctk.CTk):
         save_btn = ctk.CTkButton(inner_form, text="💾 Save Record", command=self.save_data, height=40, font=ctk.CTkFont(size=14, weight="bold"))
         save_btn.grid(row=7, column=0, columnspan=2, pady=30, sticky="ew")
 
+        self.queue_label = ctk.CTkLabel(inner_form, text="", font=ctk.CTkFont(size=12), anchor="w")
+        self.queue_label.grid(row=8, column=0, columnspan=2, sticky="w", padx=10)
+        self.retry_saves_btn = ctk.CTkButton(inner_form, text="↻ Failed Saves", width=120, fg_color="#d32f2f", hover_color="#b71c1c", command=self.review_failed_saves)
+        self.retry_saves_btn.grid(row=8, column=2, columnspan=2, sticky="e", padx=10)
+        self.retry_saves_btn.grid_remove()
+        # Offline replica only: edits that clashed with someone else's when they synced
+        self.conflicts_btn = ctk.CTkButton(inner_form, text="⚠ Sync Conflicts", width=120, fg_color="#d32f2f", hover_color="#b71c1c", command=self.review_conflicts)
+        self.conflicts_btn.grid(row=8, column=2, columnspan=2, sticky="e", padx=10)
+        self.conflicts_btn.grid_remove()
+
         return frame
 
     def save_data(self):
@@ -147,23 +261,162 @@ class StudentAppPro(ctk.CTk):
             messagebox.showerror("Validation Error", error_msg)
             return
         
-        # Use validated and sanitized data
-        success, msg = self.db.save_student_marks(
-            validated_data['name'], 
-            validated_data['roll_no'], 
-            validated_data['marks']
-        )
+        # Edits of a loaded record only go through if nobody saved it in the meantime
+        if self.editing and self.editing[0] == validated_data['roll_no']:
+            try:
+                success, msg, version = self.db.update_student_marks(
+                    validated_data['name'],
+                    validated_data['roll_no'],
+                    validated_data['marks'],
+                    self.editing[1]
+                )
+            except Exception as e:
+                messagebox.showerror("Database Error", f"Connection Failed: {e}")
+                return
+            if not success:
+                self.resolve_edit_conflict(validated_data, msg, version)
+                return
+        elif self.save_queue is not None:
+            # Returns at once; the background flush writes it within about a second
+            self.save_queue.enqueue(validated_data['name'], validated_data['roll_no'], validated_data['marks'])
+            self.track_save(validated_data)
+            self.clear_form()
+            self.queue_label.configure(text=f"Roll No {validated_data['roll_no']} queued for saving")
+            self.name_entry.focus_set()
+            return
+        else:
+            # Use validated and sanitized data
+            success, msg = self.db.save_student_marks(
+                validated_data['name'], 
+                validated_data['roll_no'], 
+                validated_data['marks']
+            )
         if success:
+            self.track_save(validated_data)
             messagebox.showinfo("Success", "Student record saved successfully!")
             self.clear_form()
         else:
             messagebox.showerror("Database Error", msg)
 
+    def resolve_edit_conflict(self, validated_data, msg, version):
+        roll_no = validated_data['roll_no']
+        if version is None:
+            messagebox.showerror("Edit Conflict", msg)
+            self.set_editing(None)
+            return
+        if messagebox.askyesno("Edit Conflict", f"{msg}.\n\nYes: overwrite their changes with yours\nNo: discard your changes and load theirs"):
+            self.editing = (roll_no, version)
+            self.save_data()
+        else:
+            self.edit_student(roll_no)
+
+    def edit_record(self):
+        selected = self.tree.selection()
+        if len(selected) != 1:
+            messagebox.showwarning("Warning", "Please select one record to edit")
+            return
+        self.edit_student(self.tree.item(selected[0])['values'][0])
+
+    def poll_save_queue(self):
+        try:
+            pending, failed = self.save_queue.counts()
+            text = f"Pending saves: {pending}   Failed: {failed}"
+            if pending and self.save_queue.last_error:
+                text += "   (database unreachable, retrying)"
+            self.queue_label.configure(text=text, text_color="#d32f2f" if failed else ("gray10", "gray90"))
+            if failed:
+                self.retry_saves_btn.grid()
+            else:
+                self.retry_saves_btn.grid_remove()
+        except Exception as e:
+            print(f"Save queue poll failed: {e}")
+        finally:
+            self.after(SAVE_QUEUE_POLL_MS, self.poll_save_queue)
+
+    def review_failed_saves(self):
+        failed = self.save_queue.failed_entries()
+        if not failed:
+            return
+        details = "\n".join(f"Roll {roll_no} ({name}): {error}" for roll_no, name, error in failed[:10])
+        if len(failed) > 10:
+            details += f"\n... and {len(failed) - 10} more"
+        if messagebox.askyesno("Failed Saves", f"{details}\n\nYes: retry these saves\nNo: discard them"):
+            self.save_queue.retry_failed()
+        elif messagebox.askyesno("Confirm", f"Discard {len(failed)} unsaved records?"):
+            self.save_queue.discard_failed()
+
+    def poll_replica(self):
+        try:
+            pending, conflicts = self.db.pending_count(), len(self.db.get_conflicts())
+            text = f"Pending sync: {pending}   Conflicts: {conflicts}"
+            if pending and self.db.last_sync_error:
+                text += "   (database unreachable, retrying)"
+            self.queue_label.configure(text=text, text_color="#d32f2f" if conflicts else ("gray10", "gray90"))
+            if conflicts:
+                self.conflicts_btn.grid()
+            else:
+                self.conflicts_btn.grid_remove()
+        except Exception as e:
+            print(f"Replica status poll failed: {e}")
+        finally:
+            self.after(SAVE_QUEUE_POLL_MS, self.poll_replica)
+
+    def review_conflicts(self):
+        subjects = {sub_id: sub_name for sub_name, sub_id in SUBJ_MAP.items()}
+
+        def shown(marks):
+            return "-" if marks is None else marks
+
+        for conflict_id, roll_no, subj_id, mine, theirs, base, _ in self.db.get_conflicts():
+            choice = messagebox.askyesnocancel(
+                "Sync Conflict",
+                f"Roll {roll_no}, {subjects.get(subj_id, subj_id)} was changed by someone else before your edit synced.\n\n"
+                f"Yours: {shown(mine)}\nTheirs: {shown(theirs)}\nBoth edited from: {shown(base)}\n\n"
+                "Yes: keep mine\nNo: keep theirs\nCancel: decide later")
+            if choice is None:
+                break
+            success, msg = self.db.resolve_conflict(conflict_id, keep_mine=choice)
+            if not success:
+                messagebox.showerror("Sync Conflict", msg)
+
+    def edit_student(self, roll_no):
+        # A queued save of this student must land first, or the form would show stale marks
+        if self.save_queue is not None and self.save_queue.is_pending(roll_no) and not self.save_queue.flush_now():
+            messagebox.showerror("Database Error", f"Roll No {roll_no} has a queued save that could not be written yet")
+            return
+        # Offline replicas resolve concurrent edits when they sync, so they have no versions to check
+        if not hasattr(self.db, 'get_student'):
+            record = self.records.get(roll_no)
+            loaded = (record, None) if record else None
+        else:
+            try:
+                loaded = self.db.get_student(roll_no)
+            except Exception as e:
+                messagebox.showerror("Database Error", f"Could not load Roll No {roll_no}: {e}")
+                return
+        if loaded is None:
+            messagebox.showerror("Error", f"Roll No {roll_no} no longer exists")
+            return
+        record, version = loaded
+        self.clear_form()
+        self.name_entry.insert(0, record['NAME'])
+        self.roll_entry.insert(0, str(record['ROLL_NO']))
+        for sub, entry in self.entries.items():
+            if record[sub] is not None:
+                entry.insert(0, str(record[sub]))
+        self.set_editing((record['ROLL_NO'], version) if version is not None else None)
+        self.show_add_frame()
+
+    def set_editing(self, editing):
+        self.editing = editing
+        self.form_title.configure(text=f"Edit Student {editing[0]}" if editing else "Add Student Marks")
+
     def clear_form(self):
         self.name_entry.delete(0, tk.END)
         self.roll_entry.delete(0, tk.END)
         for e in self.entries.values():
             e.delete(0, tk.END)
+        self.set_editing(None)
 
     # --- VIEW RECORDS FRAME ---
     def create_view_frame(self):
@@ -193,7 +446,7 @@ class StudentAppPro(ctk.CTk):
         self.tree = ttk.Treeview(table_container, columns=cols, show="headings")
 
         for col in cols:
-            self.tree.heading(col, text=col)
+            self.tree.heading(col, text=col, command=lambda c=col: self.sort_table(c))
             self.tree.column(col, width=80, anchor="center")
         self.tree.column("Name", width=150, anchor="w")
 
@@ -209,28 +462,128 @@ class StudentAppPro(ctk.CTk):
         btn_row.pack(fill="x", pady=10)
 
         ctk.CTkButton(btn_row, text="🗑 Delete Selected", fg_color="#d32f2f", hover_color="#b71c1c", command=self.delete_record).pack(side="right", padx=10)
+        ctk.CTkButton(btn_row, text="✏ Edit Selected", command=self.edit_record).pack(side="right", padx=10)
         ctk.CTkButton(btn_row, text="📥 Export to Excel", command=self.export_excel).pack(side="right", padx=10)
+        ctk.CTkButton(btn_row, text="📤 Import Sheet", command=self.import_sheet).pack(side="right", padx=10)
+        if export_parquet is not None:
+            ctk.CTkButton(btn_row, text="📦 Export to Parquet", command=self.export_parquet).pack(side="right", padx=10)
         ctk.CTkButton(btn_row, text="🔄 Refresh", command=self.refresh_table).pack(side="right", padx=10)
 
         return frame
 
-    def refresh_table(self):
-        records = self.db.get_all_records()
-        if records is None:
+    def refresh_table(self, filters=None, ranking=None):
+        # Drop any stream still loading from a previous refresh/search
+        if self._record_stream is not None:
+            self._record_stream.close()
+        self.tree.delete(*self.tree.get_children())
+        self.records = {}
+        self._filters = filters
+        self._ranking = ranking
+        # Read the feed position before the rows so edits made while streaming (or still
+        # uncommitted below that position) are replayed
+        try:
+            self.change_feed = ChangeFeed.from_version(self.db, self.db.get_data_version())
+        except Exception as e:
+            print(f"Change feed unavailable: {e}")
+            self.change_feed = None
+        order_by, descending = (SORT_COLUMNS[self._sort[0]], self._sort[1]) if self._sort else (None, False)
+        self._record_stream = self.db.iter_records(page_size=PAGE_SIZE, filters=filters, order_by=order_by, descending=descending)
+        self.load_next_page(self._record_stream)
+
+    def sort_table(self, col):
+        # Clicking the sorted column again reverses it; a chosen sort replaces fuzzy-match ranking
+        descending = self._sort is not None and self._sort[0] == col and not self._sort[1]
+        self._sort = (col, descending)
+        for heading in SORT_COLUMNS:
+            arrow = (" ▼" if descending else " ▲") if heading == col else ""
+            self.tree.heading(heading, text=heading + arrow)
+        self.refresh_table(self._filters, self._ranking)
+
+    def load_next_page(self, stream):
+        if stream is not self._record_stream:
+            return
+        try:
+            page = list(islice(stream, PAGE_SIZE))
+        except Exception as e:
+            print(f"Error fetching records: {e}")
+            self._record_stream = None
             messagebox.showerror("Error", "Could not connect to database to fetch records.")
             return
-        self.update_table_data(records)
+        self.append_table_rows(page)
+        if len(page) == PAGE_SIZE:
+            # Yield to the event loop so the first screen shows while the rest streams in
+            self.after(1, self.load_next_page, stream)
+        else:
+            self._record_stream = None
+            if self._ranking and self._sort is None:
+                self.rank_table_rows()
+
+    def rank_table_rows(self):
+        # Rows stream in roll number order; fuzzy matches are shown best first
+        position = 0
+        for roll_no in self._ranking:
+            if self.tree.exists(str(roll_no)):
+                self.tree.move(str(roll_no), "", position)
+                position += 1
 
     def update_table_data(self, records):
         self.tree.delete(*self.tree.get_children())
+        self.records = {}
+        self.append_table_rows(records)
+
+    def append_table_rows(self, records):
         for row in records:
-            # Calculate total and avg
-            marks = [row[s] for s in self.subjects if row[s] is not None]
-            total = sum(marks) if marks else 0
-            avg = round(total / len(marks), 2) if marks else 0
-            
-            val_list = [row['ROLL_NO'], row['NAME']] + [row[s] if row[s] is not None else "-" for s in self.subjects] + [total, avg]
-            self.tree.insert("", "end", values=val_list)
+            self.records[row['ROLL_NO']] = row
+            self.tree.insert("", "end", iid=str(row['ROLL_NO']), values=self.row_values(row))
+
+    def row_values(self, row):
+        # Calculate total and avg; "-" without marks, like the subjects (sorted last)
+        marks = [row[s] for s in self.subjects if row[s] is not None]
+        total = sum(marks) if marks else "-"
+        avg = round(total / len(marks), 2) if marks else "-"
+
+        return [row['ROLL_NO'], row['NAME']] + [row[s] if row[s] is not None else "-" for s in self.subjects] + [total, avg]
+
+    def poll_changes(self):
+        # Only poll while the records view is on screen and fully loaded
+        try:
+            if self.name_index is not None and self.view_frame.winfo_ismapped():
+                self.name_index.refresh()
+            if self.change_feed is not None and self._record_stream is None and self.view_frame.winfo_ismapped():
+                changes = self.change_feed.poll()
+                if 'RELOAD' in changes.values():
+                    self.refresh_table(self._filters, self._ranking)
+                elif changes:
+                    self.apply_table_changes(changes)
+        except Exception as e:
+            print(f"Change poll failed: {e}")
+        finally:
+            self.after(CHANGE_POLL_MS, self.poll_changes)
+
+    def apply_table_changes(self, changes):
+        """Apply {roll_no: op} deltas from the change feed to the cache and Treeview."""
+        upserts = [roll_no for roll_no, op in changes.items() if op == 'UPSERT']
+        fresh = {}
+        if upserts:
+            # Re-apply the active search so edited rows that no longer match drop out
+            filters = dict(self._filters or {})
+            scope = filters.get('roll_nos')
+            filters['roll_nos'] = upserts if scope is None else [roll_no for roll_no in upserts if roll_no in scope]
+            fresh = {r['ROLL_NO']: r for r in self.db.iter_records(page_size=len(upserts), filters=filters)}
+
+        for roll_no in changes:
+            iid = str(roll_no)
+            row = fresh.get(roll_no)
+            if row is None:
+                self.records.pop(roll_no, None)
+                if self.tree.exists(iid):
+                    self.tree.delete(iid)
+            elif self.tree.exists(iid):
+                self.records[roll_no] = row
+                self.tree.item(iid, values=self.row_values(row))
+            else:
+                self.records[roll_no] = row
+                self.tree.insert("", "end", iid=iid, values=self.row_values(row))
 
     def filter_table(self):
         search_term = self.search_entry.get()
@@ -241,12 +594,13 @@ class StudentAppPro(ctk.CTk):
             messagebox.showwarning("Warning", error_msg)
             return
         
-        search_term = sanitize_string(search_term).lower()
-        records = self.db.get_all_records()
-        if records is None:
-            return
-        filtered = [r for r in records if search_term in str(r['ROLL_NO']).lower() or search_term in r['NAME'].lower()]
-        self.update_table_data(filtered)
+        search_term = sanitize_string(search_term)
+        # Names go through the fuzzy index (typos, partial words); roll numbers keep the substring match
+        if search_term and not search_term.isdigit() and self.name_index is not None:
+            ranking = [roll_no for roll_no, _, _ in self.name_index.search(search_term, limit=NAME_MATCHES)]
+            self.refresh_table(filters={'roll_nos': ranking}, ranking=ranking)
+        else:
+            self.refresh_table(filters={'search': search_term} if search_term else None)
 
     def delete_record(self):
         selected = self.tree.selection()
@@ -255,10 +609,17 @@ class StudentAppPro(ctk.CTk):
             return
         
         if messagebox.askyesno("Confirm", "Are you sure you want to delete this record?"):
+            deleted = {}
             for item in selected:
                 roll_no = self.tree.item(item)['values'][0]
-                self.db.delete_student(roll_no)
-            self.refresh_table()
+                success, _ = self.db.delete_student(roll_no)
+                if success:
+                    deleted[roll_no] = 'DELETE'
+                    if self.name_index is not None:
+                        self.name_index.remove(roll_no)
+                    if self.live_stats is not None:
+                        self.live_stats.apply_delete(roll_no)
+            self.apply_table_changes(deleted)
 
     def export_excel(self):
         records = self.db.get_all_records()
@@ -266,11 +627,58 @@ class StudentAppPro(ctk.CTk):
             messagebox.showwarning("Warning", "No data to export")
             return
         
-        df = pd.DataFrame(records)
+        df = pd.DataFrame.from_records(records_to_tuples(records), columns=RECORD_FIELDS)
         filename = f"student_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
         df.to_excel(filename, index=False)
         messagebox.showinfo("Success", f"Data exported to {filename}")
 
+    def import_sheet(self):
+        # Same layout as Export to Excel (ROLL_NO, NAME, subjects), plus an optional CLASS_NAME column
+        filename = filedialog.askopenfilename(title="Import Mark Sheet", filetypes=[("Mark sheets", "*.xlsx *.csv")])
+        if not filename:
+            return
+        try:
+            df = pd.read_csv(filename) if filename.lower().endswith(".csv") else pd.read_excel(filename)
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not read {filename}: {e}")
+            return
+        if not {'ROLL_NO', 'NAME'} <= set(df.columns):
+            messagebox.showerror("Error", "The sheet needs ROLL_NO and NAME columns")
+            return
+
+        def cell(value):
+            # Empty cells are NaN, and they turn whole columns into floats (87.0)
+            if pd.isna(value):
+                return None
+            return int(value) if isinstance(value, float) and value.is_integer() else value
+
+        subjects = [sub for sub in self.subjects if sub in df.columns]
+        rows = [{'roll_no': cell(row['ROLL_NO']), 'name': cell(row['NAME']), 'class_name': cell(row.get('CLASS_NAME')),
+                 'marks': {sub: cell(row[sub]) for sub in subjects}}
+                for row in df.to_dict('records')]
+        # Only students whose name or marks differ from the database are written
+        success, msg, summary = self.stats_db.sync_import(rows)
+        details = "\n".join(f"Row {row_number + 1}: {error}" for row_number, error in summary['rejected'][:10])
+        if len(summary['rejected']) > 10:
+            details += f"\n... and {len(summary['rejected']) - 10} more"
+        if success:
+            messagebox.showinfo("Import", msg + (f"\n\n{details}" if details else ""))
+            self.refresh_table(self._filters, self._ranking)
+        else:
+            messagebox.showerror("Import Failed", msg + (f"\n\n{details}" if details else ""))
+
+    def export_parquet(self):
+        filename = f"student_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.parquet"
+        try:
+            rows, _ = export_parquet(self.stats_db, filename)
+        except Exception as e:
+            messagebox.showerror("Error", f"Parquet export failed: {e}")
+            return
+        if not rows:
+            messagebox.showwarning("Warning", "No data to export")
+            return
+        messagebox.showinfo("Success", f"{rows} records exported to {filename}")
+
     # --- STATISTICS FRAME ---
     def create_stats_frame(self):
         frame = ctk.CTkFrame(self.main_frame, fg_color="transparent")
@@ -285,6 +693,15 @@ class StudentAppPro(ctk.CTk):
         self.card_avg = self.create_stat_card(self.stats_container, "Class Average", "0.0", 1)
         self.card_topper = self.create_stat_card(self.stats_container, "Top Performer", "-", 2)
 
+        self.grade_label = ctk.CTkLabel(frame, text="", font=ctk.CTkFont(size=14), anchor="w")
+        self.grade_label.pack(fill="x", padx=10)
+        self.as_of_label = ctk.CTkLabel(frame, text="", font=ctk.CTkFont(size=12), text_color="gray60", anchor="w")
+        self.as_of_label.pack(fill="x", padx=10)
+
+        # The cached image is the default; the live canvas adds zoom/pan at matplotlib's cost
+        self.interactive_chart = ctk.CTkSwitch(frame, text="Interactive chart", command=self.render_chart)
+        self.interactive_chart.pack(anchor="e", padx=10)
+
         # Chart Area
         self.chart_frame = ctk.CTkFrame(frame)
         self.chart_frame.pack(fill="both", expand=True, pady=10)
@@ -302,6 +719,53 @@ class StudentAppPro(ctk.CTk):
         return val_label
 
     def update_stats(self):
+        # Live figures only need the other users' edits since the last look
+        if self.live_stats is not None:
+            try:
+                self.live_stats.refresh()
+            except Exception as e:
+                print(f"Live statistics not refreshed, showing them as of the last update: {e}")
+            self.render_stats(self.live_stats.snapshot())
+            return
+        # Show the precomputed snapshot at once and rebuild it in the background when stale
+        try:
+            snapshot = load_snapshot(self.stats_db)
+            stale = is_stale(self.stats_db, snapshot)
+        except Exception as e:
+            print(f"Dashboard snapshot unavailable: {e}")
+            self.update_stats_from_records()
+            return
+        if snapshot is not None:
+            self.render_stats(snapshot)
+        if stale:
+            self.refresh_snapshot_async(show_fallback=snapshot is None)
+
+    def refresh_snapshot_async(self, show_fallback=False):
+        if self._snapshot_job is not None and self._snapshot_job.is_alive():
+            return
+        self._snapshot_result = None
+
+        def job():
+            try:
+                self._snapshot_result = build_snapshot(self.stats_db)
+            except Exception as e:
+                print(f"Error building dashboard snapshot: {e}")
+                self._snapshot_result = False
+
+        self._snapshot_job = threading.Thread(target=job, name="dashboard-snapshot", daemon=True)
+        self._snapshot_job.start()
+        self.after(200, self.check_snapshot_job, show_fallback)
+
+    def check_snapshot_job(self, show_fallback):
+        # Tk widgets are only touched from the main loop, so poll the worker instead of calling back
+        if self._snapshot_job.is_alive():
+            self.after(200, self.check_snapshot_job, show_fallback)
+        elif self._snapshot_result:
+            self.render_stats(self._snapshot_result)
+        elif show_fallback:
+            self.update_stats_from_records()
+
+    def update_stats_from_records(self):
         records = self.db.get_all_records()
         if records is None:
             # Clear stats if DB fails
@@ -312,55 +776,58 @@ class StudentAppPro(ctk.CTk):
         if not records:
             return
 
-        df = pd.DataFrame(records)
+        df = pd.DataFrame.from_records(records_to_tuples(records), columns=RECORD_FIELDS)
         if df.empty: return
 
-        total_students = len(df)
-        
         # Calculate individual student averages
         marks_cols = self.subjects
         df_marks = df[marks_cols].apply(pd.to_numeric, errors='coerce')
         df['Avg'] = df_marks.mean(axis=1)
-        
-        class_avg = round(df['Avg'].mean(), 2)
-        top_student = df.loc[df['Avg'].idxmax()]['NAME'] if not df.empty else "-"
-
-        self.card_total.configure(text=str(total_students))
-        self.card_avg.configure(text=str(class_avg))
-        self.card_topper.configure(text=str(top_student))
+        subj_avgs = df_marks.mean()
 
-        # Clear previous chart
+        self.render_stats({
+            'TOTAL_STUDENTS': len(df),
+            'CLASS_AVG': round(df['Avg'].mean(), 2),
+            'TOPPER_NAME': df.loc[df['Avg'].idxmax()]['NAME'],
+            'SUBJECT_AVGS': {sub: (None if pd.isna(val) else float(val)) for sub, val in subj_avgs.items()},
+            'GRADE_COUNTS': None,
+            'BUILT_AT': datetime.now(),
+        })
+
+    def render_stats(self, snapshot):
+        self.card_total.configure(text=str(snapshot['TOTAL_STUDENTS']))
+        self.card_avg.configure(text=str(snapshot['CLASS_AVG'] if snapshot['CLASS_AVG'] is not None else "-"))
+        self.card_topper.configure(text=str(snapshot['TOPPER_NAME'] or "-"))
+
+        grades = snapshot['GRADE_COUNTS']
+        grade_text = "Grades:  " + "   ".join(f"{grade}: {grades.get(grade, 0)}" for _, grade in GRADE_BANDS) if grades else ""
+        self.grade_label.configure(text=grade_text)
+        self.as_of_label.configure(text=f"As of {snapshot['BUILT_AT']:%d %b %Y %H:%M}")
+
+        # Subject averages chart; the same averages redraw nothing
+        subj_avgs = {sub: (round(val, 2) if val is not None else None) for sub, val in snapshot['SUBJECT_AVGS'].items()}
+        if subj_avgs != self._chart_data or not self.chart_frame.winfo_children():
+            self._chart_data = subj_avgs
+            self.render_chart()
+
+    def render_chart(self):
+        if self._chart_data is None:
+            return
         for widget in self.chart_frame.winfo_children():
             widget.destroy()
+        self._chart_image = None
 
-        # Create Subject Averages Chart
-        subj_avgs = df_marks.mean()
-        
-        fig, ax = plt.subplots(figsize=(8, 4), dpi=100)
-        fig.patch.set_facecolor('#2b2b2b')
-        ax.set_facecolor('#2b2b2b')
-        
-        bars = ax.bar(subj_avgs.index, subj_avgs.values, color='#1f538d', width=0.6)
-        
-        ax.set_title("Average Score per Subject", color='white', fontsize=14, pad=20)
-        ax.tick_params(axis='x', colors='white')
-        ax.tick_params(axis='y', colors='white')
-        ax.set_ylim(0, 100)
-        
-        # Add labels on top of bars
-        for bar in bars:
-            yval = round(bar.get_height(), 1)
-            ax.text(bar.get_x() + bar.get_width()/2, yval + 2, yval, ha='center', va='bottom', color='white', fontsize=10)
-
-        # Remove spines
-        for spine in ax.spines.values():
-            spine.set_visible(False)
-
-        plt.tight_layout()
+        if self.interactive_chart.get():
+            canvas = FigureCanvasTkAgg(subject_average_figure(self._chart_data), master=self.chart_frame)
+            canvas.draw()
+            NavigationToolbar2Tk(canvas, self.chart_frame).update()
+            canvas.get_tk_widget().pack(fill="both", expand=True)
+            return
 
-        canvas = FigureCanvasTkAgg(fig, master=self.chart_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill="both", expand=True)
+        png = self.chart_cache.get_png('subject_averages', self._chart_data, subject_average_figure)
+        # Tk reads PNG natively; keep a reference or Tk drops the image
+        self._chart_image = tk.PhotoImage(data=base64.b64encode(png))
+        tk.Label(self.chart_frame, image=self._chart_image, bg="#2b2b2b", borderwidth=0).pack(fill="both", expand=True)
 
 if __name__ == "__main__":
     app = StudentAppPro()
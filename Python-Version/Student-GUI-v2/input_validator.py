@@ -289,6 +289,35 @@ def validate_student_data(name: str, roll_no: str, marks_dict: dict) -> Tuple[bo
     return True, "", validated_data
 
 
+def validate_class_name(class_name: str) -> Tuple[bool, str, Optional[str]]:
+    """
+    Validate a class/section name (e.g. "10 A", "9-B").
+    
+    Rules:
+    - Can be empty (student not assigned to a class)
+    - Letters, digits, spaces and hyphens only
+    - At most 20 characters
+    
+    Args:
+        class_name: The class name to validate
+        
+    Returns:
+        Tuple of (is_valid, error_message, cleaned_value)
+    """
+    if not class_name or not class_name.strip():
+        return True, "", None
+    
+    class_name = class_name.strip()
+    
+    if len(class_name) > 20:
+        return False, "Class name cannot exceed 20 characters", None
+    
+    if not re.match(r"^[a-zA-Z0-9\s\-]+$", class_name):
+        return False, "Class name can only contain letters, numbers, spaces and hyphens", None
+    
+    return True, "", class_name
+
+
 def validate_search_term(search_term: str) -> Tuple[bool, str]:
     """
     Validate a search term.
@@ -0,0 +1,267 @@
+"""
+Incrementally maintained Performance statistics for the active term.
+
+LiveStats reads every student once, then keeps the dashboard figures current
+without going back to the whole roster: a save or delete only adjusts running
+sums. Each subject, and the per-student averages, have a running count, mean and
+variance (Welford's method, which also undoes a value exactly when a mark is
+changed or removed) and a max-heap for the toppers. Heap entries for old marks
+are dropped lazily when they reach the top, and the heap is rebuilt once they
+outnumber the live ones. Saves cost O(log n); snapshot() is O(1) apart from
+those lazy pops.
+
+Figures follow dashboard_snapshot.compute_dashboard: the class average is the
+mean of per-student averages, toppers are ranked by their average rounded to two
+places, and students without marks count towards the total only. TOPPER_NAME
+lists everyone tied for first; the stored snapshot keeps three, to fit its column.
+
+Local saves and deletes are applied with apply_save()/apply_delete(); refresh()
+replays other users' edits from the MARKS_CHANGES feed, and a RELOAD in the feed
+reseeds everything.
+
+    python live_stats.py
+"""
+
+import time
+import heapq
+import threading
+from datetime import datetime
+from database_helper import ChangeFeed, SUBJ_MAP
+from analytics import GRADE_BANDS, grade_for
+
+# Rows read per round trip while seeding
+SEED_PAGE_SIZE = 5000
+# Best students kept ready per subject
+TOP_N = 5
+
+
+class RunningStat:
+    """Count, mean and variance of a changing collection of numbers (Welford)."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    def remove(self, value):
+        self.count -= 1
+        if self.count == 0:
+            self.mean = self._m2 = 0.0
+            return
+        delta = value - self.mean
+        self.mean -= delta / self.count
+        self._m2 = max(0.0, self._m2 - delta * (value - self.mean))
+
+    @property
+    def variance(self):
+        """Population variance, or None for an empty collection."""
+        return self._m2 / self.count if self.count else None
+
+    @property
+    def stddev(self):
+        return self.variance ** 0.5 if self.count else None
+
+
+class TopHeap:
+    """Highest values by roll number; replaced and removed values are skipped lazily."""
+
+    def __init__(self):
+        self._heap = []  # (-value, roll_no), possibly stale
+        self._values = {}  # roll_no -> current value
+
+    def set(self, roll_no, value):
+        self._values[roll_no] = value
+        heapq.heappush(self._heap, (-value, roll_no))
+        self._compact()
+
+    def discard(self, roll_no):
+        self._values.pop(roll_no, None)
+        self._compact()
+
+    def top(self, n):
+        """Up to n (value, roll_no), best first; ties by roll number."""
+        result, seen = [], set()
+        while self._heap and len(result) < n:
+            negated, roll_no = heapq.heappop(self._heap)
+            # Duplicates of a live entry are dropped here too
+            if roll_no not in seen and self._values.get(roll_no) == -negated:
+                seen.add(roll_no)
+                result.append((-negated, roll_no))
+        for value, roll_no in result:
+            heapq.heappush(self._heap, (-value, roll_no))
+        return result
+
+    def ties(self):
+        """Every (value, roll_no) sharing the highest value, by roll number."""
+        result = []
+        while self._heap:
+            negated, roll_no = self._heap[0]
+            if result and -negated != result[0][0]:
+                break
+            heapq.heappop(self._heap)
+            if self._values.get(roll_no) == -negated and (not result or result[-1][1] != roll_no):
+                result.append((-negated, roll_no))
+        for value, roll_no in result:
+            heapq.heappush(self._heap, (-value, roll_no))
+        return result
+
+    def _compact(self):
+        if len(self._heap) > 2 * len(self._values) + 64:
+            self._heap = [(-value, roll_no) for roll_no, value in self._values.items()]
+            heapq.heapify(self._heap)
+
+
+class LiveStats:
+    def __init__(self):
+        self._students = {}  # roll_no -> (name, {subject: marks})
+        self._averages = {}  # roll_no -> average rounded to 2 places, students with marks only
+        self._class = RunningStat()  # over unrounded per-student averages
+        self._subjects = {sub: RunningStat() for sub in SUBJ_MAP}
+        self._subject_tops = {sub: TopHeap() for sub in SUBJ_MAP}
+        self._average_top = TopHeap()
+        self._grades = {grade: 0 for _, grade in GRADE_BANDS}
+        self._lock = threading.Lock()
+        self.db = None
+        self.feed = None
+        self.updated_at = None
+
+    @classmethod
+    def build(cls, db):
+        """Seed from every student in db and follow its change feed from now on."""
+        stats = cls()
+        # Read the feed position first so saves made during the seed are replayed by refresh()
+        version = db.get_data_version()
+        for record in db.iter_records(page_size=SEED_PAGE_SIZE):
+            stats._set(record['ROLL_NO'], record['NAME'], {sub: record[sub] for sub in SUBJ_MAP})
+        stats.db = db
+        stats.feed = ChangeFeed.from_version(db, version)
+        stats.updated_at = datetime.now()
+        return stats
+
+    def __len__(self):
+        return len(self._students)
+
+    def apply_save(self, roll_no, name, marks_dict):
+        """Account for a saved student; blank ("") subjects keep their marks, as in save_student_marks."""
+        with self._lock:
+            _, marks = self._students.get(roll_no, (None, {}))
+            marks = {**marks, **{sub: int(value) for sub, value in marks_dict.items() if value != "" and sub in SUBJ_MAP}}
+            self._set(roll_no, name, marks)
+            self.updated_at = datetime.now()
+
+    def apply_delete(self, roll_no):
+        with self._lock:
+            self._unset(roll_no)
+            self.updated_at = datetime.now()
+
+    def _set(self, roll_no, name, marks):
+        self._unset(roll_no)
+        marks = {sub: value for sub, value in marks.items() if value is not None}
+        self._students[roll_no] = (name, marks)
+        for sub, value in marks.items():
+            self._subjects[sub].add(value)
+            self._subject_tops[sub].set(roll_no, value)
+        if marks:
+            average = sum(marks.values()) / len(marks)
+            self._class.add(average)
+            rounded = self._averages[roll_no] = round(average, 2)
+            self._average_top.set(roll_no, rounded)
+            self._grades[grade_for(rounded)] += 1
+
+    def _unset(self, roll_no):
+        name_marks = self._students.pop(roll_no, None)
+        if name_marks is None:
+            return
+        _, marks = name_marks
+        for sub, value in marks.items():
+            self._subjects[sub].remove(value)
+            self._subject_tops[sub].discard(roll_no)
+        if marks:
+            self._class.remove(sum(marks.values()) / len(marks))
+            self._grades[grade_for(self._averages.pop(roll_no))] -= 1
+            self._average_top.discard(roll_no)
+
+    def refresh(self):
+        """
+        Apply other users' saves and deletes from the change feed.
+
+        Returns:
+            Number of students re-read or removed
+        """
+        if self.feed is None:
+            return 0
+        changes = self.feed.poll()
+        if 'RELOAD' in changes.values():
+            fresh = LiveStats.build(self.db)
+            with self._lock:
+                self.__dict__.update({key: value for key, value in fresh.__dict__.items() if key != '_lock'})
+            return len(self._students)
+        upserts = [roll_no for roll_no, op in changes.items() if op != 'DELETE']
+        records = {}
+        if upserts:
+            records = {r['ROLL_NO']: r for r in self.db.iter_records(page_size=len(upserts), filters={'roll_nos': upserts})}
+        with self._lock:
+            for roll_no in changes:
+                record = records.get(roll_no)
+                if record is None:
+                    self._unset(roll_no)
+                else:
+                    self._set(roll_no, record['NAME'], {sub: record[sub] for sub in SUBJ_MAP})
+            if changes:
+                self.updated_at = datetime.now()
+        return len(changes)
+
+    def toppers(self, subject=None, n=TOP_N):
+        """
+        Best students overall (by average) or in one subject.
+
+        Returns:
+            List of (roll_no, name, value), best first
+        """
+        with self._lock:
+            heap = self._average_top if subject is None else self._subject_tops[subject]
+            return [(roll_no, self._students[roll_no][0], value) for value, roll_no in heap.top(n)]
+
+    def snapshot(self):
+        """Current figures in the shape of dashboard_snapshot.load_snapshot(), plus spreads and subject toppers."""
+        with self._lock:
+            toppers = [self._students[roll_no][0] for _, roll_no in self._average_top.ties()]
+            return {
+                'TOTAL_STUDENTS': len(self._students),
+                'CLASS_AVG': round(self._class.mean, 2) if self._class.count else None,
+                'CLASS_STDDEV': round(self._class.stddev, 2) if self._class.count else None,
+                'TOPPER_NAME': ", ".join(toppers) or None,
+                'SUBJECT_AVGS': {sub: round(stat.mean, 2) if stat.count else None for sub, stat in self._subjects.items()},
+                'SUBJECT_STDDEVS': {sub: round(stat.stddev, 2) if stat.count else None for sub, stat in self._subjects.items()},
+                'SUBJECT_TOPPERS': {
+                    sub: [(roll_no, self._students[roll_no][0], value) for value, roll_no in heap.top(TOP_N)]
+                    for sub, heap in self._subject_tops.items()
+                },
+                'GRADE_COUNTS': dict(self._grades),
+                'BUILT_AT': self.updated_at,
+            }
+
+
+def main():
+    from database_helper import DatabaseHelper
+
+    started = time.perf_counter()
+    stats = LiveStats.build(DatabaseHelper())
+    print(f"Seeded {len(stats)} students in {time.perf_counter() - started:.2f}s")
+    started = time.perf_counter()
+    snapshot = stats.snapshot()
+    print(f"Snapshot in {(time.perf_counter() - started) * 1000:.3f} ms")
+    print(f"Class average {snapshot['CLASS_AVG']} (sd {snapshot['CLASS_STDDEV']}), topper: {snapshot['TOPPER_NAME']}")
+    for sub in SUBJ_MAP:
+        print(f"{sub:<10}{snapshot['SUBJECT_AVGS'][sub]!s:>8}{snapshot['SUBJECT_STDDEVS'][sub]!s:>8}  "
+              + ", ".join(f"{name} ({value})" for _, name, value in snapshot['SUBJECT_TOPPERS'][sub]))
+
+
+if __name__ == "__main__":
+    main()
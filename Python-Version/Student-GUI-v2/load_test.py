@@ -0,0 +1,241 @@
+"""
+Headless load generator for the StudentAppPro data layer.
+
+Each simulated client loops over a GUI-like mix of calls with random think time:
+    save     save_student_marks for a student in the load-test roll range
+    search   one iter_records page per keystroke while a name prefix is typed
+    refresh  first Treeview page of iter_records, as on opening View Records
+    stats    Performance screen: dashboard snapshot + staleness check (SQLite: data version)
+
+Concurrency is stepped up (--clients 1,5,10,25) and every step reports
+throughput, latency percentiles, errors, and lock-wait / deadlock counts, both
+as seen by clients and, on MySQL, from the server's InnoDB counters. Retries
+done by the resilience layer are reported too, since they hide deadlocks from
+callers.
+
+Targets:
+    --target mysql            DatabaseHelper with the DB_* settings. Point them at a
+                              local stand-in (e.g. a MySQL container loaded with
+                              school_db.sql), never at the school's live database.
+    --target sqlite [--path]  ReplicatedDatabaseHelper with sync disabled: a local
+                              SQLite stand-in for the offline-first mode.
+
+Saves use rolls from --roll-base upwards; --seed students are created there first
+and deleted again at the end unless --keep is given.
+
+Usage:
+    python load_test.py --target sqlite --clients 1,4,16 --duration 20
+    python load_test.py --target mysql --clients 1,10,50 --processes
+"""
+
+import os
+import re
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+from itertools import islice
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from database_helper import DatabaseHelper, SUBJ_MAP
+from local_replica import ReplicatedDatabaseHelper
+from dashboard_snapshot import load_snapshot, is_stale
+from resilience import CircuitOpenError
+
+# Relative frequency of each operation; searches dominate because they fire per keystroke
+OP_WEIGHTS = {'save': 2, 'search': 4, 'refresh': 2, 'stats': 1}
+# Rows in the first Treeview page (gui_app_v2.PAGE_SIZE)
+PAGE_SIZE = 200
+
+FIRST_NAMES = ["Aarav", "Ananya", "Arjun", "Diya", "Ishaan", "Kavya", "Lakshmi", "Manoj", "Meera", "Nikhil",
+               "Pooja", "Priya", "Rahul", "Rohan", "Sanjay", "Shreya", "Suresh", "Tanvi", "Varun", "Vikram"]
+LAST_NAMES = ["Bhat", "Gowda", "Hegde", "Iyer", "Kulkarni", "Nair", "Patil", "Rao", "Reddy", "Shetty",
+              "Sharma", "Shenoy", "Verma"]
+
+
+class LocalOnlyReplica(ReplicatedDatabaseHelper):
+    """Replica that never syncs, so the run measures SQLite alone."""
+
+    def sync_async(self):
+        pass
+
+
+def make_db(target, path, tenant):
+    if target == 'sqlite':
+        return LocalOnlyReplica(path, remote=None)
+    return DatabaseHelper(tenant=tenant)
+
+
+def student_name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def classify(error):
+    """Map an exception or failed-call message to lock_wait / deadlock / circuit_open / error."""
+    if isinstance(error, CircuitOpenError):
+        return 'circuit_open'
+    if isinstance(error, sqlite3.OperationalError) and 'locked' in str(error):
+        return 'lock_wait'
+    match = re.search(r"\((\d{4}),", str(error))
+    code = int(match.group(1)) if match else None
+    return {1205: 'lock_wait', 1213: 'deadlock'}.get(code, 'error')
+
+
+def run_client(target, path, tenant, roll_base, roll_count, duration, think_ms, seed):
+    """
+    One simulated GUI client. Runs until duration elapses.
+
+    Returns:
+        List of (op, latency_seconds, outcome) where outcome is 'ok' or an error class
+    """
+    rng = random.Random(seed)
+    db = make_db(target, path, tenant)
+    ops, weights = list(OP_WEIGHTS), list(OP_WEIGHTS.values())
+    samples = []
+    deadline = time.perf_counter() + duration
+
+    def timed(op, call):
+        started = time.perf_counter()
+        try:
+            failure = call()
+            outcome = classify(failure) if failure else 'ok'
+        except Exception as e:
+            outcome = classify(e)
+        samples.append((op, time.perf_counter() - started, outcome))
+
+    def save():
+        marks = {sub: str(rng.randint(0, 100)) for sub in SUBJ_MAP}
+        success, msg = db.save_student_marks(student_name(rng), roll_base + rng.randrange(roll_count), marks)
+        return None if success else msg
+
+    def search(prefix):
+        list(islice(db.iter_records(page_size=PAGE_SIZE, filters={'search': prefix}), PAGE_SIZE))
+
+    def refresh():
+        list(islice(db.iter_records(page_size=PAGE_SIZE), PAGE_SIZE))
+
+    def stats():
+        if target == 'sqlite':
+            db.get_data_version()
+        else:
+            is_stale(db, load_snapshot(db))
+
+    while time.perf_counter() < deadline:
+        op = rng.choices(ops, weights)[0]
+        if op == 'search':
+            # Typing a surname: one query per keystroke, with typing-speed gaps
+            word = rng.choice(LAST_NAMES)
+            for length in range(1, rng.randint(2, len(word)) + 1):
+                timed('search', lambda: search(word[:length]))
+                time.sleep(rng.uniform(0.05, 0.15))
+        else:
+            timed(op, {'save': save, 'refresh': refresh, 'stats': stats}[op])
+        time.sleep(rng.expovariate(1000 / think_ms) if think_ms else 0)
+    return samples
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))]
+
+
+def server_lock_counters(db):
+    """InnoDB (row lock waits, deadlocks) since server start, or None when unavailable."""
+    conn = db.connect()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SHOW GLOBAL STATUS LIKE 'Innodb_row_lock_waits'")
+            waits = int(cursor.fetchone()['Value'])
+            cursor.execute("SELECT `COUNT` AS N FROM information_schema.INNODB_METRICS WHERE NAME = 'lock_deadlocks'")
+            row = cursor.fetchone()
+            return waits, int(row['N']) if row else 0
+    except Exception:
+        return None
+    finally:
+        conn.close()
+
+
+def summarize(clients, elapsed, samples, server_delta, retries):
+    by_op = defaultdict(list)
+    outcomes = defaultdict(int)
+    for op, latency, outcome in samples:
+        by_op[op].append(latency)
+        outcomes[outcome] += 1
+
+    def row(label, latencies):
+        latencies = sorted(latencies)
+        p50, p95, p99 = (percentile(latencies, p) * 1000 for p in (50, 95, 99))
+        return f"{label:<10}{len(latencies) / elapsed:>9.1f}{p50:>9.1f}{p95:>9.1f}{p99:>9.1f}"
+
+    lock_waits, deadlocks = outcomes['lock_wait'], outcomes['deadlock']
+    if server_delta:
+        # Clients only see the waits that timed out; the server counts every one
+        lock_waits = f"{lock_waits} (server {server_delta[0]})"
+        deadlocks = f"{deadlocks} (server {server_delta[1]})"
+    print(f"\n{clients} clients, {elapsed:.0f}s")
+    print(f"{'op':<10}{'ops/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    print(row("all", [latency for _, latency, _ in samples]))
+    for op in OP_WEIGHTS:
+        if by_op[op]:
+            print(row(op, by_op[op]))
+    print(f"errors {outcomes['error']}   lock waits {lock_waits}   deadlocks {deadlocks}   "
+          f"circuit open {outcomes['circuit_open']}   retries {retries}")
+
+
+def run_step(args, path, clients, step):
+    seeds = [step * 10_000 + n for n in range(clients)]
+    client_args = [(args.target, path, args.tenant, args.roll_base, args.seed or 1, args.duration, args.think_ms, seed)
+                   for seed in seeds]
+    executor = ProcessPoolExecutor(clients) if args.processes else ThreadPoolExecutor(clients)
+    with executor:
+        futures = [executor.submit(run_client, *a) for a in client_args]
+        return [sample for future in futures for sample in future.result()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate many StudentAppPro clients against one database")
+    parser.add_argument('--target', choices=['mysql', 'sqlite'], default='mysql')
+    parser.add_argument('--path', help="SQLite file for --target sqlite (default: a temporary file)")
+    parser.add_argument('--tenant', default=os.getenv('TENANT_ID') or None, help="school shard to load (multi-school deployments)")
+    parser.add_argument('--clients', default="1,5,10,25", help="comma-separated concurrency steps")
+    parser.add_argument('--duration', type=float, default=30, help="seconds per step")
+    parser.add_argument('--think-ms', type=float, default=300, help="mean pause between a client's actions")
+    parser.add_argument('--processes', action='store_true', help="one process per client instead of threads")
+    parser.add_argument('--roll-base', type=int, default=900_000, help="first roll number used for test students")
+    parser.add_argument('--seed', type=int, default=1000, help="test students created before the run")
+    parser.add_argument('--keep', action='store_true', help="keep the test students afterwards")
+    args = parser.parse_args()
+
+    path = args.path
+    if args.target == 'sqlite' and not path:
+        path = os.path.join(tempfile.mkdtemp(prefix="loadtest-"), "replica.db")
+    db = make_db(args.target, path, args.tenant)
+
+    rng = random.Random(0)
+    print(f"Seeding {args.seed} students from roll {args.roll_base}...")
+    for roll_no in range(args.roll_base, args.roll_base + args.seed):
+        db.save_student_marks(student_name(rng), roll_no, {sub: str(rng.randint(0, 100)) for sub in SUBJ_MAP})
+
+    try:
+        for step, clients in enumerate(int(c) for c in args.clients.split(",")):
+            before = server_lock_counters(db) if args.target == 'mysql' else None
+            retries_before = db.resilience_metrics()['retries'] if args.target == 'mysql' else 0
+            started = time.perf_counter()
+            samples = run_step(args, path, clients, step)
+            elapsed = time.perf_counter() - started
+            after = server_lock_counters(db) if before else None
+            # Client processes keep their own counters, so retries are only visible with threads
+            retries = db.resilience_metrics()['retries'] - retries_before if args.target == 'mysql' and not args.processes else "-"
+            summarize(clients, elapsed, samples, (after[0] - before[0], after[1] - before[1]) if after else None, retries)
+    finally:
+        if not args.keep:
+            print(f"\nRemoving {args.seed} test students...")
+            for roll_no in range(args.roll_base, args.roll_base + args.seed):
+                db.delete_student(roll_no)
+
+
+if __name__ == "__main__":
+    main()
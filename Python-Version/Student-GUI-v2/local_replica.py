@@ -0,0 +1,456 @@
+"""
+Offline-first local replica of STUDENTS/MARKS.
+
+ReplicatedDatabaseHelper keeps a SQLite copy of the roster next to the app and
+exposes the same read/write API as DatabaseHelper. Reads are served locally, so
+they never wait on the hosted MySQL. Writes are applied locally and queued in a
+durable OUTBOX table; a background thread pushes the queue to MySQL in batches
+and then applies the MySQL change feed (MARKS_CHANGES) to the replica. Mark edits carry the value they were based on,
+so an edit made on stale data is recorded as a conflict keyed on
+(ROLL_NO, SUBJ_ID) instead of silently overwriting someone else's change;
+resolve_conflict() settles one by keeping the local or the server value.
+The replica holds the marks of one term, the one active in MySQL when it was
+seeded. Queued edits carry that term, so they land in it even if another term
+has been activated by the time they sync; once the outbox is pushed, a replica
+of a term that is no longer active is reseeded from the new one.
+"""
+
+import sqlite3
+import threading
+from datetime import datetime
+from itertools import takewhile
+from database_helper import SUBJ_MAP, SORT_FIELDS, PIVOT_COLUMNS, StudentRecord, ChangeFeed
+
+REPLICA_SCHEMA = """
+CREATE TABLE IF NOT EXISTS STUDENTS (
+    ROLL_NO INTEGER PRIMARY KEY,
+    NAME TEXT
+);
+CREATE TABLE IF NOT EXISTS MARKS (
+    ROLL_NO INTEGER,
+    SUBJ_ID INTEGER,
+    MARKS INTEGER,
+    PRIMARY KEY (ROLL_NO, SUBJ_ID)
+);
+-- Pending writes in the order they were made. OP is STUDENT, MARK or DELETE.
+-- TERM_ID/ACADEMIC_YEAR: term the replica held when the edit was made (NULL: not seeded yet, use the active one)
+CREATE TABLE IF NOT EXISTS OUTBOX (
+    SEQ INTEGER PRIMARY KEY AUTOINCREMENT,
+    OP TEXT NOT NULL,
+    ROLL_NO INTEGER NOT NULL,
+    NAME TEXT,
+    SUBJ_ID INTEGER,
+    MARKS INTEGER,
+    BASE_MARKS INTEGER,
+    CREATED_AT TEXT,
+    TERM_ID INTEGER,
+    ACADEMIC_YEAR INTEGER
+);
+-- Local change feed for the GUI, same shape as MARKS_CHANGES in MySQL
+CREATE TABLE IF NOT EXISTS CHANGES (
+    SEQ INTEGER PRIMARY KEY AUTOINCREMENT,
+    ROLL_NO INTEGER NOT NULL,
+    OP TEXT NOT NULL
+);
+-- remote_seq: last MARKS_CHANGES sequence applied to the replica
+-- term_id, academic_year: the term whose marks the replica holds
+CREATE TABLE IF NOT EXISTS META (
+    KEY TEXT PRIMARY KEY,
+    VALUE TEXT
+);
+CREATE TABLE IF NOT EXISTS CONFLICTS (
+    ROLL_NO INTEGER,
+    SUBJ_ID INTEGER,
+    LOCAL_MARKS INTEGER,
+    REMOTE_MARKS INTEGER,
+    BASE_MARKS INTEGER,
+    DETECTED_AT TEXT,
+    TERM_ID INTEGER,
+    ACADEMIC_YEAR INTEGER
+);
+"""
+# Columns added since the first release, for replicas created before them
+ADDED_COLUMNS = {
+    'OUTBOX': ["TERM_ID INTEGER", "ACADEMIC_YEAR INTEGER"],
+    'CONFLICTS': ["TERM_ID INTEGER", "ACADEMIC_YEAR INTEGER"],
+}
+
+
+class ReplicatedDatabaseHelper:
+    def __init__(self, path, remote, sync_interval=15, batch_size=200, page_size=1000):
+        """
+        Args:
+            path: SQLite file holding the replica and the outbox
+            remote: DatabaseHelper for the hosted MySQL database
+            sync_interval: Seconds between background sync attempts
+            batch_size: Outbox entries pushed per MySQL transaction
+            page_size: Rows per page when refreshing the replica from MySQL
+        """
+        self.path = path
+        self.remote = remote
+        self.sync_interval = sync_interval
+        self.batch_size = batch_size
+        self.page_size = page_size
+        self.online = False
+        self.last_sync_error = None
+        self._sync_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._feed = None
+
+        with self._local() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(REPLICA_SCHEMA)
+            for table, columns in ADDED_COLUMNS.items():
+                existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+                for column in columns:
+                    if column.split()[0] not in existing:
+                        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column}")
+
+    def _local(self):
+        # One short-lived connection per call so the GUI and sync threads never share one
+        return _closing_transaction(sqlite3.connect(self.path, timeout=30))
+
+    # --- DatabaseHelper API ---
+    def save_student_marks(self, name, roll_no, marks_dict):
+        now = datetime.now().isoformat(timespec='seconds')
+        try:
+            with self._local() as conn:
+                term_id, academic_year = self._replica_term(conn)
+                conn.execute("INSERT INTO STUDENTS (ROLL_NO, NAME) VALUES (?, ?) ON CONFLICT(ROLL_NO) DO UPDATE SET NAME=excluded.NAME", (roll_no, name))
+                conn.execute("INSERT INTO OUTBOX (OP, ROLL_NO, NAME, CREATED_AT, TERM_ID, ACADEMIC_YEAR) VALUES ('STUDENT', ?, ?, ?, ?, ?)",
+                             (roll_no, name, now, term_id, academic_year))
+                for sub_name, marks in marks_dict.items():
+                    if marks == "": continue
+                    sub_id = SUBJ_MAP.get(sub_name)
+                    if not sub_id:
+                        continue
+                    base = conn.execute("SELECT MARKS FROM MARKS WHERE ROLL_NO=? AND SUBJ_ID=?", (roll_no, sub_id)).fetchone()
+                    conn.execute("INSERT OR REPLACE INTO MARKS (ROLL_NO, SUBJ_ID, MARKS) VALUES (?, ?, ?)", (roll_no, sub_id, int(marks)))
+                    conn.execute("""
+                        INSERT INTO OUTBOX (OP, ROLL_NO, SUBJ_ID, MARKS, BASE_MARKS, CREATED_AT, TERM_ID, ACADEMIC_YEAR)
+                        VALUES ('MARK', ?, ?, ?, ?, ?, ?, ?)
+                    """, (roll_no, sub_id, int(marks), base[0] if base else None, now, term_id, academic_year))
+                conn.execute("INSERT INTO CHANGES (ROLL_NO, OP) VALUES (?, 'UPSERT')", (roll_no,))
+            self.sync_async()
+            return True, "Data Saved Successfully"
+        except sqlite3.Error as e:
+            print(f"Local Replica Error: {e}")
+            return False, f"Local save failed: {str(e)}"
+
+    def get_all_records(self):
+        try:
+            return list(self.iter_records(page_size=self.page_size))
+        except sqlite3.Error as e:
+            print(f"Error fetching records: {e}")
+            return None
+
+    def iter_records(self, page_size=500, after_roll=None, filters=None, order_by=None, descending=False):
+        filters = filters or {}
+        conditions, filter_params = [], []
+        if filters.get('search'):
+            pattern = "%" + filters['search'].replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            conditions.append("(CAST(ROLL_NO AS TEXT) LIKE ? ESCAPE '\\' OR NAME LIKE ? ESCAPE '\\')")
+            filter_params += [pattern, pattern]
+        if filters.get('roll_nos') is not None:
+            roll_nos = list(filters['roll_nos'])
+            if not roll_nos:
+                return
+            conditions.append(f"ROLL_NO IN ({', '.join(['?'] * len(roll_nos))})")
+            filter_params += roll_nos
+
+        if order_by not in (None, 'ROLL_NO') or descending:
+            yield from self._iter_sorted(conditions, filter_params, order_by or 'ROLL_NO', descending, page_size)
+            return
+
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            while True:
+                where = list(conditions)
+                params = list(filter_params)
+                if after_roll is not None:
+                    where.append("ROLL_NO > ?")
+                    params.append(after_roll)
+                where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+                page = conn.execute(f"""
+                    SELECT s.ROLL_NO, s.NAME,
+                        {PIVOT_COLUMNS}
+                    FROM (
+                        SELECT ROLL_NO, NAME FROM STUDENTS
+                        {where_sql}
+                        ORDER BY ROLL_NO
+                        LIMIT ?
+                    ) s
+                    LEFT JOIN MARKS m ON s.ROLL_NO = m.ROLL_NO
+                    GROUP BY s.ROLL_NO, s.NAME
+                    ORDER BY s.ROLL_NO
+                """, params + [page_size]).fetchall()
+                yield from (StudentRecord(*row) for row in page)
+                if len(page) < page_size:
+                    return
+                after_roll = page[-1][0]
+        finally:
+            conn.close()
+
+    def _iter_sorted(self, conditions, filter_params, order_by, descending, page_size):
+        # One school's roster: SQLite sorts the whole pivot once and it is streamed from one cursor
+        if order_by not in SORT_FIELDS:
+            raise ValueError(f"Unknown sort field: {order_by}")
+        key = {'ROLL_NO': "s.ROLL_NO", 'NAME': "s.NAME", 'TOTAL': "SUM(m.MARKS)",
+               'AVERAGE': "ROUND(AVG(m.MARKS), 2)"}.get(order_by) or order_by
+        direction = "DESC" if descending else "ASC"
+        where_sql = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            # Students without the key come last, ordered as in DatabaseHelper.iter_records
+            cursor = conn.execute(f"""
+                SELECT s.ROLL_NO, s.NAME,
+                    {PIVOT_COLUMNS}
+                FROM (SELECT ROLL_NO, NAME FROM STUDENTS {where_sql}) s
+                LEFT JOIN MARKS m ON s.ROLL_NO = m.ROLL_NO
+                GROUP BY s.ROLL_NO, s.NAME
+                ORDER BY {key} IS NULL, {key} {direction}, s.ROLL_NO {direction}
+            """, filter_params)
+            while True:
+                page = cursor.fetchmany(page_size)
+                yield from (StudentRecord(*row) for row in page)
+                if len(page) < page_size:
+                    return
+        finally:
+            conn.close()
+
+    def delete_student(self, roll_no):
+        try:
+            with self._local() as conn:
+                conn.execute("DELETE FROM MARKS WHERE ROLL_NO=?", (roll_no,))
+                conn.execute("DELETE FROM STUDENTS WHERE ROLL_NO=?", (roll_no,))
+                conn.execute("INSERT INTO OUTBOX (OP, ROLL_NO, CREATED_AT, TERM_ID, ACADEMIC_YEAR) VALUES ('DELETE', ?, ?, ?, ?)",
+                             (roll_no, datetime.now().isoformat(timespec='seconds'), *self._replica_term(conn)))
+                conn.execute("INSERT INTO CHANGES (ROLL_NO, OP) VALUES (?, 'DELETE')", (roll_no,))
+            self.sync_async()
+            return True, "Record deleted successfully"
+        except sqlite3.Error as e:
+            return False, str(e)
+
+    def get_student_names(self, roll_nos=None):
+        if roll_nos is not None and not roll_nos:
+            return []
+        with self._local() as conn:
+            if roll_nos is None:
+                return conn.execute("SELECT ROLL_NO, NAME FROM STUDENTS").fetchall()
+            roll_nos = list(roll_nos)
+            return conn.execute(f"SELECT ROLL_NO, NAME FROM STUDENTS WHERE ROLL_NO IN ({', '.join(['?'] * len(roll_nos))})",
+                                roll_nos).fetchall()
+
+    def get_data_version(self):
+        with self._local() as conn:
+            return conn.execute("SELECT COALESCE(MAX(SEQ), 0) FROM CHANGES").fetchone()[0]
+
+    def get_changes(self, since_seq, limit=1000):
+        with self._local() as conn:
+            rows = conn.execute("SELECT SEQ, ROLL_NO, OP FROM CHANGES WHERE SEQ > ? ORDER BY SEQ LIMIT ?",
+                                (since_seq, limit)).fetchall()
+        return [{'SEQ': seq, 'ROLL_NO': roll_no, 'OP': op} for seq, roll_no, op in rows]
+
+    # --- Sync status ---
+    def pending_count(self):
+        with self._local() as conn:
+            return conn.execute("SELECT COUNT(*) FROM OUTBOX").fetchone()[0]
+
+    def get_conflicts(self):
+        """Unresolved conflicts: (ID, ROLL_NO, SUBJ_ID, LOCAL_MARKS, REMOTE_MARKS, BASE_MARKS, DETECTED_AT)."""
+        with self._local() as conn:
+            return conn.execute("""
+                SELECT rowid, ROLL_NO, SUBJ_ID, LOCAL_MARKS, REMOTE_MARKS, BASE_MARKS, DETECTED_AT
+                FROM CONFLICTS ORDER BY DETECTED_AT, rowid
+            """).fetchall()
+
+    def resolve_conflict(self, conflict_id, keep_mine):
+        """
+        Settle a conflict from get_conflicts().
+
+        Keeping mine queues the local mark again, based on the server value the conflict
+        found, so it overwrites theirs unless the mark has changed once more since (which
+        records a new conflict). Keeping theirs puts the server value back in the replica.
+        """
+        try:
+            with self._local() as conn:
+                row = conn.execute("""
+                    SELECT ROLL_NO, SUBJ_ID, LOCAL_MARKS, REMOTE_MARKS, TERM_ID, ACADEMIC_YEAR
+                    FROM CONFLICTS WHERE rowid = ?
+                """, (conflict_id,)).fetchone()
+                if row is None:
+                    return False, "Conflict already resolved"
+                roll_no, subj_id, local_marks, remote_marks, term_id, academic_year = row
+                conn.execute("DELETE FROM CONFLICTS WHERE rowid = ?", (conflict_id,))
+                if keep_mine:
+                    conn.execute("""
+                        INSERT INTO OUTBOX (OP, ROLL_NO, SUBJ_ID, MARKS, BASE_MARKS, CREATED_AT, TERM_ID, ACADEMIC_YEAR)
+                        VALUES ('MARK', ?, ?, ?, ?, ?, ?, ?)
+                    """, (roll_no, subj_id, local_marks, remote_marks, datetime.now().isoformat(timespec='seconds'),
+                          term_id, academic_year))
+                # The replica shows the kept value if it still holds the conflict's term
+                if (term_id, academic_year) == self._replica_term(conn):
+                    kept = local_marks if keep_mine else remote_marks
+                    if kept is None:
+                        conn.execute("DELETE FROM MARKS WHERE ROLL_NO=? AND SUBJ_ID=?", (roll_no, subj_id))
+                    else:
+                        conn.execute("INSERT OR REPLACE INTO MARKS (ROLL_NO, SUBJ_ID, MARKS) VALUES (?, ?, ?)",
+                                     (roll_no, subj_id, kept))
+                    conn.execute("INSERT INTO CHANGES (ROLL_NO, OP) VALUES (?, 'UPSERT')", (roll_no,))
+            if keep_mine:
+                self.sync_async()
+            return True, "Conflict resolved"
+        except sqlite3.Error as e:
+            return False, str(e)
+
+    # --- Background sync ---
+    def start_sync(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._sync_loop, name="replica-sync", daemon=True)
+            self._thread.start()
+
+    def stop_sync(self):
+        self._stop.set()
+
+    def sync_async(self):
+        threading.Thread(target=self.sync_now, name="replica-sync-once", daemon=True).start()
+
+    def _sync_loop(self):
+        while not self._stop.is_set():
+            self.sync_now()
+            self._stop.wait(self.sync_interval)
+
+    def sync_now(self):
+        """Push the outbox to MySQL in batches, then refresh the replica. Returns True when online."""
+        # Overlapping triggers (timer + save) just skip; the running sync picks up their entries
+        if not self._sync_lock.acquire(blocking=False):
+            return self.online
+        try:
+            self._push_outbox()
+            self._pull_remote()
+            self.online = True
+            self.last_sync_error = None
+        except Exception as e:
+            # Leave the outbox intact; the next attempt retries from the first unsent entry
+            self.online = False
+            self.last_sync_error = str(e)
+            print(f"Replica sync failed: {e}")
+        finally:
+            self._sync_lock.release()
+        return self.online
+
+    def _push_outbox(self):
+        while True:
+            with self._local() as conn:
+                batch = conn.execute("""
+                    SELECT SEQ, OP, ROLL_NO, NAME, SUBJ_ID, MARKS, BASE_MARKS, TERM_ID, ACADEMIC_YEAR
+                    FROM OUTBOX ORDER BY SEQ LIMIT ?
+                """, (self.batch_size,)).fetchall()
+            if not batch:
+                return
+            # One term per transaction: the batch ends where the term changes
+            batch = list(takewhile(lambda entry: entry[7:] == batch[0][7:], batch))
+            term = self.remote.term_key(batch[0][7:] if batch[0][7] is not None else None)
+            conflicts = self.remote.apply_changes([
+                {'op': op, 'roll_no': roll_no, 'name': name, 'subj_id': subj_id, 'marks': marks, 'base_marks': base}
+                for _, op, roll_no, name, subj_id, marks, base, _, _ in batch
+            ], term=term)
+            now = datetime.now().isoformat(timespec='seconds')
+            with self._local() as conn:
+                conn.executemany("""
+                    INSERT INTO CONFLICTS (ROLL_NO, SUBJ_ID, LOCAL_MARKS, REMOTE_MARKS, BASE_MARKS, DETECTED_AT, TERM_ID, ACADEMIC_YEAR)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, [(c['roll_no'], c['subj_id'], c['marks'], c['remote_marks'], c['base_marks'], now, *term) for c in conflicts])
+                conn.execute("DELETE FROM OUTBOX WHERE SEQ <= ?", (batch[-1][0],))
+
+    def _pull_remote(self):
+        with self._local() as conn:
+            row = conn.execute("SELECT VALUE FROM META WHERE KEY = 'remote_seq'").fetchone()
+            term = self._replica_term(conn)
+        # The outbox has just been pushed, so a replica of a term no longer active can be replaced
+        if row is None or term != self.remote.term_key():
+            self._reload_from_remote()
+            return
+        if self._feed is None:
+            self._feed = ChangeFeed(self.remote, int(row[0]), batch_size=self.page_size)
+
+        # Apply only the rolls that changed in MySQL since the last pull
+        while True:
+            changes = self._feed.poll()
+            if not changes:
+                return
+            upserts = [roll_no for roll_no, op in changes.items() if op == 'UPSERT']
+            fresh = list(self.remote.iter_records(page_size=len(upserts), filters={'roll_nos': upserts})) if upserts else []
+            with self._local() as conn:
+                pending = self._pending_rolls(conn)
+                applied = [(roll_no, op) for roll_no, op in changes.items() if roll_no not in pending]
+                conn.executemany("DELETE FROM MARKS WHERE ROLL_NO=?", [(roll_no,) for roll_no, _ in applied])
+                conn.executemany("DELETE FROM STUDENTS WHERE ROLL_NO=?", [(roll_no,) for roll_no, _ in applied])
+                self._insert_records(conn, [r for r in fresh if r['ROLL_NO'] not in pending])
+                conn.executemany("INSERT INTO CHANGES (ROLL_NO, OP) VALUES (?, ?)", applied)
+                conn.execute("INSERT OR REPLACE INTO META (KEY, VALUE) VALUES ('remote_seq', ?)", (self._feed.last_seq,))
+
+    def _reload_from_remote(self):
+        # Read the version first: changes racing with the copy are replayed by the feed afterwards
+        version = self.remote.get_data_version()
+        term_id, academic_year = self.remote.term_key()
+        # Fetch the whole roster first so a dropped link never leaves a half-replaced replica
+        records = list(self.remote.iter_records(page_size=self.page_size, term=(term_id, academic_year)))
+
+        with self._local() as conn:
+            # Rolls with unsent local edits keep their local state until the outbox drains
+            pending = self._pending_rolls(conn)
+            if pending:
+                placeholders = ', '.join('?' * len(pending))
+                conn.execute(f"DELETE FROM MARKS WHERE ROLL_NO NOT IN ({placeholders})", list(pending))
+                conn.execute(f"DELETE FROM STUDENTS WHERE ROLL_NO NOT IN ({placeholders})", list(pending))
+            else:
+                conn.execute("DELETE FROM MARKS")
+                conn.execute("DELETE FROM STUDENTS")
+            self._insert_records(conn, [r for r in records if r['ROLL_NO'] not in pending])
+            # One RELOAD entry tells feed consumers to re-read everything
+            conn.execute("INSERT INTO CHANGES (ROLL_NO, OP) VALUES (0, 'RELOAD')")
+            conn.executemany("INSERT OR REPLACE INTO META (KEY, VALUE) VALUES (?, ?)",
+                             [('remote_seq', version), ('term_id', term_id), ('academic_year', academic_year)])
+        self._feed = ChangeFeed.from_version(self.remote, version, batch_size=self.page_size)
+
+    @staticmethod
+    def _replica_term(conn):
+        """(TERM_ID, ACADEMIC_YEAR) the replica holds, or (None, None) before it is first seeded."""
+        meta = dict(conn.execute("SELECT KEY, VALUE FROM META WHERE KEY IN ('term_id', 'academic_year')").fetchall())
+        if len(meta) < 2:
+            return None, None
+        return int(meta['term_id']), int(meta['academic_year'])
+
+    @staticmethod
+    def _pending_rolls(conn):
+        return {row[0] for row in conn.execute("SELECT DISTINCT ROLL_NO FROM OUTBOX")}
+
+    @staticmethod
+    def _insert_records(conn, records):
+        conn.executemany("INSERT OR IGNORE INTO STUDENTS (ROLL_NO, NAME) VALUES (?, ?)",
+                         [(r['ROLL_NO'], r['NAME']) for r in records])
+        conn.executemany("INSERT OR IGNORE INTO MARKS (ROLL_NO, SUBJ_ID, MARKS) VALUES (?, ?, ?)",
+                         [(r['ROLL_NO'], sub_id, r[sub_name]) for r in records
+                          for sub_name, sub_id in SUBJ_MAP.items() if r[sub_name] is not None])
+
+
+class _closing_transaction:
+    """Context manager: commit on success, roll back on error, always close."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+        finally:
+            self.conn.close()
@@ -0,0 +1,461 @@
+"""
+In-memory word index over STUDENTS.NAME for typo-tolerant name search.
+
+Names are case-folded, stripped of accents and common romanization variants
+(Laxmi/Lakshmi, Chatterjee/Chaterji) and split into words. Matching is per word:
+each query word is compared with the distinct words of all names (a vocabulary
+of a few thousand, however many students there are) and scores 1.0 for the
+same word or, for the word still being typed, a prefix of it ("Kulk" for
+"Kulkarni"). Otherwise the score is the share of the query word's letters that
+need no edit, with a transposition counting as one edit, so "Sharmaa", "Shrma"
+and "Shrama" all find "Sharma". A name scores the mean over the query words of
+its best matching word, so letters never line up across word boundaries.
+
+Vocabulary words that might be within reach of a misspelt query word come from
+two lookups: a table of every word with one letter deleted (which catches one
+insertion, deletion, substitution or transposition exactly) and the word
+trigrams, where only the query's rarest trigrams are read and at most
+FUZZY_WORDS candidates go on to the edit distance. Names are then gathered from
+the matching words, best words and shortest names first, and at most
+max(limit * CANDIDATES_PER_RESULT, MIN_CANDIDATES) of them are scored. For
+several query words, the names matching every word are found by set
+intersection first. Results are ranked by score, then shortest name first.
+On a synthetic roster of 120,000 names (bench_name_index.py) a search for one
+or two words takes about half a millisecond, and for three about one.
+
+The index is built once from the database and kept current by add()/remove()
+on local saves and deletes, and by refresh(), which replays the MARKS_CHANGES
+feed for everyone else's edits. Nothing here touches Tk, so reports and scripts
+can use it too:
+
+    python name_index.py "shrama"
+"""
+
+import re
+import sys
+import time
+import bisect
+import threading
+import unicodedata
+from itertools import chain, repeat
+from collections import Counter, defaultdict
+from database_helper import ChangeFeed
+
+DEFAULT_MIN_SCORE = 0.4
+# A vocabulary word counts as a match for a query word from this edit similarity up
+MIN_WORD_SCORE = 0.6
+# Vocabulary words taken from the trigram lookup for the edit distance, per query word
+FUZZY_WORDS = 32
+# Most common trigrams of a query word left out of that lookup
+COMMON_TRIGRAMS = 2
+# Query words whose matching vocabulary words are remembered between searches
+MATCH_CACHE_SIZE = 512
+# Names scored per requested result, and at least
+CANDIDATES_PER_RESULT = 4
+MIN_CANDIDATES = 100
+# Romanized spellings of the same Indian name, folded to one form before indexing:
+# Laxmi/Lakshmi, Deepak/Dipak, Pooja/Puja, Vishwas/Vishvas, Shrinivas/Srinivas, Bhatt/Bhat
+SPELLING_FOLDS = [
+    (re.compile(r"x"), "ks"),
+    (re.compile(r"ee"), "i"),
+    (re.compile(r"oo"), "u"),
+    (re.compile(r"w"), "v"),
+    (re.compile(r"(?<=[b-df-hj-np-tv-z])h"), ""),  # aspirates: bh, dh, sh, th...
+    (re.compile(r"(\w)\1+"), r"\1"),  # doubled letters
+]
+
+
+def normalize(text):
+    """Search form of a name: case-folded, accent-free words with spelling variants folded."""
+    text = unicodedata.normalize('NFKD', text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[^\w\s]", " ", text.casefold())
+    for pattern, replacement in SPELLING_FOLDS:
+        text = pattern.sub(replacement, text)
+    return " ".join(text.split())
+
+
+def word_trigrams(word, partial=False):
+    """
+    Trigrams of one normalized word padded with a space at each end (" sh", "sha", ..., "ma ").
+
+    Args:
+        partial: Leave the end unpadded, for a word that is still being typed
+    """
+    padded = f" {word}" if partial else f" {word} "
+    return {padded[j:j + 3] for j in range(len(padded) - 2)}
+
+
+def deletions(word):
+    """word with each one of its letters left out."""
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def close_distance(query_word, word):
+    """Edit distance of two different words sharing a one-letter deletion, which makes it 1 or 2."""
+    if len(query_word) != len(word):
+        return 1  # one is the other with a letter left out
+    differ = [i for i, (a, b) in enumerate(zip(query_word, word)) if a != b]
+    if len(differ) == 1:
+        return 1
+    first, second = differ[0], differ[-1]
+    if len(differ) == 2 and second == first + 1 and query_word[first] == word[second] and query_word[second] == word[first]:
+        return 1  # neighbouring letters swapped
+    return 2
+
+
+def letter_masks(word):
+    """Bit i of letter_masks(word)[c] is set when word[i] == c."""
+    masks = {}
+    for i, char in enumerate(word):
+        masks[char] = masks.get(char, 0) | 1 << i
+    return masks
+
+
+def edit_distances(query_word, word, masks=None):
+    """
+    Optimal string alignment distance (insertions, deletions, substitutions and adjacent
+    transpositions) from query_word to word, and to the closest prefix of word.
+
+    Bit-parallel (Myers, with Hyyro's transposition step): one pass over word, with
+    the distances for every prefix of query_word held in the bits of a few integers.
+
+    Args:
+        masks: letter_masks(query_word), when comparing it with many words
+
+    Returns:
+        (distance, prefix_distance)
+    """
+    length = len(query_word)
+    if not length:
+        return len(word), 0
+    masks = masks if masks is not None else letter_masks(query_word)
+    everything, top = (1 << length) - 1, 1 << (length - 1)
+    plus, minus, matched, last = everything, 0, 0, 0
+    distance = prefix_distance = length
+    for char in word:
+        mask = masks.get(char, 0)
+        transposed = ((~matched & mask) << 1) & last
+        matched = ((((mask & plus) + plus) ^ plus) | mask | minus | transposed) & everything
+        up = minus | ~(matched | plus) & everything
+        down = matched & plus
+        if up & top:
+            distance += 1
+        elif down & top:
+            distance -= 1
+        prefix_distance = min(prefix_distance, distance)
+        up = (up << 1 | 1) & everything
+        down = (down << 1) & everything
+        plus = down | ~(matched | up) & everything
+        minus = matched & up
+        last = mask
+    return distance, prefix_distance
+
+
+def word_score(query_word, word, partial=False, masks=None):
+    """
+    Similarity (0-1) of a vocabulary word to a query word: the share of the query word's letters
+    that need no edit. A partial query word is compared with the closest prefix of word.
+
+    Args:
+        masks: letter_masks(query_word), when scoring it against many words
+    """
+    if word == query_word or (partial and word.startswith(query_word)):
+        return 1.0
+    distance, prefix_distance = edit_distances(query_word, word, masks)
+    return max(0.0, 1 - (prefix_distance if partial else distance) / len(query_word))
+
+
+class NameIndex:
+    def __init__(self):
+        # Students sharing a spelling share one entry (key), so common names are scored once
+        self._key_words = {}  # normalized name -> its distinct words
+        self._rolls = defaultdict(set)  # normalized name -> roll numbers
+        self._word_keys = {}  # word -> {len(key): normalized names containing it}, for shortest-first
+        self._word_sizes = {}  # word -> number of normalized names containing it
+        self._word_grams = {}  # word -> frozenset of its trigrams
+        self._gram_words = defaultdict(set)  # trigram -> words containing it
+        self._deleted = defaultdict(set)  # word or word with one letter left out -> words
+        self._vocabulary = []  # sorted words, for prefix lookups
+        self._matches = {}  # (query word, partial) -> _matching_words(), until the vocabulary changes
+        self._length_keys = defaultdict(set)  # len(key) -> normalized names of that length
+        self._keys = {}  # roll number -> normalized name
+        self._names = {}  # roll number -> name as stored
+        self._lock = threading.Lock()
+        self.db = None
+        self.feed = None
+
+    @classmethod
+    def build(cls, db):
+        """Index every student in db and follow its change feed from now on."""
+        index = cls()
+        # Read the feed position first so saves made during the build are replayed by refresh()
+        version = db.get_data_version()
+        for roll_no, name in db.get_student_names():
+            index.add(roll_no, name)
+        index.db = db
+        index.feed = ChangeFeed.from_version(db, version)
+        return index
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, roll_no, name):
+        """Index a new student or re-index a renamed one."""
+        key = normalize(name or "")
+        with self._lock:
+            self._unlink(roll_no)
+            self._names[roll_no] = name
+            self._keys[roll_no] = key
+            if key not in self._key_words:
+                words = self._key_words[key] = frozenset(key.split())
+                self._length_keys[len(key)].add(key)
+                for word in words:
+                    if word not in self._word_keys:
+                        self._add_word(word)
+                    self._word_keys[word].setdefault(len(key), set()).add(key)
+                    self._word_sizes[word] += 1
+            self._rolls[key].add(roll_no)
+
+    def remove(self, roll_no):
+        with self._lock:
+            self._unlink(roll_no)
+
+    def _add_word(self, word):
+        self._matches.clear()
+        self._word_keys[word] = {}
+        self._word_sizes[word] = 0
+        grams = self._word_grams[word] = frozenset(word_trigrams(word))
+        for gram in grams:
+            self._gram_words[gram].add(word)
+        for variant in deletions(word) | {word}:
+            self._deleted[variant].add(word)
+        bisect.insort(self._vocabulary, word)
+
+    def _remove_word(self, word):
+        self._matches.clear()
+        del self._word_keys[word], self._word_sizes[word]
+        for gram in self._word_grams.pop(word):
+            self._gram_words[gram].discard(word)
+            if not self._gram_words[gram]:
+                del self._gram_words[gram]
+        for variant in deletions(word) | {word}:
+            self._deleted[variant].discard(word)
+            if not self._deleted[variant]:
+                del self._deleted[variant]
+        del self._vocabulary[bisect.bisect_left(self._vocabulary, word)]
+
+    def _unlink(self, roll_no):
+        self._names.pop(roll_no, None)
+        key = self._keys.pop(roll_no, None)
+        if key is None:
+            return
+        rolls = self._rolls[key]
+        rolls.discard(roll_no)
+        if rolls:
+            return
+        del self._rolls[key]
+        self._length_keys[len(key)].discard(key)
+        if not self._length_keys[len(key)]:
+            del self._length_keys[len(key)]
+        for word in self._key_words.pop(key):
+            bucket = self._word_keys[word][len(key)]
+            bucket.discard(key)
+            if not bucket:
+                del self._word_keys[word][len(key)]
+            self._word_sizes[word] -= 1
+            if not self._word_sizes[word]:
+                self._remove_word(word)
+
+    def refresh(self):
+        """
+        Apply other users' saves and deletes from the change feed.
+
+        Returns:
+            Number of students re-indexed or removed
+        """
+        if self.feed is None:
+            return 0
+        changes = self.feed.poll()
+        if 'RELOAD' in changes.values():
+            fresh = NameIndex.build(self.db)
+            with self._lock:
+                self.__dict__.update({key: value for key, value in fresh.__dict__.items() if key != '_lock'})
+            return len(self._names)
+        upserts = [roll_no for roll_no, op in changes.items() if op != 'DELETE']
+        names = dict(self.db.get_student_names(roll_nos=upserts)) if upserts else {}
+        for roll_no in changes:
+            if roll_no in names:
+                self.add(roll_no, names[roll_no])
+            else:
+                self.remove(roll_no)
+        return len(changes)
+
+    def search(self, query, limit=20, min_score=DEFAULT_MIN_SCORE):
+        """
+        Ranked fuzzy matches for a (possibly half-typed, misspelt) name.
+
+        Args:
+            query: Text typed by the user
+            limit: Most results returned
+            min_score: Minimum mean (0-1) over the query words of their best word match in a name
+
+        Returns:
+            List of (roll_no, name, score), best first
+        """
+        query_words = normalize(query).split()
+        if not query_words or limit <= 0:
+            return []
+        cap = max(limit * CANDIDATES_PER_RESULT, MIN_CANDIDATES)
+        with self._lock:
+            matches = [self._matching_words(word, partial=i == len(query_words) - 1)
+                       for i, word in enumerate(query_words)]
+            candidates = set()
+            if len(matches) > 1:
+                # Names matching every query word exactly (or as a prefix) outrank all others
+                perfect = self._names_with_all([{word for word, score in scores.items() if score == 1.0} for scores in matches])
+                if sum(len(self._rolls[key]) for key in perfect) >= limit:
+                    candidates = perfect
+                else:
+                    candidates = perfect | self._names_with_all(matches)
+                if len(candidates) > cap:
+                    # The perfect matches first, then the shortest names
+                    candidates = set(sorted(candidates, key=lambda key: (key not in perfect, len(key)))[:cap])
+            # Too few names match every word: take the best ones matching any, most selective word first
+            for scores in sorted(matches, key=self._size):
+                if sum(len(self._rolls[key]) for key in candidates) >= limit or len(candidates) >= cap:
+                    break
+                self._gather(scores, candidates, cap)
+
+            ranked = []
+            lookups = [scores.get for scores in matches]
+            for key in candidates:
+                words = self._key_words[key]
+                score = sum(max(map(lookup, words, repeat(0.0))) for lookup in lookups) / len(matches)
+                if score >= min_score:
+                    ranked.append((-score, len(key), key))
+            ranked.sort()
+            results = []
+            for negated, _, key in ranked:
+                results += [(roll_no, self._names[roll_no], round(-negated, 3))
+                            for roll_no in sorted(self._rolls[key])[:limit - len(results)]]
+                if len(results) >= limit:
+                    break
+            return results
+
+    def _matching_words(self, query_word, partial):
+        """Vocabulary words matching one query word, {word: score} with scores >= MIN_WORD_SCORE."""
+        # While a name is typed, every search repeats the words before the last one
+        scores = self._matches.get((query_word, partial))
+        if scores is None:
+            if len(self._matches) >= MATCH_CACHE_SIZE:
+                self._matches.clear()
+            scores = self._matches[query_word, partial] = self._score_words(query_word, partial)
+        return scores
+
+    def _score_words(self, query_word, partial):
+        scores = {}
+        if query_word in self._word_keys:
+            scores[query_word] = 1.0
+        if partial:
+            # Every word from query_word up to the next string of its length ("kulk" to "kull")
+            following = query_word[:-1] + chr(ord(query_word[-1]) + 1)
+            start = bisect.bisect_left(self._vocabulary, query_word)
+            scores.update(dict.fromkeys(self._vocabulary[start:bisect.bisect_left(self._vocabulary, following, start)], 1.0))
+        if len(query_word) < 3:
+            return scores  # too short to tell a typo from another name
+
+        # One or two edits away: the query word and a vocabulary word share a one-letter deletion
+        masks = letter_masks(query_word)
+        close = set().union(*(self._deleted.get(variant, ()) for variant in deletions(query_word) | {query_word}))
+        for word in close:
+            if word not in scores:
+                distance = close_distance(query_word, word)
+                # A prefix is no closer than the whole word unless the whole word is two edits away
+                score = (word_score(query_word, word, partial, masks) if partial and distance == 2
+                         else 1 - distance / len(query_word))
+                if score >= MIN_WORD_SCORE:
+                    scores[word] = score
+        # Further away: the words sharing the most of its rarer trigrams. The commonest ("sha", "ar ")
+        # are left out; they bring in thousands of words and tell little about which are close
+        postings = sorted((self._gram_words.get(gram, ()) for gram in word_trigrams(query_word, partial)), key=len)
+        shared = Counter(chain.from_iterable(postings[:max(3, len(postings) - COMMON_TRIGRAMS)]))
+        for word, _ in shared.most_common(FUZZY_WORDS):
+            if word not in scores and word not in close:
+                score = word_score(query_word, word, partial, masks)
+                if score >= MIN_WORD_SCORE:
+                    scores[word] = score
+        return scores
+
+    def _size(self, words):
+        """Number of normalized names containing any of words (counting a name once per word it has)."""
+        return sum(map(self._word_sizes.__getitem__, words))
+
+    def _names_with_any(self, words):
+        """Normalized names containing any of words."""
+        return set().union(*(bucket for word in words for bucket in self._word_keys[word].values()))
+
+    def _names_with_all(self, word_sets):
+        """Normalized names containing one of the words of each set in word_sets."""
+        if not all(word_sets):
+            return set()
+        word_sets = sorted(word_sets, key=self._size)
+        names = self._names_with_any(word_sets[0])
+        for words in word_sets[1:]:
+            if not names:
+                break
+            if self._size(words) > 4 * len(names):
+                # Cheaper to check the few names left than to collect every name with these words
+                names = {key for key in names if not self._key_words[key].isdisjoint(words)}
+            else:
+                names &= self._names_with_any(words)
+        return names
+
+    def _gather(self, scores, into, cap):
+        """Add names containing the words in scores to into: best words first, shortest names first, up to cap."""
+        by_score = defaultdict(set)
+        for word, score in scores.items():
+            by_score[score].add(word)
+        for score in sorted(by_score, reverse=True):
+            words = by_score[score]
+            size = self._size(words)
+            if len(into) + size <= cap:
+                into |= self._names_with_any(words)
+                continue
+            # Either walk these words' names by length, or every name by length keeping those with
+            # one of these words, whichever touches fewer entries
+            entries = sum(map(len, map(self._word_keys.__getitem__, words)))
+            if entries < (cap - len(into)) * len(self._key_words) / size:
+                buckets = sorted(((length, bucket) for word in words for length, bucket in self._word_keys[word].items()),
+                                 key=lambda item: item[0])
+                for _, bucket in buckets:
+                    into |= bucket
+                    if len(into) >= cap:
+                        return
+            else:
+                for length in sorted(self._length_keys):
+                    for key in self._length_keys[length]:
+                        if key not in into and not self._key_words[key].isdisjoint(words):
+                            into.add(key)
+                            if len(into) >= cap:
+                                return
+
+
+def main():
+    from database_helper import DatabaseHelper
+
+    if len(sys.argv) < 2:
+        print("Usage: python name_index.py <name> [limit]")
+        return
+    started = time.perf_counter()
+    index = NameIndex.build(DatabaseHelper())
+    print(f"Indexed {len(index)} names in {time.perf_counter() - started:.2f}s")
+    started = time.perf_counter()
+    matches = index.search(sys.argv[1], limit=int(sys.argv[2]) if len(sys.argv) > 2 else 20)
+    print(f"{len(matches)} matches in {(time.perf_counter() - started) * 1000:.3f} ms")
+    for roll_no, name, score in matches:
+        print(f"{roll_no:>8}  {score:.2f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
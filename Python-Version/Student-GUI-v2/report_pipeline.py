@@ -0,0 +1,168 @@
+"""
+Parallel term-end report generation.
+
+Writes one workbook per class with an Overview sheet (class vs school subject
+averages with a bar chart), a Students sheet (marks, totals, class and school
+rank) and one sheet per subject (ranked marks and a grade-band chart).
+
+School-wide aggregates (subject averages, school ranks) are computed once in the
+parent process and handed to each worker process when it starts, so they are not
+recomputed or re-sent per workbook. Every worker streams its class from
+DatabaseHelper.iter_records over its own connection pool and renders with
+openpyxl in write-only mode.
+
+Usage:
+    python report_pipeline.py --out reports [--workers 4] [--tenant SCHOOL]
+"""
+
+import os
+import re
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from openpyxl import Workbook
+from openpyxl.chart import BarChart, Reference
+from database_helper import DatabaseHelper, SUBJ_MAP
+from analytics import get_analytics, GRADE_BANDS, grade_for
+from dashboard_snapshot import compute_dashboard
+
+UNASSIGNED_CLASS = "Unassigned"
+
+# Per-process state set by _init_worker
+_worker = {}
+
+
+def _init_worker(tenant, term_key, shared):
+    _worker['db'] = DatabaseHelper(tenant=tenant)
+    _worker['term_key'] = term_key
+    _worker['shared'] = shared
+
+
+def workbook_path(output_dir, class_name, term_key):
+    term_id, academic_year = term_key
+    safe = re.sub(r"[^A-Za-z0-9]+", "_", class_name or UNASSIGNED_CLASS).strip("_")
+    return os.path.join(output_dir, f"report_{safe}_{academic_year}_term{term_id}.xlsx")
+
+
+def render_class_workbook(class_name, output_dir):
+    """Worker task: stream one class and write its workbook. Returns (class_name, path, students)."""
+    db, term_key, shared = _worker['db'], _worker['term_key'], _worker['shared']
+    records = list(db.iter_records(page_size=1000, filters={'class_name': class_name}, term=term_key))
+
+    rows = []
+    for record in records:
+        marks = [record[sub] for sub in SUBJ_MAP if record[sub] is not None]
+        total = sum(marks)
+        average = round(total / len(marks), 2) if marks else None
+        rows.append((record, total, average))
+    # Class rank by average; students without marks go last and are unranked
+    ranked = sorted((r for r in rows if r[2] is not None), key=lambda r: -r[2])
+    class_rank, previous = {}, None
+    for position, (record, _, average) in enumerate(ranked, 1):
+        if average != previous:
+            rank, previous = position, average
+        class_rank[record['ROLL_NO']] = rank
+
+    wb = Workbook(write_only=True)
+
+    # Overview: class vs school average per subject
+    overview = wb.create_sheet("Overview")
+    overview.append([f"Class {class_name or UNASSIGNED_CLASS}", f"Term {term_key[0]} / {term_key[1]}"])
+    overview.append(["Students", len(records)])
+    overview.append([])
+    overview.append(["Subject", "Class Average", "School Average"])
+    for sub in SUBJ_MAP:
+        values = [record[sub] for record in records if record[sub] is not None]
+        class_avg = round(sum(values) / len(values), 2) if values else None
+        overview.append([sub, class_avg, shared['subject_avgs'].get(sub)])
+    chart = BarChart()
+    chart.title = "Class vs School Average"
+    chart.y_axis.scaling.min = 0
+    chart.y_axis.scaling.max = 100
+    first_row, last_row = 4, 4 + len(SUBJ_MAP)
+    chart.add_data(Reference(overview, min_col=2, max_col=3, min_row=first_row, max_row=last_row), titles_from_data=True)
+    chart.set_categories(Reference(overview, min_col=1, min_row=first_row + 1, max_row=last_row))
+    overview.add_chart(chart, "E2")
+
+    # Students: full roster with ranks
+    students = wb.create_sheet("Students")
+    students.append(["Roll No", "Name"] + list(SUBJ_MAP) + ["Total", "Average", "Grade", "Class Rank", "School Rank"])
+    for record, total, average in rows:
+        school = shared['school_ranks'].get(record['ROLL_NO'])
+        students.append([record['ROLL_NO'], record['NAME']] + [record[sub] for sub in SUBJ_MAP]
+                        + [total, average, grade_for(average), class_rank.get(record['ROLL_NO']), school])
+
+    # One sheet per subject: ranked marks, then grade-band counts with a chart
+    for sub in SUBJ_MAP:
+        sheet = wb.create_sheet(sub)
+        sheet.append(["Rank", "Roll No", "Name", "Marks", "Grade"])
+        marked = sorted(((r[sub], r) for r in records if r[sub] is not None), key=lambda x: (-x[0], x[1]['ROLL_NO']))
+        rank, previous = 0, None
+        for position, (marks, record) in enumerate(marked, 1):
+            if marks != previous:
+                rank, previous = position, marks
+            sheet.append([rank, record['ROLL_NO'], record['NAME'], marks, grade_for(marks)])
+        sheet.append([])
+        bands_row = len(marked) + 3
+        sheet.append(["Grade", "Students"])
+        for _, grade in GRADE_BANDS:
+            sheet.append([grade, sum(1 for marks, _ in marked if grade_for(marks) == grade)])
+        chart = BarChart()
+        chart.title = f"{sub} Grade Distribution"
+        chart.legend = None
+        chart.add_data(Reference(sheet, min_col=2, min_row=bands_row, max_row=bands_row + len(GRADE_BANDS)), titles_from_data=True)
+        chart.set_categories(Reference(sheet, min_col=1, min_row=bands_row + 1, max_row=bands_row + len(GRADE_BANDS)))
+        sheet.add_chart(chart, "G2")
+
+    path = workbook_path(output_dir, class_name, term_key)
+    wb.save(path)
+    return class_name, path, len(records)
+
+
+def generate_school_reports(output_dir, tenant=None, term=None, workers=None):
+    """
+    Render every class's workbook in a process pool.
+
+    Returns:
+        List of (class_name, path, student_count) for the workbooks written
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    db = DatabaseHelper(tenant=tenant)
+    term_key = db.term_key(term)
+
+    # Shared aggregates: computed once here, shipped once per worker process
+    dashboard = compute_dashboard(db, term_key)
+    ranks = get_analytics(db, term_key).student_ranks()
+    shared = {
+        'subject_avgs': dashboard['SUBJECT_AVGS'],
+        'school_ranks': {row['ROLL_NO']: row['CLASS_RANK'] for row in ranks},
+    }
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(tenant, term_key, shared)) as pool:
+        futures = {pool.submit(render_class_workbook, class_name, output_dir): class_name
+                   for class_name in db.list_classes()}
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"Report for class {futures[future] or UNASSIGNED_CLASS} failed: {e}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate per-class term-end Excel reports")
+    parser.add_argument('--out', default="reports", help="output directory")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--tenant', default=os.getenv('TENANT_ID') or None, help="school to report on (multi-school deployments)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    results = generate_school_reports(args.out, tenant=args.tenant, workers=args.workers)
+    print(f"Wrote {len(results)} workbooks ({sum(r[2] for r in results)} students) "
+          f"to {args.out} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Retry, backoff and circuit breaking for database calls.
+
+RetryPolicy retries transient failures (lost connections, deadlocks, lock wait
+timeouts) with capped exponential backoff and full jitter, so many desktops that
+lose the database at the same moment do not come back in lockstep.
+
+CircuitBreaker counts consecutive transient failures per database, except
+deadlocks and lock wait timeouts: those are row contention on a healthy server
+and are only retried. After failure_threshold of them it opens and every call
+fails at once with CircuitOpenError instead of waiting out connect_timeout
+again. After reset_timeout seconds one probe call is let through: success
+closes the circuit, failure keeps it open for another reset_timeout.
+
+Only transient errors trip the breaker or are retried; bad SQL, constraint
+violations and validation errors surface immediately.
+"""
+
+import time
+import random
+import socket
+import threading
+import pymysql
+
+# MySQL/client error codes worth another attempt
+TRANSIENT_ERROR_CODES = {
+    1040,  # too many connections
+    1205,  # lock wait timeout exceeded
+    1213,  # deadlock found, transaction rolled back
+    2003,  # can't connect to server
+    2006,  # server has gone away
+    2013,  # lost connection during query
+    2055,  # lost connection (system error)
+}
+# Codes where the server may still have applied the statement, so only idempotent work is retried
+CONNECTION_ERROR_CODES = {2006, 2013, 2055}
+# Row contention on a healthy server: retried, but not counted towards opening the circuit
+CONTENTION_ERROR_CODES = {1205, 1213}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of contacting a database whose circuit is open."""
+
+    def __init__(self, retry_in):
+        super().__init__(f"Database unavailable, not retrying for another {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+def is_transient(exc):
+    """True for errors that may succeed on a later attempt."""
+    if isinstance(exc, CircuitOpenError):
+        return True
+    if isinstance(exc, (pymysql.err.OperationalError, pymysql.err.InternalError)):
+        return bool(exc.args) and exc.args[0] in TRANSIENT_ERROR_CODES
+    if isinstance(exc, pymysql.err.InterfaceError):
+        return True  # connection already closed
+    return isinstance(exc, (ConnectionError, socket.timeout, TimeoutError))
+
+
+def is_contention(exc):
+    """True for deadlocks and lock wait timeouts."""
+    return (isinstance(exc, (pymysql.err.OperationalError, pymysql.err.InternalError))
+            and bool(exc.args) and exc.args[0] in CONTENTION_ERROR_CODES)
+
+
+class RetryPolicy:
+    def __init__(self, attempts=3, base_delay=0.2, max_delay=2.0):
+        """
+        Args:
+            attempts: Total tries per call, including the first
+            base_delay: Backoff before the first retry, doubled for each later one
+            max_delay: Upper bound of any single backoff
+        """
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, retry_number):
+        """Full-jitter backoff: uniform between 0 and the capped exponential delay."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry_number))
+
+
+class ResilienceMetrics:
+    """Counters for one database, safe to read and update from any thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.short_circuits = 0
+        self.circuit_opens = 0
+        self.open_seconds = 0.0
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'retries': self.retries,
+                'failures': self.failures,
+                'short_circuits': self.short_circuits,
+                'circuit_opens': self.circuit_opens,
+                'open_seconds': round(self.open_seconds, 1),
+            }
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, metrics=None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.metrics = metrics or ResilienceMetrics()
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go ahead now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            waited = time.monotonic() - self._opened_at
+            if self.state == self.OPEN and waited >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            retry_in = max(0, self.reset_timeout - waited)
+        self.metrics.add(short_circuits=1)
+        raise CircuitOpenError(retry_in)
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                self.metrics.add(open_seconds=time.monotonic() - self._opened_at)
+            self.state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN:
+                # Failed probe: stay open, counting the time spent open so far
+                now = time.monotonic()
+                self.metrics.add(open_seconds=now - self._opened_at)
+                self.state, self._opened_at = self.OPEN, now
+            elif self.state == self.CLOSED and self._failures >= self.failure_threshold:
+                self.state, self._opened_at = self.OPEN, time.monotonic()
+                self.metrics.add(circuit_opens=1)
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        """End a probe call that neither succeeded nor failed transiently (e.g. bad SQL)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+
+def call_with_retry(fn, policy, breaker, idempotent=True, on_transient=None):
+    """
+    Call fn() through the breaker, retrying transient failures with backoff.
+
+    Args:
+        fn: Zero-argument callable doing one complete attempt
+        policy: RetryPolicy
+        breaker: CircuitBreaker for the database fn talks to
+        idempotent: False retries only failures where the server cannot have applied
+                    anything (e.g. connect refused); a lost connection mid-statement is raised
+        on_transient: Optional callback(exc) after each transient failure other than
+                      contention, e.g. to drop pooled connections that are probably dead too
+    """
+    metrics = breaker.metrics
+    metrics.add(calls=1)
+    for attempt in range(policy.attempts):
+        breaker.before_call()
+        try:
+            result = fn()
+        except Exception as e:
+            if not is_transient(e):
+                breaker.release_probe()
+                raise
+            if is_contention(e):
+                # The server answered, so neither the breaker nor the pooled connections are at fault
+                breaker.release_probe()
+            else:
+                breaker.record_failure()
+                if on_transient:
+                    on_transient(e)
+            code = e.args[0] if e.args else None
+            unsafe = not idempotent and (code in CONNECTION_ERROR_CODES or isinstance(e, pymysql.err.InterfaceError))
+            if unsafe or attempt == policy.attempts - 1:
+                metrics.add(failures=1)
+                raise
+            metrics.add(retries=1)
+            time.sleep(policy.delay(attempt))
+        else:
+            breaker.record_success()
+            return result
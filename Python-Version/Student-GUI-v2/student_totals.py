@@ -0,0 +1,17 @@
+"""
+SQL that keeps STUDENT_TOTALS in step with MARKS.
+
+Kept apart from database_helper so the v1 app's save queue can share it without
+pulling in the v2 stack.
+"""
+
+# Recompute STUDENT_TOTALS for one term (params: academic year, term id) of the students
+# selected by {roll_nos}, a placeholder list or subquery. Marks are never cleared, only
+# overwritten, so a student with marks keeps a row and an upsert is all it takes.
+TOTALS_UPSERT = """
+    INSERT INTO STUDENT_TOTALS (ROLL_NO, TERM_ID, ACADEMIC_YEAR, TOTAL, AVERAGE)
+    SELECT ROLL_NO, TERM_ID, ACADEMIC_YEAR, SUM(MARKS), ROUND(AVG(MARKS), 2) FROM MARKS
+    WHERE ACADEMIC_YEAR = %s AND TERM_ID = %s AND MARKS IS NOT NULL AND ROLL_NO IN ({roll_nos})
+    GROUP BY ROLL_NO, TERM_ID, ACADEMIC_YEAR
+    ON DUPLICATE KEY UPDATE TOTAL = VALUES(TOTAL), AVERAGE = VALUES(AVERAGE)
+"""
@@ -0,0 +1,116 @@
+"""
+Tests for ChangeFeed's handling of sequences that commit out of order. They run
+against a fake change log, with the clock patched:
+
+    python -m unittest test_change_feed
+"""
+
+import unittest
+from unittest import mock
+from database_helper import ChangeFeed
+
+
+class FakeLog:
+    """get_changes over MARKS_CHANGES rows that have committed, keyed by SEQ."""
+
+    def __init__(self):
+        self.rows = {}
+
+    def commit(self, seq, roll_no, op='UPSERT'):
+        self.rows[seq] = (roll_no, op)
+
+    def get_changes(self, since_seq, limit=1000):
+        return [{'SEQ': seq, 'ROLL_NO': roll_no, 'OP': op}
+                for seq, (roll_no, op) in sorted(self.rows.items()) if seq > since_seq][:limit]
+
+
+class ChangeFeedTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('database_helper.time.monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.log = FakeLog()
+        self.feed = ChangeFeed(self.log, gap_timeout=30, batch_size=5)
+
+    def test_contiguous_changes_advance(self):
+        self.log.commit(1, 10)
+        self.log.commit(2, 11, 'DELETE')
+        self.assertEqual(self.feed.poll(), {10: 'UPSERT', 11: 'DELETE'})
+        self.assertEqual(self.feed.last_seq, 2)
+        self.assertEqual(self.feed.poll(), {})
+
+    def test_hole_that_fills_later(self):
+        self.log.commit(1, 10)
+        self.log.commit(3, 12)
+        self.assertEqual(self.feed.poll(), {10: 'UPSERT', 12: 'UPSERT'})
+        self.assertEqual(self.feed.last_seq, 1)
+
+        self.now += 10
+        self.assertEqual(self.feed.poll(), {})  # 3 is not returned twice
+        self.log.commit(2, 11)
+        self.assertEqual(self.feed.poll(), {11: 'UPSERT'})
+        self.assertEqual(self.feed.last_seq, 3)
+
+    def test_hole_that_times_out(self):
+        self.log.commit(1, 10)
+        self.log.commit(3, 12)
+        self.feed.poll()
+        self.now += 29
+        self.feed.poll()
+        self.assertEqual(self.feed.last_seq, 1)
+
+        self.now += 1
+        self.log.commit(4, 13)
+        self.assertEqual(self.feed.poll(), {13: 'UPSERT'})
+        self.assertEqual(self.feed.last_seq, 4)
+        self.log.commit(2, 11)  # too late: rolled-back inserts never commit
+        self.assertEqual(self.feed.poll(), {})
+
+    def test_more_than_batch_size_rows_past_a_hole(self):
+        self.log.commit(1, 10)
+        for seq in range(3, 15):
+            self.log.commit(seq, seq + 100)
+        self.assertEqual(set(self.feed.poll()), {10} | {seq + 100 for seq in range(3, 15)})
+
+        self.log.commit(15, 200)  # not stuck behind the pages already returned
+        self.assertEqual(self.feed.poll(), {200: 'UPSERT'})
+        self.log.commit(2, 11)
+        self.assertEqual(self.feed.poll(), {11: 'UPSERT'})
+        self.assertEqual(self.feed.last_seq, 15)
+
+    def test_reload(self):
+        self.log.commit(1, 10)
+        self.log.commit(2, 0, 'RELOAD')
+        self.assertIn('RELOAD', self.feed.poll().values())
+
+
+class FromVersionTest(unittest.TestCase):
+    def setUp(self):
+        self.log = FakeLog()
+        for seq in (1, 2, 4, 5):
+            self.log.commit(seq, seq + 10)
+
+    def test_starts_at_an_uncommitted_sequence_below_the_version(self):
+        feed = ChangeFeed.from_version(self.log, 5)
+        self.assertEqual(feed.last_seq, 2)
+        self.log.commit(3, 13)
+        self.log.commit(6, 16)
+        self.assertEqual(feed.poll(), {13: 'UPSERT', 16: 'UPSERT'})
+        self.assertEqual(feed.last_seq, 6)
+
+    def test_without_holes_starts_at_the_version(self):
+        self.log.commit(3, 13)
+        feed = ChangeFeed.from_version(self.log, 5)
+        self.assertEqual(feed.last_seq, 5)
+        self.assertEqual(feed.poll(), {})
+
+    def test_rows_after_the_version_are_still_returned(self):
+        self.log.commit(3, 13)
+        self.log.commit(6, 16)  # committed between reading the version and the tail
+        feed = ChangeFeed.from_version(self.log, 5)
+        self.assertEqual(feed.poll(), {16: 'UPSERT'})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+"""
+Tests for the chart cache's disk eviction. Rendering is stubbed out, so no chart
+is drawn:
+
+    python -m unittest test_chart_cache
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from chart_cache import ChartCache
+
+
+class DiskEvictionTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        patcher = mock.patch('chart_cache.render_png', lambda png: png)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # One image in memory, so the others are read back from disk
+        self.cache = ChartCache(self.cache_dir, max_entries=1, max_disk_entries=2)
+
+    def get(self, data):
+        return self.cache.get_png('test', data, lambda data: data.encode())
+
+    def set_last_use(self, data, when):
+        path = os.path.join(self.cache_dir, f"{ChartCache.key_for('test', data)}.png")
+        os.utime(path, (when, when))
+
+    def cached(self):
+        names = set(os.listdir(self.cache_dir))
+        return {data for data in "abcd" if f"{ChartCache.key_for('test', data)}.png" in names}
+
+    def test_keeps_at_most_max_disk_entries(self):
+        for data in "abcd":
+            self.get(data)
+        self.assertEqual(len(self.cached()), 2)
+
+    def test_evicts_the_least_recently_used(self):
+        self.get("a")
+        self.get("b")
+        self.set_last_use("a", 1000)
+        self.set_last_use("b", 2000)
+        self.assertEqual(self.get("a"), b"a")  # from disk: "a" is now the most recently used
+        self.assertEqual(self.cache.disk_hits, 1)
+        self.get("c")
+        self.assertEqual(self.cached(), {"a", "c"})
+
+    def test_memory_only_cache_writes_nothing(self):
+        cache = ChartCache(None)
+        self.assertEqual(cache.get_png('test', "a", lambda data: data.encode()), b"a")
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+Tests for columnar_export's Parquet layouts. They run offline against a fake helper:
+
+    python -m unittest test_columnar_export
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from database_helper import StudentRecord, SUBJ_MAP
+from columnar_export import export_parquet, TERM_PARTITIONING
+
+TERMS = [(1, 2025), (2, 2025), (1, 2026)]
+
+
+class FakeHelper:
+    """Three students per term, with marks that tell the terms apart."""
+
+    def term_key(self, term=None):
+        return term if term is not None else TERMS[-1]
+
+    def iter_records(self, page_size=500, term=None, **kwargs):
+        term_id, academic_year = term
+        for roll_no in (1, 2, 3):
+            marks = [None if (roll_no + i) % 4 == 0 else (academic_year - 2000 + term_id + roll_no + i) % 101
+                     for i in range(len(SUBJ_MAP))]
+            yield StudentRecord(roll_no, f"Student {roll_no}", *marks)
+
+
+class TermPartitionTest(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+
+    def expected(self):
+        db = FakeHelper()
+        return sorted((academic_year, term_id, *record)
+                      for term_id, academic_year in TERMS
+                      for record in db.iter_records(term=(term_id, academic_year)))
+
+    def test_partitioned_dataset_reads_back(self):
+        rows, files = export_parquet(FakeHelper(), self.path, partition_by='term', terms=TERMS, batch_size=2)
+        self.assertEqual(rows, 9)
+        self.assertEqual(len(files), 3)
+
+        table = ds.dataset(self.path, format='parquet', partitioning=TERM_PARTITIONING).to_table()
+        self.assertEqual(table.schema.field('TERM_ID').type, pa.int16())
+        got = sorted(zip(*(table.column(name).to_pylist() for name in ['ACADEMIC_YEAR', 'TERM_ID', 'ROLL_NO', 'NAME'] + list(SUBJ_MAP))))
+        self.assertEqual(got, self.expected())
+
+        frame = pd.read_parquet(self.path)
+        self.assertEqual(len(frame), 9)
+        self.assertEqual(sorted(frame['TERM_ID'].astype(int).unique()), [1, 2])
+
+    def test_each_file_leaves_out_the_partition_columns(self):
+        _, files = export_parquet(FakeHelper(), self.path, partition_by='term', terms=TERMS)
+        for file_path in files:
+            names = pq.read_schema(file_path).names
+            self.assertNotIn('TERM_ID', names)
+            self.assertNotIn('ACADEMIC_YEAR', names)
+
+    def test_no_terms_exports_nothing(self):
+        rows, files = export_parquet(FakeHelper(), os.path.join(self.path, "none"), partition_by='term', terms=[])
+        self.assertEqual((rows, files), (0, []))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,214 @@
+"""
+Tests for DatabaseHelper's bulk load, import digests, replica floor and WAN
+transfer encodings.
+
+The encoding tests run offline. The round trips through a real server run only
+when TEST_DB=1, against the DB_* database (they write students with roll numbers
+from 999900 up and delete them again):
+
+    python -m unittest test_database_helper
+    TEST_DB=1 python -m unittest test_database_helper
+"""
+
+import os
+import re
+import zlib
+import struct
+import hashlib
+import unittest
+from unittest import mock
+from database_helper import DatabaseHelper, SUBJ_MAP
+from resilience import CircuitBreaker
+
+# Whitespace that validate_name lets through and a naive TSV would split on
+AWKWARD_NAMES = ["Tab\tName", "New\nLine", "Carriage\rReturn", "Plain Name"]
+FIRST_TEST_ROLL = 999900
+
+
+def load_data_fields(line):
+    """Split one TSV line the way LOAD DATA does with FIELDS TERMINATED BY '\\t' and the default ESCAPED BY '\\\\'."""
+    escapes = {'t': '\t', 'n': '\n', 'r': '\r', '\\': '\\'}
+    fields = []
+    for raw in line.split("\t"):
+        if raw == r"\N":
+            fields.append(None)
+        else:
+            fields.append(re.sub(r"\\(.)", lambda m: escapes.get(m.group(1), m.group(1)), raw))
+    return fields
+
+
+class WriteTsvTest(unittest.TestCase):
+    def test_names_with_tabs_and_newlines_keep_their_columns(self):
+        rows = [(FIRST_TEST_ROLL + i, name, None) for i, name in enumerate(AWKWARD_NAMES + ["Back\\slash"])]
+        path = DatabaseHelper._write_tsv(rows)
+        try:
+            with open(path, encoding='utf-8', newline='') as f:
+                lines = f.read().split("\n")
+        finally:
+            os.remove(path)
+        self.assertEqual(lines.pop(), "")
+        self.assertEqual([tuple(load_data_fields(line)) for line in lines],
+                         [(str(roll_no), name, None) for roll_no, name, _ in rows])
+
+
+class PackedCursor:
+    """Stands in for the server's answer to _fetch_packed_page: HEX(), CONCAT_WS, GROUP_CONCAT and COMPRESS() of rows."""
+
+    def __init__(self, rows, columns):
+        self.rows = rows
+        self.columns = columns
+
+    def execute(self, sql, params=None):
+        self.sql = sql
+
+    @staticmethod
+    def pack(column, value):
+        if column == 'NAME':
+            return "-" if value is None else value.encode('utf-8').hex().upper()
+        return "" if value is None else str(value)
+
+    def fetchone(self):
+        lines = ["\t".join(self.pack(column, value) for column, value in zip(self.columns, row)) for row in self.rows]
+        text = "\n".join(lines).encode('utf-8')
+        return (struct.pack('<I', len(text)) + zlib.compress(text),)
+
+
+class PackedPageTest(unittest.TestCase):
+    def test_names_with_tabs_and_newlines_unpack_to_the_same_rows(self):
+        columns = ('ROLL_NO', 'NAME') + tuple(SUBJ_MAP)
+        rows = [(FIRST_TEST_ROLL + i, name) + tuple(None if j % 2 else 40 + j for j in range(len(SUBJ_MAP)))
+                for i, name in enumerate(AWKWARD_NAMES)]
+        cursor = PackedCursor(rows, columns)
+        self.assertEqual(DatabaseHelper._fetch_packed_page(cursor, "SELECT 1", [], columns), rows)
+        self.assertIn("HEX(NAME)", cursor.sql)
+
+    def test_null_and_empty_names_stay_apart(self):
+        columns = ('ROLL_NO', 'NAME', 'Maths')
+        rows = [(1, None, 50), (2, "", None), (3, "Priya", 70)]
+        self.assertEqual(DatabaseHelper._fetch_packed_page(PackedCursor(rows, columns), "SELECT 1", [], columns), rows)
+
+
+class ImportDigestTest(unittest.TestCase):
+    def test_digests_the_text_record_digests_builds(self):
+        # CONCAT_WS('\t', name, marks in SUBJ_ID order), with '' for a missing mark, hashed as UTF-8
+        expected = hashlib.md5("Zoë Ñandú\t55\t\t0".encode('utf-8')).hexdigest()
+        self.assertEqual(DatabaseHelper.import_digest("Zoë Ñandú", {105: 0, 103: 55, 104: ''}), expected)
+
+
+class FakePool:
+    """ConnectionPool whose connections answer every query with the same rows."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.breaker = CircuitBreaker()
+
+    def connect(self):
+        return self
+
+    def clear(self):
+        pass
+
+    # The pooled connection and its cursor
+    def cursor(self, *args):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        return len(self.rows)
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class ReplicaFloorTest(unittest.TestCase):
+    """Only writes hold later reads back until a replica has caught up."""
+
+    def setUp(self):
+        term = {'TERM_ID': 1, 'ACADEMIC_YEAR': 2026, 'TERM_NAME': "Term 1", 'EXAM': "Final", 'IS_ACTIVE': 1}
+        patcher = mock.patch('database_helper.get_pool', return_value=FakePool([term]))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.db = DatabaseHelper()
+        self.db._raise_min_seq = mock.Mock()
+
+    def test_reads_on_the_primary_leave_it_alone(self):
+        self.assertEqual(self.db.get_active_term()['TERM_ID'], 1)
+        self.assertEqual(len(self.db.list_terms()), 1)
+        self.db._raise_min_seq.assert_not_called()
+
+    def test_writes_raise_it(self):
+        self.assertTrue(self.db.delete_student(1)[0])
+        self.db._raise_min_seq.assert_called_once()
+
+
+@unittest.skipUnless(os.getenv('TEST_DB') == '1', "set TEST_DB=1 to run against the DB_* database")
+class ServerRoundTripTest(unittest.TestCase):
+    def setUp(self):
+        self.db = DatabaseHelper()
+        self.roll_nos = [FIRST_TEST_ROLL + i for i in range(len(AWKWARD_NAMES))]
+        self.addCleanup(self.db.delete_students, self.roll_nos)
+
+    def test_bulk_load_keeps_a_name_with_a_tab(self):
+        rows = [{'name': name, 'roll_no': str(roll_no), 'marks': {'Maths': str(50 + i)}}
+                for i, (roll_no, name) in enumerate(zip(self.roll_nos, AWKWARD_NAMES))]
+        success, message, rejected = self.db.bulk_load(rows)
+        self.assertTrue(success, message)
+        self.assertEqual(rejected, [])
+        names = dict(self.db.get_student_names(self.roll_nos))
+        self.assertEqual(names, dict(zip(self.roll_nos, AWKWARD_NAMES)))
+
+    def test_wan_mode_returns_the_same_records(self):
+        for i, (roll_no, name) in enumerate(zip(self.roll_nos, AWKWARD_NAMES)):
+            success, message = self.db.save_student_marks(name, roll_no, {'Maths': str(60 + i)})
+            self.assertTrue(success, message)
+        wan = DatabaseHelper(wan_mode=True)
+        for fields in (None, ('NAME',), ('NAME', 'Maths')):
+            with self.subTest(fields=fields):
+                kwargs = {'page_size': 2, 'filters': {'roll_nos': self.roll_nos}, 'fields': fields}
+                standard = list(self.db.iter_records(**kwargs))
+                self.assertEqual(len(standard), len(AWKWARD_NAMES))
+                self.assertEqual(list(wan.iter_records(**kwargs)), standard)
+
+    def test_sql_digests_match_import_digest(self):
+        maths, english, hindi = SUBJ_MAP['Maths'], SUBJ_MAP['English'], SUBJ_MAP['Hindi']
+        rows = [{'name': "Placeholder", 'roll_no': str(roll_no), 'class_name': class_name,
+                 'marks': {'Maths': '55', 'English': '0'}}
+                for roll_no, class_name in zip(self.roll_nos, ["7A", "", " ", ""])]
+        success, message, _ = self.db.bulk_load(rows)
+        self.assertTrue(success, message)
+        # Non-ASCII names only come from v1 or older data, so they are written directly
+        names = dict(zip(self.roll_nos, ["Zoë Ñandú", "Łukasz Żółć", "Plain Name", None]))
+        conn = self.db.connect()
+        try:
+            with conn.cursor() as cursor:
+                cursor.executemany("UPDATE STUDENTS SET NAME=%s WHERE ROLL_NO=%s",
+                                   [(name, roll_no) for roll_no, name in names.items()])
+                # A mark row holding NULL, besides the Hindi rows that do not exist
+                cursor.execute("UPDATE MARKS SET MARKS=NULL WHERE ROLL_NO=%s AND SUBJ_ID=%s", (self.roll_nos[1], english))
+            conn.commit()
+        finally:
+            conn.close()
+
+        digests = self.db.record_digests(self.roll_nos, [maths, english, hindi])
+        for roll_no, class_name in zip(self.roll_nos, ["7A", None, None, None]):
+            with self.subTest(name=names[roll_no]):
+                marks = {maths: 55, english: '' if roll_no == self.roll_nos[1] else 0, hindi: ''}
+                self.assertEqual(digests[roll_no], (class_name, DatabaseHelper.import_digest(names[roll_no] or "", marks)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+"""
+Tests for the incrementally maintained Performance statistics. They need no
+database:
+
+    python -m unittest test_live_stats
+"""
+
+import random
+import statistics
+import unittest
+from live_stats import RunningStat, TopHeap, LiveStats
+
+
+class RunningStatTest(unittest.TestCase):
+    def test_remove_undoes_add(self):
+        rng = random.Random(3)
+        values = [rng.randrange(101) for _ in range(200)]
+        stat = RunningStat()
+        for value in values:
+            stat.add(value)
+        for value in values[:150]:
+            stat.remove(value)
+        self.assertEqual(stat.count, 50)
+        self.assertAlmostEqual(stat.mean, statistics.fmean(values[150:]))
+        self.assertAlmostEqual(stat.variance, statistics.pvariance(values[150:]))
+
+    def test_removing_the_last_value_empties_it(self):
+        stat = RunningStat()
+        stat.add(40)
+        stat.add(60)
+        stat.remove(40)
+        self.assertEqual((stat.mean, stat.variance), (60, 0))
+        stat.remove(60)
+        self.assertEqual((stat.count, stat.mean), (0, 0.0))
+        self.assertIsNone(stat.variance)
+        self.assertIsNone(stat.stddev)
+
+
+class TopHeapTest(unittest.TestCase):
+    def test_replaced_and_removed_values_are_skipped(self):
+        heap = TopHeap()
+        for roll_no, value in [(1, 90), (2, 80), (3, 70)]:
+            heap.set(roll_no, value)
+        heap.set(1, 60)  # the stale 90 is still in the heap
+        heap.discard(2)
+        self.assertEqual(heap.top(3), [(70, 3), (60, 1)])
+        self.assertEqual(heap.top(3), [(70, 3), (60, 1)])  # top() leaves live entries in place
+
+    def test_setting_the_same_value_twice_lists_it_once(self):
+        heap = TopHeap()
+        heap.set(1, 90)
+        heap.set(1, 90)
+        self.assertEqual(heap.top(2), [(90, 1)])
+        self.assertEqual(heap.ties(), [(90, 1)])
+
+    def test_ties(self):
+        heap = TopHeap()
+        for roll_no in range(1, 6):
+            heap.set(roll_no, 95)
+        heap.set(6, 99)
+        heap.set(6, 50)
+        heap.discard(3)
+        self.assertEqual(heap.ties(), [(95, 1), (95, 2), (95, 4), (95, 5)])
+        self.assertEqual(TopHeap().ties(), [])
+
+    def test_compaction_keeps_the_live_values(self):
+        heap = TopHeap()
+        for value in range(500):
+            heap.set(1, value)
+        heap.set(2, 100)
+        self.assertLess(len(heap._heap), 100)
+        self.assertEqual(heap.top(5), [(499, 1), (100, 2)])
+
+
+class LiveStatsTest(unittest.TestCase):
+    def setUp(self):
+        self.stats = LiveStats()
+        self.stats.apply_save(1, "Priya", {'Maths': '90', 'English': '70'})
+        self.stats.apply_save(2, "Rahul", {'Maths': '60'})
+        self.stats.apply_save(3, "Aditi", {})
+
+    def test_apply_save(self):
+        snapshot = self.stats.snapshot()
+        self.assertEqual(snapshot['TOTAL_STUDENTS'], 3)
+        self.assertEqual(snapshot['CLASS_AVG'], 70)
+        self.assertEqual(snapshot['SUBJECT_AVGS']['Maths'], 75)
+        self.assertEqual(snapshot['TOPPER_NAME'], "Priya")
+        self.assertEqual(sum(snapshot['GRADE_COUNTS'].values()), 2)
+
+    def test_blank_subjects_keep_their_marks(self):
+        self.stats.apply_save(1, "Priya", {'Maths': '', 'English': '100'})
+        subject_avgs = self.stats.snapshot()['SUBJECT_AVGS']
+        self.assertEqual((subject_avgs['Maths'], subject_avgs['English']), (75, 100))
+        self.assertEqual(self.stats.toppers(n=1), [(1, "Priya", 95)])
+
+    def test_apply_delete(self):
+        self.stats.apply_delete(1)
+        snapshot = self.stats.snapshot()
+        self.assertEqual(snapshot['TOTAL_STUDENTS'], 2)
+        self.assertEqual(snapshot['CLASS_AVG'], 60)
+        self.assertIsNone(snapshot['SUBJECT_AVGS']['English'])
+        self.assertEqual(snapshot['TOPPER_NAME'], "Rahul")
+        self.assertEqual(sum(snapshot['GRADE_COUNTS'].values()), 1)
+        self.stats.apply_delete(1)  # already gone
+        self.assertEqual(len(self.stats), 2)
+
+    def test_every_tied_topper_is_named(self):
+        for roll_no, name in [(4, "Meera"), (5, "Vikram"), (6, "Kiran"), (7, "Lakshmi")]:
+            self.stats.apply_save(roll_no, name, {'Maths': '80', 'English': '80'})
+        self.assertEqual(self.stats.snapshot()['TOPPER_NAME'], "Priya, Meera, Vikram, Kiran, Lakshmi")
+
+    def test_no_marks_no_topper(self):
+        stats = LiveStats()
+        stats.apply_save(1, "Aditi", {})
+        snapshot = stats.snapshot()
+        self.assertIsNone(snapshot['TOPPER_NAME'])
+        self.assertIsNone(snapshot['CLASS_AVG'])
+
+
+if __name__ == "__main__":
+    unittest.main()
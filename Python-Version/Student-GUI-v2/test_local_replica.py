@@ -0,0 +1,120 @@
+"""
+Tests for the offline replica's term handling and conflict resolution. They run
+against a fake MySQL helper and a temporary SQLite file:
+
+    python -m unittest test_local_replica
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from database_helper import StudentRecord, SUBJ_MAP
+from local_replica import ReplicatedDatabaseHelper
+
+MATHS = SUBJ_MAP['Maths']
+
+
+class FakeRemote:
+    """Just enough of DatabaseHelper: students, marks per term and a MARKS_CHANGES log."""
+
+    def __init__(self):
+        self.active = (1, 2026)
+        self.students = {1: "Priya Sharma", 2: "Rahul Verma"}
+        self.marks = {(1, MATHS, (1, 2026)): 70, (2, MATHS, (1, 2026)): 55}
+        self.log = []
+
+    def term_key(self, term=None):
+        return tuple(term) if term is not None else self.active
+
+    def get_data_version(self):
+        return len(self.log)
+
+    def get_changes(self, since_seq, limit=1000):
+        return [{'SEQ': seq, 'ROLL_NO': roll_no, 'OP': op}
+                for seq, (roll_no, op) in enumerate(self.log, 1) if seq > since_seq][:limit]
+
+    def iter_records(self, page_size=500, filters=None, term=None, **kwargs):
+        term = self.term_key(term)
+        roll_nos = (filters or {}).get('roll_nos', self.students)
+        for roll_no in sorted(roll_nos):
+            if roll_no in self.students:
+                yield StudentRecord(roll_no, self.students[roll_no],
+                                    *(self.marks.get((roll_no, sub_id, term)) for sub_id in SUBJ_MAP.values()))
+
+    def set_mark(self, roll_no, subj_id, marks, term=None):
+        self.marks[roll_no, subj_id, self.term_key(term)] = marks
+        self.log.append((roll_no, 'UPSERT'))
+
+    def apply_changes(self, changes, term=None):
+        term = self.term_key(term)
+        conflicts = []
+        for change in changes:
+            if change['op'] == 'STUDENT':
+                self.students[change['roll_no']] = change['name']
+            elif change['op'] == 'MARK':
+                remote_marks = self.marks.get((change['roll_no'], change['subj_id'], term))
+                if remote_marks not in (change['base_marks'], change['marks']):
+                    conflicts.append({**change, 'remote_marks': remote_marks})
+                    continue
+                self.marks[change['roll_no'], change['subj_id'], term] = change['marks']
+            self.log.append((change['roll_no'], 'UPSERT'))
+        return conflicts
+
+
+class ReplicaTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.remote = FakeRemote()
+        self.replica = ReplicatedDatabaseHelper(os.path.join(directory, "replica.db"), self.remote)
+        self.replica.sync_async = lambda: None  # sync only when the test says so
+        self.assertTrue(self.replica.sync_now())
+
+    def maths(self, roll_no):
+        return next(r for r in self.replica.iter_records() if r['ROLL_NO'] == roll_no)['Maths']
+
+    def test_edits_sync_to_the_term_they_were_made_in(self):
+        self.replica.save_student_marks("Priya Sharma", 1, {'Maths': '80'})
+        self.remote.active = (2, 2026)  # term changes before the edit syncs
+        self.assertTrue(self.replica.sync_now())
+        self.assertEqual(self.remote.marks[1, MATHS, (1, 2026)], 80)
+        self.assertNotIn((1, MATHS, (2, 2026)), self.remote.marks)
+
+    def test_reseeds_when_the_active_term_changes(self):
+        self.remote.marks[1, MATHS, (2, 2026)] = 91
+        self.remote.active = (2, 2026)
+        self.assertTrue(self.replica.sync_now())
+        self.assertEqual(self.maths(1), 91)
+        self.assertIsNone(self.maths(2))
+        self.assertIn((0, 'RELOAD'), [(row['ROLL_NO'], row['OP']) for row in self.replica.get_changes(0)])
+
+    def test_conflict_keep_mine(self):
+        self.replica.save_student_marks("Priya Sharma", 1, {'Maths': '80'})
+        self.remote.set_mark(1, MATHS, 75)
+        self.replica.sync_now()
+        (conflict_id, roll_no, subj_id, mine, theirs, base, _), = self.replica.get_conflicts()
+        self.assertEqual((roll_no, subj_id, mine, theirs, base), (1, MATHS, 80, 75, 70))
+
+        self.assertEqual(self.replica.resolve_conflict(conflict_id, keep_mine=True)[0], True)
+        self.assertEqual(self.replica.pending_count(), 1)
+        self.replica.sync_now()
+        self.assertEqual(self.remote.marks[1, MATHS, (1, 2026)], 80)
+        self.assertEqual(self.maths(1), 80)
+        self.assertEqual(self.replica.get_conflicts(), [])
+
+    def test_conflict_keep_theirs(self):
+        self.replica.save_student_marks("Priya Sharma", 1, {'Maths': '80'})
+        self.remote.set_mark(1, MATHS, 75)
+        self.replica.sync_now()
+        conflict_id = self.replica.get_conflicts()[0][0]
+
+        self.assertEqual(self.replica.resolve_conflict(conflict_id, keep_mine=False)[0], True)
+        self.assertEqual(self.replica.pending_count(), 0)
+        self.assertEqual(self.maths(1), 75)
+        self.assertEqual(self.remote.marks[1, MATHS, (1, 2026)], 75)
+        self.assertEqual(self.replica.resolve_conflict(conflict_id, keep_mine=True)[0], False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+Tests for the fuzzy name index. They need no database:
+
+    python -m unittest test_name_index
+"""
+
+import random
+import unittest
+from name_index import NameIndex, normalize, deletions, close_distance, edit_distances
+
+ROSTER = {
+    1: "Priya Sharma",
+    2: "Rahul Sharma",
+    3: "Aditi Kulkarni",
+    4: "Meera Nair",
+    5: "Vikram Nair",
+    6: "Shrinivas Kamath Ramesh",
+    7: "Lakshmi Iyer",
+    8: "Arjun Sarmah",
+    9: "Kiran Shetty",
+    10: "Ananya Chatterjee",
+}
+
+
+def slow_distances(a, b):
+    """The textbook optimal string alignment table, for checking the bit-parallel version."""
+    table = [[i + j if not i or not j else 0 for j in range(len(b) + 1)] for i in range(len(a) + 1)]
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            table[i][j] = min(table[i - 1][j] + 1, table[i][j - 1] + 1, table[i - 1][j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                table[i][j] = min(table[i][j], table[i - 2][j - 2] + 1)
+    return table[-1][-1], min(table[-1])
+
+
+class EditDistanceTest(unittest.TestCase):
+    def test_matches_the_full_table(self):
+        rng = random.Random(7)
+        for _ in range(5000):
+            a = "".join(rng.choice("abrs") for _ in range(rng.randrange(9)))
+            b = "".join(rng.choice("abrs") for _ in range(rng.randrange(9)))
+            self.assertEqual(edit_distances(a, b), slow_distances(a, b), (a, b))
+
+    def test_transposition_is_one_edit(self):
+        self.assertEqual(edit_distances("srama", "sarma")[0], 1)
+
+    def test_close_distance_agrees(self):
+        rng = random.Random(11)
+        for _ in range(2000):
+            a = "".join(rng.choice("abrs") for _ in range(rng.randrange(2, 8)))
+            b = "".join(rng.choice("abrs") for _ in range(rng.randrange(2, 8)))
+            if a != b and (deletions(a) | {a}) & (deletions(b) | {b}):
+                self.assertEqual(close_distance(a, b), slow_distances(a, b)[0], (a, b))
+
+
+class SearchTest(unittest.TestCase):
+    def setUp(self):
+        self.index = NameIndex()
+        for roll_no, name in ROSTER.items():
+            self.index.add(roll_no, name)
+
+    def top(self, query, count=1):
+        return [roll_no for roll_no, _, _ in self.index.search(query, limit=count)]
+
+    def test_exact_word(self):
+        self.assertEqual(sorted(self.top("sharma", 2)), [1, 2])
+
+    def test_typo(self):
+        self.assertEqual(sorted(self.top("Sharmaa", 2)), [1, 2])
+        self.assertEqual(self.top("Lakshmi Iyr"), [7])
+
+    def test_transposition(self):
+        matches = self.index.search("shrama", limit=3)
+        self.assertEqual(sorted(roll_no for roll_no, _, _ in matches[:2]), [1, 2])
+        self.assertGreaterEqual(matches[0][2], 0.8)
+
+    def test_prefix_of_the_word_being_typed(self):
+        self.assertEqual(self.index.search("Kulk"), [(3, "Aditi Kulkarni", 1.0)])
+        self.assertEqual(self.top("Priya Sh"), [1])
+
+    def test_words_are_scored_separately(self):
+        # Letters of "Meera Nair Vikram" spread across Shrinivas/Kamath/Ramesh must not add up
+        ranking = self.top("Meera Nair Vikram", 3)
+        self.assertEqual(sorted(ranking[:2]), [4, 5])
+        self.assertNotIn(6, ranking[:2])
+
+    def test_romanization_variants(self):
+        self.assertEqual(normalize("Laxmi"), normalize("Lakshmi"))
+        self.assertEqual(self.top("Chaterji"), [10])
+
+    def test_limit_and_min_score(self):
+        self.assertEqual(len(self.index.search("a", limit=2)), 2)
+        self.assertEqual(self.index.search("zzqx"), [])
+        self.assertEqual(self.index.search("   "), [])
+
+    def test_add_and_remove(self):
+        self.index.add(11, "Venkatesh Rao")
+        self.assertEqual(self.top("Venkatsh"), [11])
+        self.index.add(11, "Venkat Rao")  # renamed
+        self.assertEqual(self.top("Venkatesh"), [11])
+        self.index.remove(11)
+        self.assertEqual(self.index.search("Venkat"), [])
+        self.assertNotIn("venkat", self.index._word_keys)
+        self.assertEqual(len(self.index), len(ROSTER))
+
+    def test_students_with_the_same_name(self):
+        self.index.add(12, "Priya Sharma")
+        self.assertEqual(self.top("Priya Sharma", 2), [1, 12])
+        self.index.remove(1)
+        self.assertEqual(self.top("Priya Sharma"), [12])
+
+
+if __name__ == "__main__":
+    unittest.main()
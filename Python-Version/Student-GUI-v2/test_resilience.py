@@ -0,0 +1,120 @@
+"""
+Tests for retries and the circuit breaker. They need no database; the clock is
+patched where the breaker waits:
+
+    python -m unittest test_resilience
+"""
+
+import unittest
+from unittest import mock
+import pymysql
+from resilience import RetryPolicy, CircuitBreaker, CircuitOpenError, call_with_retry
+
+DEADLOCK = pymysql.err.OperationalError(1213, "Deadlock found when trying to get lock")
+LOST_CONNECTION = pymysql.err.OperationalError(2013, "Lost connection to MySQL server during query")
+CONNECT_REFUSED = pymysql.err.OperationalError(2003, "Can't connect to MySQL server")
+
+
+def failing(*errors, result="ok"):
+    """fn for call_with_retry raising each error in turn, then returning result."""
+    calls = []
+
+    def fn():
+        calls.append(None)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+    return fn, calls
+
+
+class RetryTest(unittest.TestCase):
+    def setUp(self):
+        self.policy = RetryPolicy(attempts=5, base_delay=0)
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+
+    def test_contention_is_retried_without_opening_the_circuit(self):
+        fn, calls = failing(DEADLOCK, DEADLOCK, DEADLOCK, DEADLOCK)
+        self.assertEqual(call_with_retry(fn, self.policy, self.breaker), "ok")
+        self.assertEqual(len(calls), 5)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(self.breaker.metrics.snapshot()['circuit_opens'], 0)
+
+    def test_lost_connections_open_the_circuit(self):
+        fn, calls = failing(LOST_CONNECTION, LOST_CONNECTION)
+        with self.assertRaises(CircuitOpenError):
+            call_with_retry(fn, self.policy, self.breaker)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_non_idempotent_call_is_not_retried_after_a_lost_connection(self):
+        fn, calls = failing(LOST_CONNECTION)
+        with self.assertRaises(pymysql.err.OperationalError):
+            call_with_retry(fn, self.policy, self.breaker, idempotent=False)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.breaker.metrics.snapshot()['failures'], 1)
+
+    def test_non_idempotent_call_is_retried_when_nothing_reached_the_server(self):
+        fn, calls = failing(CONNECT_REFUSED)
+        self.assertEqual(call_with_retry(fn, self.policy, self.breaker, idempotent=False), "ok")
+        self.assertEqual(len(calls), 2)
+
+    def test_other_errors_are_raised_at_once(self):
+        fn, calls = failing(pymysql.err.ProgrammingError(1146, "Table doesn't exist"))
+        with self.assertRaises(pymysql.err.ProgrammingError):
+            call_with_retry(fn, self.policy, self.breaker)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.breaker.metrics.snapshot()['failures'], 0)
+
+
+class HalfOpenTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('resilience.time.monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        self.breaker.record_failure()
+
+    def test_open_circuit_fails_fast_until_reset_timeout(self):
+        self.now += 29
+        with self.assertRaises(CircuitOpenError) as raised:
+            self.breaker.before_call()
+        self.assertAlmostEqual(raised.exception.retry_in, 1)
+
+    def test_one_probe_at_a_time(self):
+        self.now += 30
+        self.breaker.before_call()  # the probe
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+
+    def test_successful_probe_closes_the_circuit(self):
+        self.now += 30
+        self.breaker.before_call()
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.breaker.before_call()
+        self.assertEqual(self.breaker.metrics.snapshot()['open_seconds'], 30)
+
+    def test_failed_probe_keeps_it_open_for_another_reset_timeout(self):
+        self.now += 30
+        self.breaker.before_call()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.now += 29
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+        self.now += 1
+        self.breaker.before_call()
+        self.assertEqual(self.breaker.metrics.snapshot()['circuit_opens'], 1)
+
+    def test_probe_ended_by_a_permanent_error_lets_the_next_one_through(self):
+        self.now += 30
+        self.breaker.before_call()
+        self.breaker.release_probe()
+        self.breaker.before_call()
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+"""
+Standard vs WAN transfer mode over a simulated slow link.
+
+Streams every student record through a local TCP proxy that sits between the
+app and DB_HOST:DB_PORT. The proxy adds a round-trip delay (half each way),
+can cap bandwidth, and counts the bytes that cross it. TLS passes through
+untouched, so the byte counts are what a remote school would really send.
+
+Each --rtt step compares:
+    standard   iter_records with the Treeview page size, plain result rows
+    wan        iter_records in WAN mode: WAN_CHUNK_SIZE students per page, compressed by the server
+    wan+fields WAN mode fetching only --fields (e.g. NAME,Maths) instead of every column
+
+Point DB_* at a copy of the school database or a quiet time; the benchmark only reads.
+
+Usage:
+    python wan_benchmark.py --rtt 0,20,80,150
+    python wan_benchmark.py --rtt 150 --bandwidth 2000 --fields NAME,Maths
+"""
+
+import os
+import time
+import queue
+import socket
+import argparse
+import threading
+from database_helper import DatabaseHelper, RECORD_FIELDS, WAN_CHUNK_SIZE
+
+# Rows in one Treeview page (gui_app_v2.PAGE_SIZE)
+PAGE_SIZE = 200
+CHUNK_BYTES = 65536
+
+
+class LatencyProxy:
+    """TCP forwarder to (host, port) that delays every chunk by rtt/2 in each direction."""
+
+    def __init__(self, host, port, rtt_ms=0, bandwidth_kbit=None):
+        self.target = (host, port)
+        self.rtt_ms = rtt_ms
+        self.bandwidth_kbit = bandwidth_kbit
+        self.bytes_up = 0
+        self.bytes_down = 0
+        self._count_lock = threading.Lock()
+        self._server = socket.create_server(('127.0.0.1', 0))
+        self.port = self._server.getsockname()[1]
+        threading.Thread(target=self._accept_loop, name="wan-proxy", daemon=True).start()
+
+    def reset_counts(self):
+        with self._count_lock:
+            self.bytes_up = self.bytes_down = 0
+
+    def _accept_loop(self):
+        while True:
+            client, _ = self._server.accept()
+            upstream = socket.create_connection(self.target)
+            for sock in (client, upstream):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._pipe(client, upstream, 'bytes_up')
+            self._pipe(upstream, client, 'bytes_down')
+
+    def _pipe(self, source, sink, counter):
+        # Reading and sending run in separate threads, so delayed chunks queue up
+        # like packets in flight instead of holding back the next read
+        in_flight = queue.Queue()
+
+        def read():
+            while True:
+                try:
+                    data = source.recv(CHUNK_BYTES)
+                except OSError:
+                    data = b""
+                in_flight.put((time.monotonic() + self.rtt_ms / 2000, data))
+                if not data:
+                    return
+                with self._count_lock:
+                    setattr(self, counter, getattr(self, counter) + len(data))
+
+        def send():
+            free_at = 0  # when the simulated link has finished sending the previous chunk
+            while True:
+                due, data = in_flight.get()
+                if self.bandwidth_kbit:
+                    due = free_at = max(due, free_at) + len(data) * 8 / (self.bandwidth_kbit * 1000)
+                time.sleep(max(0, due - time.monotonic()))
+                try:
+                    if not data:
+                        sink.shutdown(socket.SHUT_WR)
+                        return
+                    sink.sendall(data)
+                except OSError:
+                    return
+
+        threading.Thread(target=read, daemon=True).start()
+        threading.Thread(target=send, daemon=True).start()
+
+
+class ProxiedDatabaseHelper(DatabaseHelper):
+    """DatabaseHelper whose connections go through a LatencyProxy, always to the primary."""
+
+    def __init__(self, proxy, tenant=None, wan_mode=False):
+        super().__init__(tenant=tenant, wan_mode=wan_mode)
+        self.proxy = proxy
+
+    def config(self):
+        return {**super().config(), 'host': '127.0.0.1', 'port': self.proxy.port}
+
+    def replica_set(self):
+        return None
+
+
+def run(db, proxy, page_size, fields=None):
+    """(students, seconds, bytes down, bytes up) for streaming the whole roster once."""
+    proxy.reset_counts()
+    started = time.perf_counter()
+    count = sum(1 for _ in db.iter_records(page_size=page_size, fields=fields))
+    return count, time.perf_counter() - started, proxy.bytes_down, proxy.bytes_up
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare standard and WAN record transfer over a simulated slow link.")
+    parser.add_argument('--rtt', default="0,20,80,150", help="Comma-separated round-trip times in ms")
+    parser.add_argument('--bandwidth', type=int, default=None, help="Link speed in kbit/s (default: unlimited)")
+    parser.add_argument('--fields', default="NAME", help="Comma-separated RECORD_FIELDS for the projected run")
+    parser.add_argument('--tenant', default=os.getenv('TENANT_ID') or None, help="TENANT_SHARDS.TENANT_ID to route to")
+    args = parser.parse_args()
+
+    fields = [field.strip() for field in args.fields.split(',') if field.strip()]
+    unknown = set(fields) - set(RECORD_FIELDS)
+    if unknown:
+        parser.error(f"Unknown fields: {', '.join(sorted(unknown))}")
+    config = DatabaseHelper(tenant=args.tenant).config()
+    proxy = LatencyProxy(config['host'], config['port'], bandwidth_kbit=args.bandwidth)
+    standard = ProxiedDatabaseHelper(proxy, tenant=args.tenant)
+    wan = ProxiedDatabaseHelper(proxy, tenant=args.tenant, wan_mode=True)
+    modes = [
+        ("standard", standard, PAGE_SIZE, None),
+        ("wan", wan, WAN_CHUNK_SIZE, None),
+        ("wan+fields", wan, WAN_CHUNK_SIZE, fields),
+    ]
+    # Warm-up: open the pooled connections so handshakes are not timed
+    for db in (standard, wan):
+        next(iter(db.iter_records(page_size=1)), None)
+
+    print(f"{'RTT':>6}  {'mode':<12}{'students':>9}{'seconds':>10}{'KiB down':>11}{'KiB up':>9}")
+    for rtt in (int(value) for value in args.rtt.split(',')):
+        proxy.rtt_ms = rtt
+        for label, db, page_size, projection in modes:
+            count, seconds, down, up = run(db, proxy, page_size, projection)
+            print(f"{rtt:>4}ms  {label:<12}{count:>9}{seconds:>10.2f}{down / 1024:>11.1f}{up / 1024:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
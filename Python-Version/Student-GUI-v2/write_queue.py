@@ -0,0 +1,191 @@
+"""
+Durable write-behind queue for student saves.
+
+enqueue() records a save in a local SQLite file and returns at once, so mark
+entry never waits on the database. A background thread flushes queued saves in
+batches, one database transaction per batch, oldest first.
+
+Saves are coalesced per roll number: saving a student again before the first save
+was flushed replaces it (blank subjects keep the queued value), so the database
+only sees the latest state. Entries stay in the file until their batch has been
+written, so nothing is lost if the app closes or the database is down.
+
+Transient failures (connection lost, deadlock) leave the entries queued and the
+flusher backs off. A batch the database rejects outright is split until the
+offending save is found; that save is marked failed and kept for the user to
+retry or discard, while the rest of the batch goes through.
+
+One queue file belongs to one running app.
+"""
+
+import json
+import sqlite3
+import threading
+
+QUEUE_SCHEMA = """
+-- One row per roll number: repeated saves of a student are merged into it.
+-- SEQ orders flushes by the time of the latest save. ERROR is set when the
+-- database rejected the save, and such rows wait for retry_failed().
+CREATE TABLE IF NOT EXISTS PENDING_SAVES (
+    ROLL_NO INTEGER PRIMARY KEY,
+    NAME TEXT NOT NULL,
+    MARKS TEXT NOT NULL,
+    SEQ INTEGER NOT NULL,
+    ERROR TEXT
+);
+CREATE INDEX IF NOT EXISTS IX_PENDING_SAVES_SEQ ON PENDING_SAVES (SEQ);
+"""
+
+# Longest wait between flush attempts while the database keeps failing
+MAX_BACKOFF_SECONDS = 60
+
+
+class WriteBehindQueue:
+    def __init__(self, path, flush, is_transient=None, batch_size=50, flush_interval=1.0):
+        """
+        Args:
+            path: SQLite file holding the queue
+            flush: Callable taking a list of {'roll_no', 'name', 'marks'} dicts and writing
+                   them in one transaction; raises if nothing was written
+            is_transient: Callable(exception) -> True if the write may succeed later;
+                          by default every error is treated as transient
+            batch_size: Saves written per transaction
+            flush_interval: Seconds between flushes (sooner once batch_size saves are queued)
+        """
+        self.path = path
+        self.flush = flush
+        self.is_transient = is_transient or (lambda e: True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.last_error = None
+        self._backing_off = False
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.executescript(QUEUE_SCHEMA)
+        self._lock = threading.Lock()  # guards the SQLite connection
+        self._flush_lock = threading.Lock()  # one flush at a time (worker or flush_now)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- Producer side ---
+    def enqueue(self, name, roll_no, marks_dict):
+        """Queue a save; returns immediately."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT MARKS FROM PENDING_SAVES WHERE ROLL_NO=?", (roll_no,)).fetchone()
+                marks = json.loads(row[0]) if row else {}
+                marks.update({sub: value for sub, value in marks_dict.items() if value != ""})
+                seq = self._conn.execute("SELECT COALESCE(MAX(SEQ), 0) + 1 FROM PENDING_SAVES").fetchone()[0]
+                self._conn.execute("""
+                    INSERT INTO PENDING_SAVES (ROLL_NO, NAME, MARKS, SEQ, ERROR) VALUES (?, ?, ?, ?, NULL)
+                    ON CONFLICT(ROLL_NO) DO UPDATE SET
+                        NAME=excluded.NAME, MARKS=excluded.MARKS, SEQ=excluded.SEQ, ERROR=NULL
+                """, (roll_no, name, json.dumps(marks), seq))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            pending = self._conn.execute("SELECT COUNT(*) FROM PENDING_SAVES WHERE ERROR IS NULL").fetchone()[0]
+        # A full batch is flushed early, except while backing off from a failing database
+        if pending >= self.batch_size and not self._backing_off:
+            self._wake.set()
+
+    def counts(self):
+        """(pending, failed) number of queued saves."""
+        with self._lock:
+            pending, failed = self._conn.execute(
+                "SELECT COALESCE(SUM(ERROR IS NULL), 0), COALESCE(SUM(ERROR IS NOT NULL), 0) FROM PENDING_SAVES"
+            ).fetchone()
+        return pending, failed
+
+    def is_pending(self, roll_no):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM PENDING_SAVES WHERE ROLL_NO=?", (roll_no,)).fetchone() is not None
+
+    def failed_entries(self):
+        """List of (roll_no, name, error) for saves the database rejected."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT ROLL_NO, NAME, ERROR FROM PENDING_SAVES WHERE ERROR IS NOT NULL ORDER BY SEQ"
+            ).fetchall()
+
+    def retry_failed(self):
+        with self._lock:
+            self._conn.execute("UPDATE PENDING_SAVES SET ERROR = NULL WHERE ERROR IS NOT NULL")
+        self._wake.set()
+
+    def discard_failed(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM PENDING_SAVES WHERE ERROR IS NOT NULL")
+
+    # --- Flushing ---
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._flush_loop, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10):
+        """Stop the flusher after one last flush attempt. Unflushed saves stay in the file."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _flush_loop(self):
+        delay = self.flush_interval
+        while not self._stop.is_set():
+            self._wake.wait(delay)
+            self._wake.clear()
+            flushed = self.flush_now()
+            self._backing_off = not flushed
+            delay = self.flush_interval if flushed else min(delay * 2, MAX_BACKOFF_SECONDS)
+        self.flush_now()
+
+    def flush_now(self):
+        """Write every pending save. Returns False if a transient error stopped the flush."""
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    rows = self._conn.execute("""
+                        SELECT ROLL_NO, NAME, MARKS, SEQ FROM PENDING_SAVES
+                        WHERE ERROR IS NULL ORDER BY SEQ LIMIT ?
+                    """, (self.batch_size,)).fetchall()
+                if not rows:
+                    self.last_error = None
+                    return True
+                try:
+                    self._write([
+                        {'roll_no': roll_no, 'name': name, 'marks': json.loads(marks), 'seq': seq}
+                        for roll_no, name, marks, seq in rows
+                    ])
+                except Exception as e:
+                    self.last_error = str(e)
+                    print(f"Queued saves not written yet: {e}")
+                    return False
+
+    def _write(self, entries):
+        """Flush entries, isolating saves the database rejects. Transient errors propagate."""
+        try:
+            self.flush(entries)
+        except Exception as e:
+            if self.is_transient(e):
+                raise
+            if len(entries) == 1:
+                self._mark_failed(entries[0], e)
+                return
+            middle = len(entries) // 2
+            self._write(entries[:middle])
+            self._write(entries[middle:])
+            return
+        with self._lock:
+            # A student saved again while the batch was in flight keeps the newer entry
+            self._conn.executemany("DELETE FROM PENDING_SAVES WHERE ROLL_NO=? AND SEQ=?",
+                                   [(entry['roll_no'], entry['seq']) for entry in entries])
+
+    def _mark_failed(self, entry, error):
+        print(f"Save of Roll No {entry['roll_no']} rejected: {error}")
+        with self._lock:
+            self._conn.execute("UPDATE PENDING_SAVES SET ERROR=? WHERE ROLL_NO=? AND SEQ=?",
+                               (str(error), entry['roll_no'], entry['seq']))